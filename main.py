@@ -1,59 +1,186 @@
 """ Sistema de Clasificadores """
 
+import sys
+import time
+import importlib
+
+_START_TIME = time.perf_counter()
+
 from src.ui.menus import (
     clear_screen, print_header, print_main_menu,
     print_preprocessing_menu, print_training_menu, print_testing_menu,
     print_action_header, print_error, wait_for_enter
 )
 from src.training.architectures import ARCHITECTURES
+from src.config import MODEL_ARCHITECTURE, DATA_LOADER, PERSISTENT_WORKER, STARTUP_REPORT, COMPRESSION_METHOD
+
+# Proceso de trabajo persistente (solo si persistent_worker = true)
+_worker = None
+
+
+def run_action(module_name, function_name, *args, **kwargs):
+    """
+    Ejecuta una acción importando su módulo recién cuando se necesita.
+    
+    Con el proceso de trabajo activo se ejecuta allí, donde TensorFlow ya está cargado.
+    """
+    if _worker is not None:
+        if STARTUP_REPORT and _worker.ready_time is None:
+            print(f"[inicio] Precarga de TensorFlow en el proceso de trabajo: {_worker.wait_ready():.2f}s")
+        _worker.run(module_name, function_name, *args, **kwargs)
+        return
+    
+    tensorflow_loaded = "tensorflow" in sys.modules
+    start = time.perf_counter()
+    module = importlib.import_module(module_name)
+    if STARTUP_REPORT and not tensorflow_loaded and "tensorflow" in sys.modules:
+        print(f"[inicio] Carga de TensorFlow y {module_name}: {time.perf_counter() - start:.2f}s")
+    getattr(module, function_name)(*args, **kwargs)
+
+
+def print_startup_report():
+    """Informa cuánto tardó en abrirse el menú"""
+    elapsed = (time.perf_counter() - _START_TIME) * 1000
+    tensorflow = "cargado" if "tensorflow" in sys.modules else "no cargado"
+    worker = "activo" if _worker is not None else "desactivado"
+    print(f"[inicio] Menú listo en {elapsed:.0f} ms (TensorFlow {tensorflow}, proceso de trabajo {worker})\n")
+
 
 def run_preprocessing_option(option):
     """Ejecuta la opción de preprocesamiento seleccionada"""
     if option == "1":
         print_action_header("Ejecutando división de dataset...")
-        from src.preprocessing.split_dataset import split_dataset
-        split_dataset()
+        run_action("src.preprocessing.split_dataset", "split_dataset")
+        # Mantener los shards al día si el entrenamiento los usa
+        if DATA_LOADER == "packed":
+            print_action_header("Empaquetando dataset en shards...")
+            run_action("src.preprocessing.pack_dataset", "pack_dataset")
         wait_for_enter()
     elif option == "2":
         print_action_header("Ejecutando aumento de datos...")
-        from src.preprocessing.augment_dataset import augment_dataset
-        augment_dataset()
+        run_action("src.preprocessing.augment_dataset", "augment_dataset")
         wait_for_enter()
+    elif option == "3":
+        print_action_header("Empaquetando dataset en shards...")
+        run_action("src.preprocessing.pack_dataset", "pack_dataset")
+        wait_for_enter()
+
+
+def ask_architecture():
+    """Pide una arquitectura registrada (vacío = la de config.ini)"""
+    architecture = input(f"Arquitectura {list(ARCHITECTURES.keys())} [{MODEL_ARCHITECTURE}]: ").strip()
+    architecture = architecture or MODEL_ARCHITECTURE
+    if architecture not in ARCHITECTURES:
+        print_error(f"Arquitectura '{architecture}' no soportada.")
+        return None
+    return architecture
 
 
 def run_training_option(option):
     """Ejecuta la opción de entrenamiento seleccionada"""
-    from src.training.train_model import train_model
-    
     # Generar mapeo dinámico
     option_to_arch = {str(i): key for i, key in enumerate(ARCHITECTURES.keys(), 1)}
     
-    if option in option_to_arch:
+    if option == str(len(ARCHITECTURES) + 1):
+        architecture = ask_architecture()
+        if architecture:
+            print_action_header(f"Exportando {ARCHITECTURES[architecture]['name']} a TFLite...")
+            run_action("src.training.export_tflite", "export_and_compare", architecture)
+        wait_for_enter()
+    elif option == str(len(ARCHITECTURES) + 2):
+        print_action_header("Ejecutando benchmark de arquitecturas...")
+        run_action("src.training.benchmark", "benchmark_architectures")
+        wait_for_enter()
+    elif option == str(len(ARCHITECTURES) + 3):
+        concurrent = input("Entrenamientos simultáneos [1]: ").strip()
+        print_action_header("Entrenando todas las arquitecturas...")
+        run_action("src.training.train_all", "train_all",
+                   concurrent_runs=int(concurrent) if concurrent.isdigit() else 1)
+        wait_for_enter()
+    elif option == str(len(ARCHITECTURES) + 4):
+        teacher = ask_architecture()
+        if teacher:
+            print_action_header(f"Destilando {ARCHITECTURES[teacher]['name']} en MobileNetV2...")
+            run_action("src.training.distillation", "distill_and_compare", teacher=teacher)
+        wait_for_enter()
+    elif option == str(len(ARCHITECTURES) + 5):
+        architecture = ask_architecture()
+        if architecture:
+            method = input("Método [prune / cluster / prune_cluster] "
+                           f"[{COMPRESSION_METHOD}]: ").strip() or COMPRESSION_METHOD
+            print_action_header(f"Comprimiendo {ARCHITECTURES[architecture]['name']} ({method})...")
+            run_action("src.training.compression", "compress_and_compare", architecture, method)
+        wait_for_enter()
+    elif option == str(len(ARCHITECTURES) + 6):
+        architecture = ask_architecture()
+        if architecture:
+            print_action_header(f"Buscando hiperparámetros para {ARCHITECTURES[architecture]['name']}...")
+            run_action("src.training.hyperparameter_search", "search_hyperparameters", architecture)
+        wait_for_enter()
+    elif option in option_to_arch:
         architecture = option_to_arch[option]
         arch_name = ARCHITECTURES[architecture]["name"]
         print_action_header(f"Iniciando entrenamiento con {arch_name}...")
-        train_model(architecture=architecture)
+        run_action("src.training.train_model", "train_model", architecture=architecture)
         wait_for_enter()
 
 
+def run_batch_inference_option():
+    """Pide las rutas y ejecuta la inferencia por lotes"""
+    inputs = input("Carpetas, imágenes o videos (separados por coma): ").strip()
+    if not inputs:
+        return
+    architecture = ask_architecture()
+    if not architecture:
+        return
+    output_path = input("Archivo de salida [predicciones.csv]: ").strip()
+    
+    print_action_header("Ejecutando inferencia por lotes...")
+    run_action(
+        "src.testing.batch_inference", "run_batch_inference",
+        [path.strip() for path in inputs.split(",") if path.strip()],
+        output_path or "predicciones.csv",
+        architecture=architecture
+    )
+
+
 def run_testing_option(option):
     """Ejecuta la opción de pruebas seleccionada"""
-    from src.testing.realtime_classification import run_realtime_classification
-    
     # Generar mapeo dinámico
     option_to_arch = {str(i): key for i, key in enumerate(ARCHITECTURES.keys(), 1)}
     
-    if option in option_to_arch:
+    if option == str(len(ARCHITECTURES) + 1):
+        run_batch_inference_option()
+        wait_for_enter()
+    elif option == str(len(ARCHITECTURES) + 2):
+        architecture = ask_architecture()
+        if architecture:
+            print_action_header("Iniciando servidor de inferencia...")
+            run_action("src.serving.server", "run_server", architecture=architecture)
+        wait_for_enter()
+    elif option == str(len(ARCHITECTURES) + 3):
+        print_action_header("Modelos disponibles")
+        run_action("src.training.model_registry", "print_models")
+        wait_for_enter()
+    elif option == str(len(ARCHITECTURES) + 4):
+        architecture = ask_architecture()
+        if architecture:
+            print_action_header("Evaluando modelo sobre el conjunto de prueba...")
+            run_action("src.testing.evaluation", "evaluate_model", architecture=architecture)
+        wait_for_enter()
+    elif option in option_to_arch:
         architecture = option_to_arch[option]
         arch_name = ARCHITECTURES[architecture]["name"]
+        source = input("Fuente (índice de cámara, video o carpeta de imágenes) [0]: ").strip()
         print_action_header(f"Iniciando clasificación en tiempo real ({arch_name})...")
-        run_realtime_classification(architecture=architecture)
+        run_action("src.testing.realtime_classification", "run_realtime_classification",
+                   architecture=architecture, source=source or 0)
         wait_for_enter()
 
 
 def preprocessing_submenu():
     """Submenú de preprocesamiento"""
-    valid_options = ["1", "2"]
+    valid_options = ["1", "2", "3"]
     while True:
         clear_screen()
         print_header()
@@ -72,7 +199,7 @@ def preprocessing_submenu():
 
 def training_submenu():
     """Submenú de entrenamiento"""
-    valid_options = [str(i) for i in range(1, len(ARCHITECTURES) + 1)]
+    valid_options = [str(i) for i in range(1, len(ARCHITECTURES) + 7)]
     while True:
         clear_screen()
         print_header()
@@ -91,7 +218,7 @@ def training_submenu():
 
 def testing_submenu():
     """Submenú de pruebas"""
-    valid_options = [str(i) for i in range(1, len(ARCHITECTURES) + 1)]
+    valid_options = [str(i) for i in range(1, len(ARCHITECTURES) + 5)]
     while True:
         clear_screen()
         print_header()
@@ -110,10 +237,19 @@ def testing_submenu():
 
 def main():
     """Función principal del programa"""
+    global _worker
+    if PERSISTENT_WORKER:
+        from src.ui.worker import ActionWorker
+        _worker = ActionWorker()
+    
+    show_startup_report = STARTUP_REPORT
     while True:
         clear_screen()
         print_header()
         print_main_menu()
+        if show_startup_report:
+            print_startup_report()
+            show_startup_report = False
         
         option = input("Selecciona una opción: ").strip()
         
@@ -22,6 +22,9 @@ MODEL_SAVE_DIR = _config.get("directories", "model_save_dir")
 TRAIN_SPLIT = _config.getfloat("dataset_split", "train_split")
 VAL_SPLIT = _config.getfloat("dataset_split", "val_split")
 TEST_SPLIT = _config.getfloat("dataset_split", "test_split")
+SPLIT_PLACEMENT = _config.get("dataset_split", "placement")
+HASH_WORKERS = _config.getint("dataset_split", "hash_workers")
+NEAR_DUPLICATE_DISTANCE = _config.getint("dataset_split", "near_duplicate_distance")
 
 # ============ CONFIGURACIÓN DEL MODELO ============
 IMG_SIZE = (
@@ -30,12 +33,85 @@ IMG_SIZE = (
 )
 NUM_CLASSES = _config.getint("model", "num_classes")
 MODEL_ARCHITECTURE = _config.get("model", "architecture")
+EMBED_PREPROCESSING = _config.getboolean("model", "embed_preprocessing")
 
 # ============ CONFIGURACIÓN DE ENTRENAMIENTO ============
 BATCH_SIZE = _config.getint("training", "batch_size")
 EPOCHS = _config.getint("training", "epochs")
 LEARNING_RATE = _config.getfloat("training", "learning_rate")
+JIT_COMPILE = _config.getboolean("training", "jit_compile")
+PRECISION = _config.get("training", "precision")
+PROGRESSIVE_RESOLUTION = _config.getboolean("training", "progressive_resolution")
+PROGRESSIVE_SIZES = _config.get("training", "progressive_sizes")
+
+# ============ CHECKPOINTS ============
+CHECKPOINTS_ENABLED = _config.getboolean("checkpoints", "enabled")
+CHECKPOINT_DIR = _config.get("checkpoints", "checkpoint_dir")
+CHECKPOINT_KEEP = _config.getint("checkpoints", "keep")
+RESUME_TRAINING = _config.getboolean("checkpoints", "resume")
+EARLY_STOPPING_PATIENCE = _config.getint("checkpoints", "early_stopping_patience")
+EARLY_STOPPING_MIN_DELTA = _config.getfloat("checkpoints", "min_delta")
+RESTORE_BEST = _config.getboolean("checkpoints", "restore_best")
+
+# ============ PERFILADO DEL ENTRENAMIENTO ============
+RUN_LOG = _config.getboolean("profiling", "run_log")
+RUN_LOG_DIR = _config.get("profiling", "run_log_dir")
+PROFILE_STEPS = _config.get("profiling", "profile_steps")
+PROFILE_DIR = _config.get("profiling", "profile_dir")
 
 # ============ ARQUITECTURA ============
 DENSE_UNITS = _config.getint("architecture", "dense_units")
 DROPOUT_RATE = _config.getfloat("architecture", "dropout_rate")
+
+# ============ PIPELINE DE DATOS ============
+DATA_LOADER = _config.get("data_pipeline", "data_loader")
+PIPELINE_CACHE = _config.get("data_pipeline", "cache")
+PIPELINE_CACHE_DIR = _config.get("data_pipeline", "cache_dir")
+PACKED_DIR = _config.get("data_pipeline", "packed_dir")
+SHARD_SIZE_MB = _config.getint("data_pipeline", "shard_size_mb")
+
+# ============ CACHÉ DE EMBEDDINGS ============
+USE_FEATURE_CACHE = _config.getboolean("feature_cache", "enabled")
+FEATURE_CACHE_DIR = _config.get("feature_cache", "cache_dir")
+
+# ============ DESTILACIÓN ============
+DISTILL_TEACHER = _config.get("distillation", "teacher")
+DISTILL_STUDENT = _config.get("distillation", "student")
+DISTILL_TEMPERATURE = _config.getfloat("distillation", "temperature")
+DISTILL_ALPHA = _config.getfloat("distillation", "alpha")
+DISTILL_FINE_TUNE_LAYERS = _config.getint("distillation", "fine_tune_layers")
+DISTILL_LEARNING_RATE = _config.getfloat("distillation", "learning_rate")
+
+# ============ COMPRESIÓN ============
+COMPRESSION_METHOD = _config.get("compression", "method")
+TARGET_SPARSITY = _config.getfloat("compression", "target_sparsity")
+NUM_CLUSTERS = _config.getint("compression", "num_clusters")
+COMPRESSION_EPOCHS = _config.getint("compression", "fine_tune_epochs")
+COMPRESSION_LEARNING_RATE = _config.getfloat("compression", "learning_rate")
+SPARSE_TFLITE = _config.getboolean("compression", "sparse_tflite")
+
+# ============ BÚSQUEDA DE HIPERPARÁMETROS ============
+SEARCH_TRIALS = _config.getint("hyperparameter_search", "num_trials")
+SEARCH_MIN_EPOCHS = _config.getint("hyperparameter_search", "min_epochs")
+SEARCH_MAX_EPOCHS = _config.getint("hyperparameter_search", "max_epochs")
+SEARCH_REDUCTION_FACTOR = _config.getint("hyperparameter_search", "reduction_factor")
+SEARCH_CONCURRENT_TRIALS = _config.getint("hyperparameter_search", "concurrent_trials")
+SEARCH_FEATURE_CACHE = _config.getboolean("hyperparameter_search", "feature_cache")
+SEARCH_DIR = _config.get("hyperparameter_search", "search_dir")
+SEARCH_SEED = _config.getint("hyperparameter_search", "seed")
+
+# ============ EVALUACIÓN ============
+EVAL_BATCH_SIZE = _config.getint("evaluation", "batch_size")
+EVAL_TOP_K = _config.getint("evaluation", "top_k")
+EVAL_PREDICTIONS_DIR = _config.get("evaluation", "predictions_dir")
+
+# ============ SERVIDOR DE INFERENCIA ============
+SERVING_HOST = _config.get("serving", "host")
+SERVING_PORT = _config.getint("serving", "port")
+SERVING_MAX_BATCH_SIZE = _config.getint("serving", "max_batch_size")
+SERVING_MAX_WAIT_MS = _config.getfloat("serving", "max_wait_ms")
+
+# ============ INTERFAZ ============
+PERSISTENT_WORKER = _config.getboolean("interface", "persistent_worker")
+STARTUP_REPORT = _config.getboolean("interface", "startup_report")
+MODEL_CACHE_SIZE = _config.getint("interface", "model_cache_size")
@@ -1,65 +1,194 @@
 """
 Script para aumentar el dataset con transformaciones de imágenes.
-Genera múltiples variaciones de cada imagen original.
+Genera múltiples variaciones de cada imagen original repartiendo el trabajo entre varios procesos.
+Las transformaciones afines se aplican con NumPy, una variación a la vez y por franjas de filas,
+por lo que los procesos del pool no necesitan cargar TensorFlow.
 """
 
 import os
-from tensorflow.keras.preprocessing.image import ImageDataGenerator, load_img, img_to_array
+import time
+import zlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import numpy as np
+from PIL import Image
 
 # Directorio de origen y destino
 SOURCE_DIR = "./data/train"
 DEST_DIR = "./data_augmented/train"
 AUGMENTATIONS_PER_IMAGE = 5  # Número de imágenes aumentadas por imagen original
+WORKERS = 0  # Procesos a utilizar (0 = todos los núcleos)
+SEED = 42  # Semilla base: misma semilla y mismas imágenes = mismas salidas
+IMAGES_PER_TASK = 16  # Imágenes que procesa cada tarea del pool
+MAX_PENDING_WRITES = 32  # Escrituras JPEG en vuelo por proceso antes de esperar a que terminen
+TILE_ROWS = 256  # Filas que se transforman juntas; acota la memoria temporal por imagen
 
+# Configuración del aumento de datos (misma semántica que ImageDataGenerator,
+# con relleno "nearest" e interpolación bilineal)
+AUGMENTATION_PARAMS = {
+    "rotation_range": 30,
+    "width_shift_range": 0.2,
+    "height_shift_range": 0.2,
+    "shear_range": 0.2,
+    "zoom_range": 0.2,
+    "horizontal_flip": True
+}
 
-def augment_dataset(source_dir=SOURCE_DIR, dest_dir=DEST_DIR, 
-                    augmentations_per_image=AUGMENTATIONS_PER_IMAGE):
+
+def _transform_seed(seed, class_name, img_name, index):
+    """Semilla determinista para una transformación de una imagen"""
+    return zlib.crc32(f"{seed}/{class_name}/{img_name}/{index}".encode())
+
+
+def _save_jpeg(img_array, path):
+    """Codifica y guarda una imagen en JPEG"""
+    Image.fromarray(img_array).save(path, format="jpeg")
+
+
+def _random_affine(rng, height, width):
+    """
+    Sortea una transformación afín con los rangos de AUGMENTATION_PARAMS.
+
+    Returns:
+        Tupla (matriz 2x2, desplazamiento (x, y), voltear) que lleva coordenadas
+        de salida (relativas al centro) a coordenadas de entrada
+    """
+    params = AUGMENTATION_PARAMS
+    theta = np.deg2rad(rng.uniform(-params["rotation_range"], params["rotation_range"]))
+    shift = np.array([rng.uniform(-params["width_shift_range"], params["width_shift_range"]) * width,
+                      rng.uniform(-params["height_shift_range"], params["height_shift_range"]) * height])
+    shear = np.deg2rad(rng.uniform(-params["shear_range"], params["shear_range"]))
+    zoom_x, zoom_y = rng.uniform(1 - params["zoom_range"], 1 + params["zoom_range"], 2)
+    flip = params["horizontal_flip"] and rng.random() < 0.5
+
+    rotation = np.array([[np.cos(theta), -np.sin(theta)], [np.sin(theta), np.cos(theta)]])
+    shearing = np.array([[1.0, -np.sin(shear)], [0.0, np.cos(shear)]])
+    return rotation @ shearing @ np.diag([zoom_x, zoom_y]), shift, flip
+
+
+def augment_image(img_array, seed):
+    """
+    Genera una variación de la imagen con una transformación afín vectorizada.
+
+    La imagen de salida se calcula por franjas de TILE_ROWS filas, así la memoria
+    temporal queda acotada por el tamaño de la imagen y no crece con su resolución
+    multiplicada por el número de variaciones.
+
+    Args:
+        img_array: Imagen uint8 (alto, ancho, canales)
+        seed: Semilla de la transformación
+
+    Returns:
+        Imagen uint8 (alto, ancho, canales)
+    """
+    height, width = img_array.shape[:2]
+    matrix, shift, flip = _random_affine(np.random.default_rng(seed), height, width)
+    output = np.empty_like(img_array)
+
+    # Coordenadas de salida respecto al centro (el volteo se aplica sobre la salida)
+    center_x, center_y = (width - 1) / 2, (height - 1) / 2
+    xs = np.arange(width, dtype=np.float32)
+    out_x = (center_x - xs) if flip else (xs - center_x)
+
+    for row in range(0, height, TILE_ROWS):
+        out_y = (np.arange(row, min(row + TILE_ROWS, height), dtype=np.float32) - center_y)[:, None]
+
+        # Coordenadas de entrada; recortarlas a los bordes equivale a fill_mode="nearest"
+        src_x = np.clip(matrix[0, 0] * out_x + matrix[0, 1] * out_y + center_x + shift[0],
+                        0, width - 1).astype(np.float32)
+        src_y = np.clip(matrix[1, 0] * out_x + matrix[1, 1] * out_y + center_y + shift[1],
+                        0, height - 1).astype(np.float32)
+
+        # Interpolación bilineal de la franja
+        x0, y0 = np.floor(src_x).astype(np.int32), np.floor(src_y).astype(np.int32)
+        x1, y1 = np.minimum(x0 + 1, width - 1), np.minimum(y0 + 1, height - 1)
+        wx, wy = (src_x - x0)[..., None], (src_y - y0)[..., None]
+        top = img_array[y0, x0] * (1 - wx) + img_array[y0, x1] * wx
+        bottom = img_array[y1, x0] * (1 - wx) + img_array[y1, x1] * wx
+        output[row:row + len(out_y)] = np.clip(np.rint(top * (1 - wy) + bottom * wy), 0, 255)
+    return output
+
+
+def _augment_task(task):
+    """
+    Aumenta un lote de imágenes de una clase dentro de un proceso del pool.
+
+    La codificación JPEG corre en hilos aparte para solaparse con las
+    transformaciones de la siguiente imagen. Como mucho MAX_PENDING_WRITES
+    imágenes esperan a ser escritas, lo que acota la memoria del proceso.
+
+    Returns:
+        Tupla (imágenes procesadas, imágenes generadas)
+    """
+    class_name, class_source_dir, class_dest_dir, img_names, augmentations_per_image, seed = task
+
+    generated = 0
+    with ThreadPoolExecutor(max_workers=2) as writer:
+        pending = []
+        for img_name in img_names:
+            with Image.open(os.path.join(class_source_dir, img_name)) as img:
+                img_array = np.asarray(img.convert("RGB"))
+
+            stem = os.path.splitext(img_name)[0]
+            for i in range(augmentations_per_image):
+                augmented = augment_image(img_array, _transform_seed(seed, class_name, img_name, i))
+                path = os.path.join(class_dest_dir, f"{class_name}_{stem}_{i}.jpeg")
+                pending.append(writer.submit(_save_jpeg, augmented, path))
+                generated += 1
+
+                # Esperar a las escrituras más antiguas si hay demasiadas en vuelo
+                while len(pending) > MAX_PENDING_WRITES:
+                    pending.pop(0).result()
+
+        for future in pending:
+            future.result()
+
+    return len(img_names), generated
+
+
+def augment_dataset(source_dir=SOURCE_DIR, dest_dir=DEST_DIR,
+                    augmentations_per_image=AUGMENTATIONS_PER_IMAGE,
+                    workers=WORKERS, seed=SEED):
     """Genera imágenes aumentadas a partir del dataset original"""
-    
+
     # Crear el directorio de destino si no existe
     if not os.path.exists(dest_dir):
         os.makedirs(dest_dir)
 
-    # Configuración del aumento de datos
-    data_gen = ImageDataGenerator(
-        rotation_range=30,
-        width_shift_range=0.2,
-        height_shift_range=0.2,
-        shear_range=0.2,
-        zoom_range=0.2,
-        horizontal_flip=True,
-        fill_mode='nearest'
-    )
-
-    # Procesar cada clase en el directorio de origen
-    for class_name in os.listdir(source_dir):
+    # Repartir las imágenes de cada clase en tareas para el pool
+    tasks = []
+    for class_name in sorted(os.listdir(source_dir)):
         class_source_dir = os.path.join(source_dir, class_name)
         class_dest_dir = os.path.join(dest_dir, class_name)
 
+        # Verificar que sea un directorio
+        if not os.path.isdir(class_source_dir):
+            continue
+
         # Crear el directorio de la clase en el destino
         if not os.path.exists(class_dest_dir):
             os.makedirs(class_dest_dir)
 
-        # Verificar que sea un directorio
-        if os.path.isdir(class_source_dir):
-            for img_name in os.listdir(class_source_dir):
-                img_path = os.path.join(class_source_dir, img_name)
-
-                # Leer la imagen
-                img = load_img(img_path)
-                img_array = img_to_array(img)
-                img_array = img_array.reshape((1,) + img_array.shape)
-
-                # Generar imágenes aumentadas
-                i = 0
-                for batch in data_gen.flow(img_array, batch_size=1, 
-                                           save_to_dir=class_dest_dir, 
-                                           save_prefix=f"{class_name}", 
-                                           save_format="jpeg"):
-                    i += 1
-                    if i >= augmentations_per_image:
-                        break
+        img_names = sorted(os.listdir(class_source_dir))
+        for i in range(0, len(img_names), IMAGES_PER_TASK):
+            tasks.append((class_name, class_source_dir, class_dest_dir,
+                          img_names[i:i + IMAGES_PER_TASK], augmentations_per_image, seed))
+
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    processed, generated = 0, 0
+
+    # "spawn" evita heredar el estado del proceso padre (p. ej. TensorFlow si se llama desde main.py)
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        for task_processed, task_generated in executor.map(_augment_task, tasks):
+            processed += task_processed
+            generated += task_generated
+            print(f"\rImágenes procesadas: {processed}", end="", flush=True)
 
+    elapsed = max(time.perf_counter() - start, 1e-9)
+    print(f"\nSe generaron {generated} imágenes a partir de {processed} originales "
+          f"en {elapsed:.1f}s con {workers} procesos ({generated / elapsed:.1f} imágenes/s).")
     print(f"Aumento de datos completado. Las imágenes aumentadas se guardaron en: {dest_dir}")
 
 
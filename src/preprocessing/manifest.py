@@ -0,0 +1,72 @@
+""" Manifiesto persistente del dataset dividido (ruta, tamaño, mtime, hash y split). """
+
+import os
+import json
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+
+SPLITS = ("train", "val", "test")
+
+
+class DatasetManifest:
+    """
+    Registro de cada imagen de origen y el split al que fue asignada.
+
+    Las entradas se indexan por ruta relativa a la carpeta de origen ("clase/imagen.jpg")
+    y guardan: size, mtime (ns), hash, class y split. Un split None indica que la
+    imagen se descartó por duplicada; si además tiene "excluded", el motivo de la
+    exclusión (p. ej. un casi duplicado que une imágenes de splits distintos).
+    """
+
+    def __init__(self, dest_dir):
+        self.path = os.path.join(dest_dir, MANIFEST_NAME)
+        self.entries = {}
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == MANIFEST_VERSION:
+                self.entries = data["entries"]
+
+    def __len__(self):
+        return len(self.entries)
+
+    def is_unchanged(self, rel_path, size, mtime):
+        """Indica si la imagen ya está registrada con el mismo tamaño y mtime"""
+        entry = self.entries.get(rel_path)
+        return entry is not None and entry["size"] == size and entry["mtime"] == mtime
+
+    def split_by_hash(self):
+        """Mapeo hash -> split de las imágenes colocadas"""
+        return {
+            entry["hash"]: entry["split"]
+            for entry in self.entries.values() if entry["split"] is not None
+        }
+
+    def split_counts(self):
+        """Cantidad de imágenes colocadas por clase y split"""
+        counts = {}
+        for entry in self.entries.values():
+            if entry["split"] is not None:
+                class_counts = counts.setdefault(entry["class"], dict.fromkeys(SPLITS, 0))
+                class_counts[entry["split"]] += 1
+        return counts
+
+    def set(self, rel_path, size, mtime, img_hash, class_name, split, **extra):
+        """Registra o actualiza una imagen"""
+        self.entries[rel_path] = {
+            "size": size, "mtime": mtime, "hash": img_hash,
+            "class": class_name, "split": split, **extra
+        }
+
+    def remove(self, rel_path):
+        """Elimina una imagen del manifiesto y devuelve su entrada"""
+        return self.entries.pop(rel_path, None)
+
+    def save(self):
+        """Guarda el manifiesto de forma atómica"""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": MANIFEST_VERSION, "entries": self.entries}, f)
+        os.replace(tmp_path, self.path)
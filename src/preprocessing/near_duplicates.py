@@ -0,0 +1,143 @@
+"""
+Detección de imágenes casi duplicadas (recodificadas, redimensionadas o recortadas).
+Usa dHash calculado con NumPy y un BK-tree para buscar vecinos por distancia de Hamming.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from PIL import Image
+
+# Lado de la grilla del dHash (8 -> hash de 64 bits)
+DHASH_SIZE = 8
+
+# Cantidad de imágenes que procesa cada tarea del pool
+DHASH_CHUNK = 64
+
+
+def hamming_distance(a, b):
+    """Cantidad de bits distintos entre dos hashes"""
+    return bin(a ^ b).count("1")
+
+
+def dhash_images(image_paths):
+    """
+    Calcula el dHash de un lote de imágenes de forma vectorizada.
+
+    Returns:
+        Lista de hashes (int de 64 bits) o None si la imagen no se pudo leer
+    """
+    pixels = np.zeros((len(image_paths), DHASH_SIZE, DHASH_SIZE + 1), dtype=np.float32)
+    valid = np.ones(len(image_paths), dtype=bool)
+    for i, path in enumerate(image_paths):
+        try:
+            with Image.open(path) as img:
+                # Decodificar JPEG directamente a baja resolución
+                img.draft("L", (8 * DHASH_SIZE, 8 * DHASH_SIZE))
+                small = img.convert("L").resize((DHASH_SIZE + 1, DHASH_SIZE), Image.BILINEAR)
+                pixels[i] = np.asarray(small, dtype=np.float32)
+        except (OSError, ValueError):
+            valid[i] = False
+
+    bits = pixels[:, :, 1:] > pixels[:, :, :-1]
+    packed = np.packbits(bits.reshape(len(image_paths), -1), axis=1)
+    values = packed.view(">u8").ravel()
+    return [int(value) if ok else None for value, ok in zip(values, valid)]
+
+
+def compute_dhashes(image_paths, workers, progress=None):
+    """
+    Calcula los dHash de muchas imágenes en paralelo.
+
+    Args:
+        image_paths: Lista de rutas de imágenes
+        workers: Cantidad de procesos
+        progress: Objeto opcional con método update(count) para informar avance
+
+    Returns:
+        Lista de hashes en el mismo orden que image_paths
+    """
+    chunks = [image_paths[i:i + DHASH_CHUNK] for i in range(0, len(image_paths), DHASH_CHUNK)]
+    hashes = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for chunk, chunk_hashes in zip(chunks, executor.map(dhash_images, chunks)):
+            hashes.extend(chunk_hashes)
+            if progress is not None:
+                progress.update(len(chunk))
+    return hashes
+
+
+class BKTree:
+    """
+    Árbol BK sobre distancia de Hamming.
+
+    Permite encontrar todos los hashes a distancia <= radio sin comparar contra
+    todo el índice: cada nodo solo explora los hijos cuya distancia al nodo está
+    en [d - radio, d + radio].
+    """
+
+    def __init__(self):
+        self.root = None
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def add(self, value, key):
+        """Inserta un hash asociado a una clave (p. ej. la ruta de la imagen)"""
+        self.size += 1
+        if self.root is None:
+            self.root = (value, [key], {})
+            return
+        node = self.root
+        while True:
+            distance = hamming_distance(value, node[0])
+            if distance == 0:
+                node[1].append(key)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = (value, [key], {})
+                return
+            node = child
+
+    def search(self, value, radius):
+        """Devuelve las claves cuyo hash está a distancia <= radius"""
+        if self.root is None:
+            return []
+        results = []
+        stack = [self.root]
+        while stack:
+            node_value, keys, children = stack.pop()
+            distance = hamming_distance(value, node_value)
+            if distance <= radius:
+                results.extend(keys)
+            for child_distance, child in children.items():
+                if distance - radius <= child_distance <= distance + radius:
+                    stack.append(child)
+        return results
+
+
+class UnionFind:
+    """Conjuntos disjuntos para agrupar claves por transitividad"""
+
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, key):
+        self.parent.setdefault(key, key)
+        while self.parent[key] != key:
+            self.parent[key] = self.parent[self.parent[key]]
+            key = self.parent[key]
+        return key
+
+    def union(self, a, b):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            self.parent[root_b] = root_a
+
+    def groups(self):
+        """Grupos con más de un elemento"""
+        groups = {}
+        for key in self.parent:
+            groups.setdefault(self.find(key), []).append(key)
+        return [members for members in groups.values() if len(members) > 1]
@@ -0,0 +1,193 @@
+"""
+Empaqueta train/val/test en shards de imágenes ya redimensionadas.
+
+Cada split se guarda como varios arreglos uint8 (.npy) de tamaño acotado, con las
+etiquetas en un .npy aparte y un index.json que describe los shards. El entrenamiento
+con data_loader = packed los lee mapeados a memoria, sin decodificar ningún JPEG.
+
+Cada shard guarda la suma de control de sus imágenes de origen (ruta, tamaño y fecha
+de modificación), así que al volver a empaquetar solo se reescriben los que cambiaron.
+
+Las imágenes se reparten entre los shards en un orden pseudoaleatorio fijo (según la
+semilla guardada en el índice) para que cada shard mezcle todas las clases.
+"""
+
+import os
+import json
+import time
+import hashlib
+import numpy as np
+import tensorflow as tf
+
+# Importar configuración desde archivo centralizado
+from src.config import (
+    IMG_SIZE, TRAIN_DIR, VAL_DIR, TEST_DIR, PACKED_DIR, SHARD_SIZE_MB
+)
+
+from src.training.data_pipeline import get_class_indices, list_image_files, decode_image
+
+INDEX_VERSION = 2
+INDEX_FILE = "index.json"
+
+# Semilla del orden de las imágenes dentro de los shards
+ORDER_SEED = 42
+
+# Imágenes decodificadas por lote al escribir un shard
+PACK_BATCH_SIZE = 64
+
+
+def _shuffle_order(paths, root, seed=ORDER_SEED):
+    """
+    Orden pseudoaleatorio estable de las imágenes de un split.
+
+    Cada imagen se ordena por el hash de su ruta relativa y la semilla: el orden no
+    depende del resto de las imágenes, así que agregar una no reordena las demás.
+    """
+    def key(i):
+        rel_path = os.path.relpath(paths[i], root)
+        return hashlib.md5(f"{seed}|{rel_path}".encode()).hexdigest()
+    return sorted(range(len(paths)), key=key)
+
+
+def _shard_checksum(paths, labels, root, img_size):
+    """Suma de control de las imágenes de origen de un shard"""
+    digest = hashlib.md5(f"{INDEX_VERSION}|{tuple(img_size)}".encode())
+    for path, label in zip(paths, labels):
+        stat = os.stat(path)
+        rel_path = os.path.relpath(path, root)
+        digest.update(f"{rel_path}|{label}|{stat.st_size}|{stat.st_mtime_ns}".encode())
+    return digest.hexdigest()
+
+
+def _write_shard(paths, labels, images_path, labels_path, img_size):
+    """Decodifica las imágenes en paralelo y las escribe en un .npy uint8"""
+    tmp_path = images_path + ".tmp"
+    images = np.lib.format.open_memmap(
+        tmp_path, mode="w+", dtype=np.uint8, shape=(len(paths), *img_size, 3)
+    )
+    dataset = tf.data.Dataset.from_tensor_slices(paths).map(
+        lambda path: decode_image(path, img_size), num_parallel_calls=tf.data.AUTOTUNE
+    ).batch(PACK_BATCH_SIZE).prefetch(tf.data.AUTOTUNE)
+
+    offset = 0
+    for batch in dataset:
+        images[offset:offset + len(batch)] = batch.numpy()
+        offset += len(batch)
+    images.flush()
+    del images
+    os.replace(tmp_path, images_path)
+
+    tmp_path = labels_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, np.asarray(labels, dtype=np.int32))
+    os.replace(tmp_path, labels_path)
+
+
+def load_index(split_dir):
+    """Lee el índice de un split empaquetado (None si no existe)"""
+    index_path = os.path.join(split_dir, INDEX_FILE)
+    if not os.path.exists(index_path):
+        return None
+    with open(index_path, "r", encoding="utf-8") as f:
+        index = json.load(f)
+    return index if index.get("version") == INDEX_VERSION else None
+
+
+def pack_split(source_dir, split_dir, class_indices, img_size=IMG_SIZE, shard_size_mb=SHARD_SIZE_MB):
+    """
+    Empaqueta un split en shards, reutilizando los que no cambiaron.
+
+    Args:
+        source_dir: Carpeta del split con una subcarpeta por clase
+        split_dir: Carpeta de salida de los shards
+        class_indices: Mapeo clase -> índice compartido entre los splits
+        img_size: Tamaño al que se redimensionan las imágenes
+        shard_size_mb: Tamaño máximo de cada shard
+
+    Returns:
+        Tupla (shards escritos, shards reutilizados)
+    """
+    paths, labels = list_image_files(source_dir, class_indices)
+    # list_image_files agrupa por clase: sin mezclar, cada shard tendría casi una sola clase
+    order = _shuffle_order(paths, source_dir)
+    paths = [paths[i] for i in order]
+    labels = [labels[i] for i in order]
+    os.makedirs(split_dir, exist_ok=True)
+
+    image_bytes = img_size[0] * img_size[1] * 3
+    per_shard = max(1, int(shard_size_mb * 1e6) // image_bytes)
+
+    previous = load_index(split_dir) or {"shards": []}
+    previous_checksums = {shard["images"]: shard["checksum"] for shard in previous["shards"]}
+
+    shards = []
+    written = reused = 0
+    for shard_idx, start in enumerate(range(0, len(paths), per_shard)):
+        shard_paths = paths[start:start + per_shard]
+        shard_labels = labels[start:start + per_shard]
+        name = f"shard_{shard_idx:05d}"
+        images_file, labels_file = f"{name}.npy", f"{name}_labels.npy"
+        checksum = _shard_checksum(shard_paths, shard_labels, source_dir, img_size)
+
+        unchanged = (
+            previous_checksums.get(images_file) == checksum
+            and os.path.exists(os.path.join(split_dir, images_file))
+            and os.path.exists(os.path.join(split_dir, labels_file))
+        )
+        if unchanged:
+            reused += 1
+        else:
+            _write_shard(shard_paths, shard_labels, os.path.join(split_dir, images_file),
+                         os.path.join(split_dir, labels_file), img_size)
+            written += 1
+        shards.append({
+            "images": images_file, "labels": labels_file,
+            "count": len(shard_paths), "checksum": checksum
+        })
+
+    # Borrar shards sobrantes de un empaquetado anterior más grande
+    current = {name for shard in shards for name in (shard["images"], shard["labels"])}
+    for shard in previous["shards"]:
+        for name in (shard["images"], shard["labels"]):
+            if name not in current and os.path.exists(os.path.join(split_dir, name)):
+                os.remove(os.path.join(split_dir, name))
+
+    index = {
+        "version": INDEX_VERSION,
+        "img_size": list(img_size),
+        "order_seed": ORDER_SEED,
+        "class_indices": class_indices,
+        "num_images": len(paths),
+        "shards": shards
+    }
+    tmp_path = os.path.join(split_dir, INDEX_FILE + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=2)
+    os.replace(tmp_path, os.path.join(split_dir, INDEX_FILE))
+    return written, reused
+
+
+def pack_dataset(train_dir=TRAIN_DIR, val_dir=VAL_DIR, test_dir=TEST_DIR, packed_dir=PACKED_DIR,
+                 img_size=IMG_SIZE, shard_size_mb=SHARD_SIZE_MB):
+    """
+    Empaqueta los tres splits en packed_dir/{train,val,test}.
+
+    Los índices de clase se toman de train_dir para que coincidan en los tres splits.
+    """
+    class_indices = get_class_indices(train_dir)
+    start = time.perf_counter()
+
+    for split, source_dir in (("train", train_dir), ("val", val_dir), ("test", test_dir)):
+        if not os.path.isdir(source_dir):
+            print(f"Aviso: no existe {source_dir}, se omite el split {split}.")
+            continue
+        written, reused = pack_split(
+            source_dir, os.path.join(packed_dir, split), class_indices, img_size, shard_size_mb
+        )
+        print(f"{split}: {written} shards escritos, {reused} sin cambios")
+
+    print(f"\nDataset empaquetado en {packed_dir} ({time.perf_counter() - start:.1f}s).")
+
+
+if __name__ == "__main__":
+    pack_dataset()
@@ -1,81 +1,475 @@
 """ Script para dividir y eliminar duplicados del dataset en conjuntos de entrenamiento, validación y prueba."""
 
 import os
+import sys
+import time
 import shutil
 import random
+import json
 import hashlib
+from concurrent.futures import ProcessPoolExecutor
 
 # Importar configuración desde archivo centralizado
 from src.config import (
     SOURCE_DIR, DATA_DIR,
-    TRAIN_SPLIT, VAL_SPLIT, TEST_SPLIT
+    TRAIN_SPLIT, VAL_SPLIT, TEST_SPLIT,
+    SPLIT_PLACEMENT, HASH_WORKERS, NEAR_DUPLICATE_DISTANCE
 )
 
+from src.preprocessing.manifest import DatasetManifest, SPLITS
+from src.preprocessing.near_duplicates import BKTree, UnionFind, compute_dhashes
 
-def calculate_image_hash(image_path):
-    """Función para calcular el hash de una imagen"""
+# Reporte de grupos de casi duplicados dentro de la carpeta de destino
+NEAR_DUPLICATES_REPORT = "near_duplicates.json"
+
+# Motivo de exclusión de una imagen que une casi duplicados de splits distintos
+BRIDGE_EXCLUSION = "near_duplicate_bridge"
+
+# Tamaño de bloque para leer las imágenes al calcular el hash
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Ioctl de Linux para clonar un archivo (reflink)
+FICLONE = 0x40049409
+
+PLACEMENT_MODES = ("auto", "hardlink", "reflink", "symlink", "copy")
+
+
+def calculate_image_hash(image_path, chunk_size=HASH_CHUNK_SIZE):
+    """Función para calcular el hash de una imagen leyendo por bloques"""
+    img_hash = hashlib.md5()
     with open(image_path, "rb") as f:
-        img_hash = hashlib.md5(f.read()).hexdigest()
-    return img_hash
-
-
-def split_dataset(source_dir=SOURCE_DIR, dest_dir=DATA_DIR, 
-                  train_split=TRAIN_SPLIT, val_split=VAL_SPLIT):
-    """Divide el dataset en train, val y test eliminando duplicados"""
-    
-    # Crear carpetas de destino
-    for split in ["train", "val", "test"]:
-        split_dir = os.path.join(dest_dir, split)
-        if not os.path.exists(split_dir):
-            os.makedirs(split_dir)
-
-    # Almacenar hashes para evitar duplicados
-    image_hashes = set()
-
-    # Recorrer las clases en la carpeta de origen
-    for class_name in os.listdir(source_dir):
-        class_dir = os.path.join(source_dir, class_name)
-        if os.path.isdir(class_dir):
-            # Crear carpetas para la clase en train, val y test
-            for split in ["train", "val", "test"]:
-                split_class_dir = os.path.join(dest_dir, split, class_name)
-                if not os.path.exists(split_class_dir):
-                    os.makedirs(split_class_dir)
-
-            # Obtener todas las imágenes de la clase
-            images = os.listdir(class_dir)
-            random.shuffle(images)  # Mezclar las imágenes aleatoriamente
-
-            # Filtrar imágenes duplicadas
-            unique_images = []
-            for img_name in images:
-                img_path = os.path.join(class_dir, img_name)
-                img_hash = calculate_image_hash(img_path)
-                if img_hash not in image_hashes:
-                    image_hashes.add(img_hash)
-                    unique_images.append(img_name)
-
-            # Calcular cantidades para cada conjunto
-            total_images = len(unique_images)
-            train_count = int(total_images * train_split)
-            val_count = int(total_images * val_split)
-
-            # Dividir las imágenes
-            train_images = unique_images[:train_count]
-            val_images = unique_images[train_count:train_count + val_count]
-            test_images = unique_images[train_count + val_count:]
-
-            # Copiar las imágenes a las carpetas correspondientes
-            for img_name in train_images:
-                shutil.copy(os.path.join(class_dir, img_name), 
-                           os.path.join(dest_dir, "train", class_name, img_name))
-            for img_name in val_images:
-                shutil.copy(os.path.join(class_dir, img_name), 
-                           os.path.join(dest_dir, "val", class_name, img_name))
-            for img_name in test_images:
-                shutil.copy(os.path.join(class_dir, img_name), 
-                           os.path.join(dest_dir, "test", class_name, img_name))
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            img_hash.update(chunk)
+    return img_hash.hexdigest()
+
+
+class ProgressReporter:
+    """Muestra progreso y throughput de una tarea sobre muchos archivos"""
+
+    def __init__(self, label, total, interval=1.0):
+        self.label = label
+        self.total = total
+        self.interval = interval
+        self.done = 0
+        self.bytes = 0
+        self.start = time.perf_counter()
+        self._last_print = 0.0
+
+    def update(self, count=1, nbytes=0):
+        self.done += count
+        self.bytes += nbytes
+        now = time.perf_counter()
+        if now - self._last_print >= self.interval or self.done == self.total:
+            self._last_print = now
+            elapsed = max(now - self.start, 1e-9)
+            sys.stdout.write(
+                f"\r{self.label}: {self.done}/{self.total} "
+                f"({self.done / elapsed:.0f} archivos/s, {self.bytes / elapsed / 1e6:.1f} MB/s)"
+            )
+            sys.stdout.flush()
+
+    def finish(self):
+        elapsed = max(time.perf_counter() - self.start, 1e-9)
+        if self.total:
+            sys.stdout.write("\n")
+        print(
+            f"{self.label} completado: {self.done} archivos, {self.bytes / 1e6:.1f} MB "
+            f"en {elapsed:.1f}s ({self.done / elapsed:.0f} archivos/s)"
+        )
+        return elapsed
+
+
+def hash_images(image_paths, workers=HASH_WORKERS):
+    """
+    Calcula los hashes de muchas imágenes en paralelo con un pool de procesos.
+
+    Args:
+        image_paths: Lista de rutas de imágenes
+        workers: Cantidad de procesos (0 = todos los núcleos)
+
+    Returns:
+        Lista de hashes en el mismo orden que image_paths
+    """
+    workers = workers or os.cpu_count() or 1
+    progress = ProgressReporter("Calculando hashes", len(image_paths))
+    hashes = []
+    chunksize = max(1, min(256, len(image_paths) // (workers * 8) or 1))
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(calculate_image_hash, image_paths, chunksize=chunksize)
+        for path, img_hash in zip(image_paths, results):
+            hashes.append(img_hash)
+            progress.update(nbytes=os.path.getsize(path))
+
+    progress.finish()
+    return hashes
+
+
+def _reflink(src, dst):
+    """Clona src en dst compartiendo bloques (copy-on-write)"""
+    import fcntl
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        try:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        except OSError:
+            fdst.close()
+            os.remove(dst)
+            raise
+
+
+def place_file(src, dst, mode=SPLIT_PLACEMENT):
+    """
+    Coloca una imagen en su split sin copiar bytes cuando el sistema lo permite.
+
+    Args:
+        src: Ruta de la imagen original
+        dst: Ruta de destino
+        mode: "auto", "hardlink", "reflink", "symlink" o "copy"
+
+    Returns:
+        Método efectivamente utilizado
+    """
+    if mode not in PLACEMENT_MODES:
+        raise ValueError(f"Modo '{mode}' no soportado. Opciones: {list(PLACEMENT_MODES)}")
+
+    if os.path.lexists(dst):
+        os.remove(dst)
+
+    methods = ("hardlink", "reflink", "symlink", "copy") if mode == "auto" else (mode,)
+    for method in methods:
+        try:
+            if method == "hardlink":
+                os.link(src, dst)
+            elif method == "reflink":
+                _reflink(src, dst)
+            elif method == "symlink":
+                os.symlink(os.path.abspath(src), dst)
+            else:
+                shutil.copy(src, dst)
+            return method
+        except (OSError, ImportError, NotImplementedError):
+            if method == methods[-1]:
+                raise
+    return None
+
+
+def scan_source(source_dir):
+    """
+    Recorre la carpeta de origen sin leer el contenido de las imágenes.
+
+    Returns:
+        Diccionario {"clase/imagen": (clase, imagen, tamaño, mtime_ns)}
+    """
+    files = {}
+    for class_entry in os.scandir(source_dir):
+        if not class_entry.is_dir():
+            continue
+        for entry in os.scandir(class_entry.path):
+            if entry.is_file():
+                stat = entry.stat()
+                files[f"{class_entry.name}/{entry.name}"] = (
+                    class_entry.name, entry.name, stat.st_size, stat.st_mtime_ns
+                )
+    return files
+
+
+def choose_split(class_counts, split_ratios):
+    """Elige el split más por debajo de su proporción objetivo para una clase"""
+    total = sum(class_counts.values()) + 1
+    return max(SPLITS, key=lambda split: split_ratios[split] * total - class_counts[split])
+
+
+def _placed_path(dest_dir, rel_path, entry):
+    """Ruta donde quedó colocada una imagen del manifiesto"""
+    img_name = rel_path[len(entry["class"]) + 1:]
+    return os.path.join(dest_dir, entry["split"], entry["class"], img_name)
+
+
+def _remove_placed(dest_dir, rel_path, entry):
+    """Borra del split la imagen colocada para una entrada del manifiesto"""
+    if entry and entry["split"] is not None:
+        placed = _placed_path(dest_dir, rel_path, entry)
+        if os.path.lexists(placed):
+            os.remove(placed)
+
+
+def _compute_phashes(paths, workers):
+    """Calcula los dHash (en hexadecimal) de una lista de imágenes en paralelo"""
+    progress = ProgressReporter("Calculando hashes perceptuales", len(paths))
+    hashes = compute_dhashes(paths, workers or os.cpu_count() or 1, progress)
+    progress.finish()
+    return [None if value is None else f"{value:016x}" for value in hashes]
+
+
+def group_new_images(candidates, phashes, tree, manifest, radius):
+    """
+    Agrupa las imágenes por asignar con sus casi duplicados antes de elegir splits.
+
+    Args:
+        candidates: Imágenes sin split, en el orden en que se asignan
+        phashes: Diccionario {imagen: dHash en hexadecimal}
+        tree: BKTree de las imágenes ya asignadas (None si no se detectan casi duplicados)
+        manifest: Manifiesto con el split de las imágenes del árbol
+        radius: Distancia de Hamming máxima
+
+    Returns:
+        Lista de (imágenes del grupo, splits de sus casi duplicados ya asignados)
+    """
+    groups = UnionFind()
+    neighbor_splits = {}
+    new_tree = BKTree()
+    for key in candidates:
+        groups.find(key)
+        phash = phashes.get(key)
+        if tree is None or phash is None:
+            continue
+        value = int(phash, 16)
+        for other in new_tree.search(value, radius):
+            groups.union(other, key)
+        neighbor_splits[key] = {manifest.entries[n]["split"] for n in tree.search(value, radius)}
+        new_tree.add(value, key)
+
+    components = {}
+    for key in candidates:
+        members, splits = components.setdefault(groups.find(key), ([], set()))
+        members.append(key)
+        splits.update(neighbor_splits.get(key, ()))
+    return list(components.values())
+
+
+def update_near_duplicate_clusters(manifest, tree, new_keys, radius):
+    """
+    Une las imágenes nuevas con sus casi duplicados y registra el grupo de cada una.
+
+    Los grupos ya conocidos se leen del campo "cluster" del manifiesto, por lo que
+    solo hace falta buscar vecinos de las imágenes nuevas. Las imágenes nuevas ya
+    recibieron el split de su grupo (ver group_new_images), así que solo pueden
+    quedar grupos repartidos entre splits si vienen de manifiestos anteriores a la
+    detección de casi duplicados; se informan como conflicto sin mover imágenes.
+
+    Returns:
+        Tupla (grupos, conflictos) donde conflictos son los grupos con más de un split
+    """
+    groups = UnionFind()
+    first_member = {}
+    for key, entry in manifest.entries.items():
+        cluster = entry.get("cluster")
+        if cluster is not None and entry["split"] is not None:
+            if cluster in first_member:
+                groups.union(first_member[cluster], key)
+            else:
+                first_member[cluster] = key
+
+    for key in new_keys:
+        for neighbor in tree.search(int(manifest.entries[key]["phash"], 16), radius):
+            groups.union(key, neighbor)
+
+    for entry in manifest.entries.values():
+        entry.pop("cluster", None)
+
+    new_keys = set(new_keys)
+    clusters = groups.groups()
+    conflicts = []
+    for members in clusters:
+        # El identificador del grupo es una imagen que ya estaba asignada (estable entre ejecuciones)
+        members.sort(key=lambda key: (key in new_keys, key))
+        for key in members:
+            manifest.entries[key]["cluster"] = members[0]
+        if len({manifest.entries[key]["split"] for key in members}) > 1:
+            conflicts.append(members)
+    return clusters, conflicts
+
+
+def write_near_duplicates_report(manifest, dest_dir):
+    """Guarda en dest_dir los grupos de casi duplicados registrados en el manifiesto"""
+    clusters = {}
+    for rel_path, entry in manifest.entries.items():
+        if entry.get("cluster") is not None:
+            cluster = clusters.setdefault(entry["cluster"], {"splits": [], "images": []})
+            cluster["images"].append(rel_path)
+            if entry["split"] not in cluster["splits"]:
+                cluster["splits"].append(entry["split"])
+    report = sorted(clusters.values(), key=lambda c: -len(c["images"]))
+    with open(os.path.join(dest_dir, NEAR_DUPLICATES_REPORT), "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    return report
+
+
+def split_dataset(source_dir=SOURCE_DIR, dest_dir=DATA_DIR,
+                  train_split=TRAIN_SPLIT, val_split=VAL_SPLIT,
+                  placement=SPLIT_PLACEMENT, workers=HASH_WORKERS,
+                  near_duplicate_distance=NEAR_DUPLICATE_DISTANCE):
+    """
+    Divide el dataset en train, val y test eliminando duplicados.
+
+    Es incremental: el manifiesto en dest_dir recuerda el hash y el split de cada
+    imagen, por lo que solo se procesan las imágenes nuevas o modificadas y las ya
+    asignadas conservan su split. Un hash conocido nunca cambia de split.
+
+    Las imágenes casi duplicadas (dHash a distancia <= near_duplicate_distance)
+    se agrupan antes de elegir splits y cada grupo se asigna entero a un único
+    split. Una imagen nueva cuyos casi duplicados ya están en splits distintos se
+    excluye (split None, como los duplicados exactos) y se vuelve a evaluar en las
+    siguientes ejecuciones.
+    """
+    split_ratios = {"train": train_split, "val": val_split, "test": 1.0 - train_split - val_split}
+    manifest = DatasetManifest(dest_dir)
+    source_files = scan_source(source_dir)
+
+    # Crear carpetas para cada clase en train, val y test
+    for class_name in {info[0] for info in source_files.values()}:
+        for split in SPLITS:
+            os.makedirs(os.path.join(dest_dir, split, class_name), exist_ok=True)
+
+    # Quitar las imágenes que ya no existen en el origen
+    removed_splits = {}
+    removed = [rel_path for rel_path in manifest.entries if rel_path not in source_files]
+    for rel_path in removed:
+        entry = manifest.remove(rel_path)
+        if entry["split"] is not None:
+            removed_splits[entry["hash"]] = entry["split"]
+        _remove_placed(dest_dir, rel_path, entry)
+
+    # Imágenes nuevas o modificadas desde la última ejecución
+    pending = [
+        rel_path for rel_path, (_, _, size, mtime) in source_files.items()
+        if not manifest.is_unchanged(rel_path, size, mtime)
+    ]
+    previous = {}
+    for rel_path in pending:
+        if rel_path in manifest.entries:
+            previous[rel_path] = manifest.remove(rel_path)
+            _remove_placed(dest_dir, rel_path, previous[rel_path])
+    random.shuffle(pending)  # Mezclar las imágenes aleatoriamente
+
+    known_splits = manifest.split_by_hash()
+    counts = manifest.split_counts()
+    to_place = {}
+
+    # Imágenes excluidas por unir splits en una ejecución anterior: se vuelven a evaluar
+    retry = [rel_path for rel_path, entry in manifest.entries.items()
+             if entry.get("excluded") == BRIDGE_EXCLUSION]
+    retry_hashes = {manifest.entries[rel_path]["hash"] for rel_path in retry}
+
+    # Duplicados cuyo original se eliminó: uno de ellos hereda su split
+    for rel_path, entry in manifest.entries.items():
+        if (entry["split"] is None and "excluded" not in entry
+                and entry["hash"] not in known_splits and entry["hash"] not in retry_hashes):
+            class_counts = counts.setdefault(entry["class"], dict.fromkeys(SPLITS, 0))
+            split = removed_splits.get(entry["hash"]) or choose_split(class_counts, split_ratios)
+            entry["split"] = split
+            class_counts[split] += 1
+            known_splits[entry["hash"]] = split
+            to_place[rel_path] = None
+
+    # Restaurar imágenes asignadas que falten en las carpetas de destino
+    for rel_path, entry in manifest.entries.items():
+        if entry["split"] is not None and rel_path not in to_place:
+            if not os.path.lexists(_placed_path(dest_dir, rel_path, entry)):
+                to_place[rel_path] = None
+
+    # Calcular en paralelo los hashes de las imágenes pendientes
+    pending_paths = [os.path.join(source_dir, *source_files[rel_path][:2]) for rel_path in pending]
+    pending_hashes = hash_images(pending_paths, workers) if pending else []
+
+    # Hashes perceptuales de las imágenes pendientes y de las que aún no lo tienen
+    tree, phashes, phash_targets = None, {}, []
+    if near_duplicate_distance > 0:
+        missing_phash = [rel_path for rel_path, entry in manifest.entries.items()
+                         if entry["split"] is not None and "phash" not in entry]
+        phash_targets = pending + missing_phash
+        if phash_targets:
+            target_paths = [os.path.join(source_dir, *source_files[rel_path][:2])
+                            for rel_path in phash_targets]
+            phashes = dict(zip(phash_targets, _compute_phashes(target_paths, workers)))
+        for rel_path in missing_phash:
+            manifest.entries[rel_path]["phash"] = phashes[rel_path]
+        for rel_path in retry:
+            phashes.setdefault(rel_path, manifest.entries[rel_path].get("phash"))
+
+        tree = BKTree()
+        for rel_path, entry in manifest.entries.items():
+            if entry["split"] is not None and entry.get("phash"):
+                tree.add(int(entry["phash"], 16), rel_path)
+
+    # Registrar las imágenes pendientes; los duplicados exactos se descartan
+    duplicates = 0
+    candidates = list(retry)
+    seen_hashes = set(known_splits) | retry_hashes
+    for rel_path, img_hash in zip(pending, pending_hashes):
+        class_name, _, size, mtime = source_files[rel_path]
+        extra = {"phash": phashes[rel_path]} if rel_path in phashes else {}
+        manifest.set(rel_path, size, mtime, img_hash, class_name, None, **extra)
+        if img_hash in seen_hashes:
+            duplicates += 1
+        else:
+            seen_hashes.add(img_hash)
+            candidates.append(rel_path)
+
+    # Asignar cada grupo de casi duplicados entero a un único split
+    bridged = 0
+    for members, neighbor_splits in group_new_images(candidates, phashes, tree, manifest,
+                                                     near_duplicate_distance):
+        if len(neighbor_splits) > 1:
+            # Unir grupos de splits distintos filtraría imágenes entre ellos
+            split = None
+            bridged += len(members)
+        elif neighbor_splits:
+            split = next(iter(neighbor_splits))
+        else:
+            prior_splits = {previous[key]["split"] for key in members if key in previous} - {None}
+            if len(prior_splits) == 1:
+                split = prior_splits.pop()
+            else:
+                class_name = manifest.entries[members[0]]["class"]
+                split = choose_split(counts.setdefault(class_name, dict.fromkeys(SPLITS, 0)), split_ratios)
+
+        for rel_path in members:
+            entry = manifest.entries[rel_path]
+            entry["split"] = split
+            if split is None:
+                entry["excluded"] = BRIDGE_EXCLUSION
+                continue
+            entry.pop("excluded", None)
+            counts.setdefault(entry["class"], dict.fromkeys(SPLITS, 0))[split] += 1
+            known_splits[entry["hash"]] = split
+            to_place[rel_path] = None
+            if tree is not None and entry.get("phash"):
+                tree.add(int(entry["phash"], 16), rel_path)
+
+    # Registrar los grupos de casi duplicados
+    if tree is not None:
+        new_keys = [rel_path for rel_path in dict.fromkeys(phash_targets + retry)
+                    if manifest.entries[rel_path]["split"] is not None
+                    and manifest.entries[rel_path].get("phash")]
+        _, conflicts = update_near_duplicate_clusters(manifest, tree, new_keys, near_duplicate_distance)
+        report = write_near_duplicates_report(manifest, dest_dir)
+        print(f"Grupos de casi duplicados: {len(report)} "
+              f"({sum(len(c['images']) for c in report)} imágenes)")
+        if bridged:
+            print(f"Casi duplicados excluidos por unir imágenes de splits distintos: {bridged}")
+        if conflicts:
+            print(f"Aviso: {len(conflicts)} grupos de un manifiesto anterior están repartidos "
+                  f"entre splits (ver {NEAR_DUPLICATES_REPORT})")
+
+    # Colocar las imágenes en las carpetas correspondientes
+    progress = ProgressReporter("Colocando imágenes", len(to_place))
+    methods_used = {}
+    for rel_path in to_place:
+        entry = manifest.entries[rel_path]
+        src = os.path.join(source_dir, *source_files[rel_path][:2])
+        method = place_file(src, _placed_path(dest_dir, rel_path, entry), placement)
+        methods_used[method] = methods_used.get(method, 0) + 1
+        progress.update(nbytes=entry["size"])
+    progress.finish()
+
+    manifest.save()
 
+    print(f"Imágenes nuevas: {len(pending) - len(previous)}, modificadas: {len(previous)}, "
+          f"eliminadas: {len(removed)}, sin cambios: {len(source_files) - len(pending)}")
+    print(f"Duplicados descartados: {duplicates}")
+    if methods_used:
+        print("Método de colocación: " + ", ".join(f"{m}={n}" for m, n in methods_used.items()))
     print("Preprocesamiento completado. Las imágenes únicas se han distribuido en las carpetas de train, val y test.")
 
 
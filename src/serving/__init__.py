@@ -0,0 +1 @@
+# Módulo de servicio de inferencia por HTTP
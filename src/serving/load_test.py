@@ -0,0 +1,154 @@
+"""
+Prueba de carga del servidor de inferencia local.
+
+Abre varias conexiones concurrentes (keep-alive) que envían imágenes de TEST_DIR,
+mide throughput y percentiles de latencia y muestra las métricas del servidor.
+
+Uso:
+    python -m src.serving.load_test --concurrency 32 --requests 2000
+"""
+
+import os
+import io
+import time
+import json
+import asyncio
+import argparse
+import numpy as np
+from PIL import Image
+
+# Importar configuración desde archivo centralizado
+from src.config import IMG_SIZE, TEST_DIR, SERVING_HOST, SERVING_PORT
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".gif")
+CONCURRENCY = 16
+TOTAL_REQUESTS = 500
+
+# Imágenes distintas que se cargan en memoria para enviar
+MAX_SAMPLES = 64
+
+
+def load_samples(images_dir=TEST_DIR, max_samples=MAX_SAMPLES):
+    """Lee los bytes de algunas imágenes (o genera JPEG sintéticos si no hay)"""
+    samples = []
+    if os.path.isdir(images_dir):
+        for root, _, files in sorted(os.walk(images_dir)):
+            for file_name in sorted(files):
+                if file_name.lower().endswith(IMAGE_EXTENSIONS) and len(samples) < max_samples:
+                    with open(os.path.join(root, file_name), "rb") as f:
+                        samples.append(f.read())
+    if not samples:
+        print(f"No hay imágenes en {images_dir}; se usan imágenes sintéticas.")
+        rng = np.random.default_rng(0)
+        for _ in range(8):
+            buffer = io.BytesIO()
+            pixels = rng.integers(0, 256, (*IMG_SIZE, 3), dtype=np.uint8)
+            Image.fromarray(pixels).save(buffer, format="jpeg")
+            samples.append(buffer.getvalue())
+    return samples
+
+
+async def _request(reader, writer, host, method, path, body=b""):
+    """Envía una petición HTTP/1.1 keep-alive y devuelve (estado, cuerpo JSON)"""
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: {host}\r\n"
+        f"Content-Type: application/octet-stream\r\nContent-Length: {len(body)}\r\n\r\n".encode("latin-1")
+        + body
+    )
+    await writer.drain()
+
+    status_line = await reader.readline()
+    status = int(status_line.split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+
+async def _client(host, port, samples, counter, latencies, errors):
+    """Una conexión que envía peticiones hasta agotar el contador compartido"""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while counter[0] > 0:
+            counter[0] -= 1
+            body = samples[counter[0] % len(samples)]
+            start = time.perf_counter()
+            status, _ = await _request(reader, writer, host, "POST", "/predict", body)
+            if status == 200:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors.append(status)
+    finally:
+        writer.close()
+
+
+async def _load_test(host, port, samples, concurrency, total_requests):
+    counter = [total_requests]
+    latencies, errors = [], []
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        _client(host, port, samples, counter, latencies, errors) for _ in range(concurrency)
+    ))
+    elapsed = time.perf_counter() - start
+
+    reader, writer = await asyncio.open_connection(host, port)
+    _, metrics = await _request(reader, writer, host, "GET", "/metrics")
+    writer.close()
+    return latencies, errors, elapsed, metrics
+
+
+def run_load_test(host=SERVING_HOST, port=SERVING_PORT, images_dir=TEST_DIR,
+                  concurrency=CONCURRENCY, total_requests=TOTAL_REQUESTS):
+    """
+    Ejecuta la prueba de carga contra un servidor ya iniciado.
+
+    Returns:
+        Diccionario con throughput, percentiles de latencia y métricas del servidor
+    """
+    samples = load_samples(images_dir)
+    print(f"Enviando {total_requests} peticiones con {concurrency} conexiones a http://{host}:{port}...")
+    latencies, errors, elapsed, metrics = asyncio.run(
+        _load_test(host, port, samples, concurrency, total_requests)
+    )
+
+    latencies_ms = np.asarray(latencies) * 1000 if latencies else np.zeros(1)
+    p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99])
+    result = {
+        "requests": total_requests,
+        "concurrency": concurrency,
+        "errors": len(errors),
+        "throughput": len(latencies) / elapsed,
+        "latency_ms": {"p50": float(p50), "p95": float(p95), "p99": float(p99)},
+        "server": metrics
+    }
+
+    print(f"\nThroughput: {result['throughput']:.1f} peticiones/s ({len(errors)} errores)")
+    print(f"Latencia (cliente): p50 {p50:.1f} ms  p95 {p95:.1f} ms  p99 {p99:.1f} ms")
+    print(f"Lote medio en el servidor: {metrics['mean_batch_size']:.2f} "
+          f"(máximo {metrics['max_batch_size']}, espera {metrics['max_wait_ms']} ms)")
+    print("Histograma de tamaños de lote:")
+    for size, count in metrics["batch_size_histogram"].items():
+        print(f"  {size:>4}: {count}")
+    return result
+
+
+def main(argv=None):
+    """Punto de entrada por línea de comandos"""
+    parser = argparse.ArgumentParser(description="Prueba de carga del servidor de inferencia.")
+    parser.add_argument("--host", default=SERVING_HOST)
+    parser.add_argument("--port", type=int, default=SERVING_PORT)
+    parser.add_argument("--images", default=TEST_DIR, help="Carpeta con imágenes a enviar")
+    parser.add_argument("-c", "--concurrency", type=int, default=CONCURRENCY)
+    parser.add_argument("-n", "--requests", type=int, default=TOTAL_REQUESTS)
+    args = parser.parse_args(argv)
+
+    run_load_test(args.host, args.port, args.images, args.concurrency, args.requests)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,403 @@
+"""
+Servidor HTTP local de inferencia con micro-lotes dinámicos (solo asyncio, sin dependencias extra).
+
+Endpoints:
+    POST /predict   Imagen en el cuerpo (bytes crudos o multipart/form-data). Parámetro opcional ?top_k=N
+    GET  /metrics   Profundidad de la cola, histograma de tamaños de lote y percentiles de latencia
+    GET  /health    Estado del servidor
+
+Uso:
+    python -m src.serving.server --architecture mobilenet
+    curl --data-binary @foto.jpg http://127.0.0.1:8080/predict
+"""
+
+import time
+import json
+import asyncio
+import argparse
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from email.parser import BytesParser
+from email.policy import default as default_policy
+from urllib.parse import urlsplit, parse_qs
+import numpy as np
+import tensorflow as tf
+
+# Importar configuración desde archivo centralizado
+from src.config import (
+    MODEL_ARCHITECTURE, SERVING_HOST, SERVING_PORT,
+    SERVING_MAX_BATCH_SIZE, SERVING_MAX_WAIT_MS
+)
+
+from src.training.model_registry import load_registered_model
+from src.testing.model_loader import is_keras_model, uses_raw_input, get_input_size
+from src.training.data_pipeline import RESIZE_METHOD, to_model_input
+
+# Tamaño máximo aceptado para el cuerpo de una petición
+MAX_BODY_BYTES = 20 * 1024 * 1024
+
+# Hilos que decodifican las imágenes recibidas (la inferencia usa un hilo aparte)
+DECODE_THREADS = 4
+
+# Cantidad de peticiones recientes usadas para los percentiles de /metrics
+METRICS_WINDOW = 10000
+
+TOP_K = 3
+
+HTTP_REASONS = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    411: "Length Required", 413: "Payload Too Large", 500: "Internal Server Error"
+}
+
+
+def _percentiles(values):
+    """Percentiles p50/p95/p99 en ms de una lista de duraciones en segundos"""
+    if not values:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0}
+    p50, p95, p99 = np.percentile(np.asarray(values) * 1000, [50, 95, 99])
+    return {"p50": float(p50), "p95": float(p95), "p99": float(p99)}
+
+
+def decode_image_bytes(data, img_size, raw_input=False):
+    """
+    Decodifica una imagen igual que el pipeline de entrenamiento.
+
+    Se redimensiona aunque el modelo acepte cualquier tamaño para poder agrupar
+    peticiones en lotes; con raw_input queda en uint8 BGR (sin conversión a float32).
+    """
+    img = tf.io.decode_image(data, channels=3, expand_animations=False)
+    img = tf.cast(tf.image.resize(img, img_size, method=RESIZE_METHOD), tf.uint8)
+    return to_model_input(img, raw_input).numpy()
+
+
+class _HTTPError(Exception):
+    """Error que se devuelve al cliente con un código HTTP"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def _http_response(status, payload, keep_alive):
+    """Arma una respuesta HTTP/1.1 con cuerpo JSON"""
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    head = (
+        f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}\r\n"
+        "Content-Type: application/json; charset=utf-8\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    )
+    return head.encode("latin-1") + body
+
+
+class ServerMetrics:
+    """Contadores y ventanas de latencia del servidor"""
+
+    def __init__(self):
+        self.started = time.time()
+        self.requests = 0
+        self.errors = 0
+        self.batch_sizes = Counter()
+        self.latencies = deque(maxlen=METRICS_WINDOW)
+        self.queue_waits = deque(maxlen=METRICS_WINDOW)
+        self.inference_times = deque(maxlen=METRICS_WINDOW)
+
+    def snapshot(self, queue_depth, max_batch_size, max_wait_ms):
+        batches = sum(self.batch_sizes.values())
+        batched_images = sum(size * count for size, count in self.batch_sizes.items())
+        return {
+            "uptime_s": round(time.time() - self.started, 1),
+            "requests": self.requests,
+            "errors": self.errors,
+            "queue_depth": queue_depth,
+            "batches": batches,
+            "mean_batch_size": batched_images / batches if batches else 0.0,
+            "batch_size_histogram": {str(size): self.batch_sizes[size] for size in sorted(self.batch_sizes)},
+            "latency_ms": _percentiles(self.latencies),
+            "queue_wait_ms": _percentiles(self.queue_waits),
+            "inference_ms": _percentiles(self.inference_times),
+            "max_batch_size": max_batch_size,
+            "max_wait_ms": max_wait_ms
+        }
+
+
+class MicroBatcher:
+    """
+    Agrupa las imágenes de peticiones concurrentes en lotes para el modelo.
+
+    Un lote se cierra al llegar a max_batch_size o cuando pasan max_wait_ms desde
+    su primera imagen. Mientras el modelo procesa un lote, las peticiones nuevas
+    se acumulan en la cola y forman el siguiente.
+    """
+
+    def __init__(self, predict_fn, metrics, max_batch_size=SERVING_MAX_BATCH_SIZE,
+                 max_wait_ms=SERVING_MAX_WAIT_MS):
+        self.predict_fn = predict_fn
+        self.metrics = metrics
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.queue = asyncio.Queue()
+        # Un solo hilo: un lote a la vez, con todos los núcleos para el modelo
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="inference")
+
+    async def submit(self, image):
+        """Encola una imagen y espera sus probabilidades"""
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((image, future, time.perf_counter()))
+        return await future
+
+    async def _collect_batch(self):
+        """Espera la primera imagen y junta más hasta llenar el lote o vencer la espera"""
+        loop = asyncio.get_running_loop()
+        items = [await self.queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(items) < self.max_batch_size:
+            if not self.queue.empty():
+                items.append(self.queue.get_nowait())
+                continue
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                items.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return items
+
+    async def run(self):
+        """Bucle que despacha lotes al modelo"""
+        loop = asyncio.get_running_loop()
+        while True:
+            items = await self._collect_batch()
+            batch = np.stack([image for image, _, _ in items])
+            dispatched = time.perf_counter()
+            try:
+                probs = await loop.run_in_executor(self._executor, self.predict_fn, batch)
+            except Exception as e:
+                for _, future, _ in items:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.metrics.inference_times.append(time.perf_counter() - dispatched)
+            self.metrics.batch_sizes[len(items)] += 1
+            for (_, future, enqueued), row in zip(items, probs):
+                self.metrics.queue_waits.append(dispatched - enqueued)
+                if not future.done():
+                    future.set_result(row)
+
+
+class InferenceServer:
+    """Servidor HTTP/1.1 mínimo (con keep-alive) sobre asyncio"""
+
+    def __init__(self, model, class_names, max_batch_size=SERVING_MAX_BATCH_SIZE,
+                 max_wait_ms=SERVING_MAX_WAIT_MS):
+        self.class_names = class_names
+        self.img_size = get_input_size(model)
+        self.raw_input = uses_raw_input(model)
+        self.input_dtype = np.uint8 if self.raw_input else np.float32
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.metrics = ServerMetrics()
+        self.batcher = MicroBatcher(self._compile_predict(model), self.metrics,
+                                    max_batch_size, max_wait_ms)
+        self._decode_executor = ThreadPoolExecutor(max_workers=DECODE_THREADS,
+                                                   thread_name_prefix="decode")
+
+    def _compile_predict(self, model):
+        """Función de predicción por lotes de tamaño variable"""
+        if not is_keras_model(model):
+            return model.predict
+
+        @tf.function(input_signature=[tf.TensorSpec((None, *self.img_size, 3), self.input_dtype)])
+        def predict(images):
+            return model(images, training=False)
+
+        return lambda images: predict(tf.constant(images)).numpy()
+
+    def warmup(self):
+        """Traza y ejecuta el modelo una vez antes de aceptar peticiones"""
+        self.batcher.predict_fn(np.zeros((1, *self.img_size, 3), dtype=self.input_dtype))
+
+    async def _read_request(self, reader):
+        """Lee una petición HTTP; devuelve None si el cliente cerró la conexión"""
+        request_line = await reader.readline()
+        if not request_line.strip():
+            return None
+        try:
+            method, target, version = request_line.decode("latin-1").rstrip("\r\n").split(" ", 2)
+        except ValueError:
+            raise _HTTPError(400, "Línea de petición inválida") from None
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            raise _HTTPError(411, "Se requiere Content-Length")
+        try:
+            length = int(headers.get("content-length", 0) or 0)
+        except ValueError:
+            raise _HTTPError(400, "Content-Length inválido") from None
+        if length < 0:
+            raise _HTTPError(400, "Content-Length inválido")
+        if length > MAX_BODY_BYTES:
+            raise _HTTPError(413, f"La imagen supera {MAX_BODY_BYTES // (1024 * 1024)} MB")
+        body = await reader.readexactly(length) if length else b""
+
+        keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+        return method, target, headers, body, keep_alive
+
+    @staticmethod
+    def _extract_image(headers, body):
+        """Obtiene los bytes de la imagen de un cuerpo crudo o multipart/form-data"""
+        content_type = headers.get("content-type", "")
+        if content_type.startswith("multipart/form-data"):
+            message = BytesParser(policy=default_policy).parsebytes(
+                f"Content-Type: {content_type}\r\n\r\n".encode("latin-1") + body
+            )
+            for part in message.iter_parts():
+                if part.get_filename() or part.get_content_maintype() == "image":
+                    return part.get_payload(decode=True)
+            raise _HTTPError(400, "El formulario no contiene ninguna imagen")
+        return body
+
+    async def _predict(self, headers, body, query):
+        """Clasifica la imagen de una petición POST /predict"""
+        start = time.perf_counter()
+        data = self._extract_image(headers, body)
+        if not data:
+            raise _HTTPError(400, "La petición no contiene ninguna imagen")
+
+        loop = asyncio.get_running_loop()
+        try:
+            image = await loop.run_in_executor(
+                self._decode_executor, decode_image_bytes, data, self.img_size, self.raw_input
+            )
+        except (tf.errors.InvalidArgumentError, ValueError):
+            raise _HTTPError(400, "No se pudo decodificar la imagen") from None
+
+        try:
+            top_k = max(1, min(int(query.get("top_k", [TOP_K])[0]), len(self.class_names)))
+        except ValueError:
+            raise _HTTPError(400, "top_k debe ser un número entero") from None
+
+        probs = await self.batcher.submit(image)
+        top_idx = np.argsort(-probs)[:top_k]
+        latency = time.perf_counter() - start
+        self.metrics.latencies.append(latency)
+        return {
+            "class": self.class_names[top_idx[0]],
+            "confidence": round(float(probs[top_idx[0]]), 4),
+            "top_k": [{"class": self.class_names[i], "confidence": round(float(probs[i]), 4)}
+                      for i in top_idx],
+            "latency_ms": round(latency * 1000, 2)
+        }
+
+    async def _dispatch(self, method, target, headers, body):
+        """Resuelve una petición y devuelve (estado, contenido JSON)"""
+        url = urlsplit(target)
+        if url.path == "/predict":
+            if method != "POST":
+                raise _HTTPError(405, "Usa POST con la imagen en el cuerpo")
+            self.metrics.requests += 1
+            return 200, await self._predict(headers, body, parse_qs(url.query))
+        if url.path == "/metrics":
+            return 200, self.metrics.snapshot(self.batcher.queue.qsize(),
+                                              self.max_batch_size, self.max_wait_ms)
+        if url.path == "/health":
+            return 200, {"status": "ok", "classes": self.class_names}
+        raise _HTTPError(404, f"No existe {url.path}")
+
+    async def handle_client(self, reader, writer):
+        """Atiende las peticiones de una conexión hasta que se cierre"""
+        try:
+            while True:
+                keep_alive = False
+                try:
+                    request = await self._read_request(reader)
+                    if request is None:
+                        break
+                    method, target, headers, body, keep_alive = request
+                    status, payload = await self._dispatch(method, target, headers, body)
+                except _HTTPError as e:
+                    status, payload = e.status, {"error": e.message}
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except Exception as e:
+                    status, payload = 500, {"error": str(e)}
+
+                if status != 200:
+                    self.metrics.errors += 1
+                writer.write(_http_response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+
+
+async def _serve(server, host, port):
+    batcher_task = asyncio.create_task(server.batcher.run())
+    tcp_server = await asyncio.start_server(server.handle_client, host, port)
+    print(f"Servidor escuchando en http://{host}:{port} "
+          "(POST /predict, GET /metrics, GET /health). Ctrl+C para detener.")
+    try:
+        async with tcp_server:
+            await tcp_server.serve_forever()
+    finally:
+        batcher_task.cancel()
+
+
+def run_server(model_path=None, architecture=MODEL_ARCHITECTURE, class_names=None,
+               host=SERVING_HOST, port=SERVING_PORT, max_batch_size=SERVING_MAX_BATCH_SIZE,
+               max_wait_ms=SERVING_MAX_WAIT_MS, cpu_only=True):
+    """
+    Carga un modelo y lo sirve por HTTP hasta que se interrumpa.
+
+    Args:
+        model_path: Modelo .h5 o .tflite (por defecto, el entrenado para architecture)
+        architecture: Arquitectura cuyo modelo se usa si no se indica model_path
+        class_names: Nombres de las clases (por defecto, los de los metadatos del modelo)
+        host, port: Dirección de escucha
+        max_batch_size: Imágenes máximas por lote
+        max_wait_ms: Espera máxima para completar un lote
+        cpu_only: Ocultar las GPUs a TensorFlow
+    """
+    if cpu_only:
+        tf.config.set_visible_devices([], "GPU")
+
+    print(f"Cargando modelo {model_path or architecture}...")
+    model, registered_names, _ = load_registered_model(model_path, architecture)
+    server = InferenceServer(model, class_names or registered_names, max_batch_size, max_wait_ms)
+    server.warmup()
+
+    try:
+        asyncio.run(_serve(server, host, port))
+    except KeyboardInterrupt:
+        pass
+    print("\nServidor detenido.")
+
+
+def main(argv=None):
+    """Punto de entrada por línea de comandos"""
+    parser = argparse.ArgumentParser(description="Servidor HTTP local de inferencia.")
+    parser.add_argument("-m", "--model", default=None, help="Ruta del modelo .h5 o .tflite")
+    parser.add_argument("-a", "--architecture", default=MODEL_ARCHITECTURE)
+    parser.add_argument("--host", default=SERVING_HOST)
+    parser.add_argument("--port", type=int, default=SERVING_PORT)
+    parser.add_argument("--max-batch-size", type=int, default=SERVING_MAX_BATCH_SIZE)
+    parser.add_argument("--max-wait-ms", type=float, default=SERVING_MAX_WAIT_MS)
+    args = parser.parse_args(argv)
+
+    run_server(args.model, args.architecture, host=args.host, port=args.port,
+               max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+"""
+Inferencia por lotes sobre carpetas de imágenes y archivos de video.
+Escribe las predicciones en CSV o JSONL y reporta el throughput obtenido.
+Las imágenes o videos que no se pudieron leer quedan registrados en la salida con su error.
+
+Uso no interactivo:
+    python -m src.testing.batch_inference ./fotos ./videos/corte.mp4 -o predicciones.csv
+"""
+
+import os
+import csv
+import json
+import time
+import argparse
+import cv2
+import numpy as np
+import tensorflow as tf
+
+# Importar configuración desde archivo centralizado
+from src.config import IMG_SIZE, MODEL_ARCHITECTURE
+
+from src.training.data_pipeline import IMAGE_EXTENSIONS, decode_image, to_model_input
+from src.training.model_registry import load_registered_model
+from src.testing.realtime_classification import CLASS_NAMES
+from src.testing.model_loader import is_keras_model, uses_raw_input, get_input_size
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv", ".webm")
+BATCH_SIZE = 64
+TOP_K = 3
+OUTPUT_FORMATS = ("csv", "jsonl")
+READ_ERROR = "no se pudo leer"
+
+
+def collect_inputs(inputs):
+    """
+    Separa las rutas recibidas en imágenes y videos (recorre carpetas recursivamente).
+
+    Returns:
+        Tupla (imágenes, videos) ordenadas
+    """
+    images, videos = [], []
+
+    def add_file(path):
+        lower = path.lower()
+        if lower.endswith(IMAGE_EXTENSIONS):
+            images.append(path)
+        elif lower.endswith(VIDEO_EXTENSIONS):
+            videos.append(path)
+
+    for path in inputs:
+        if os.path.isdir(path):
+            for root, _, files in sorted(os.walk(path)):
+                for file_name in sorted(files):
+                    add_file(os.path.join(root, file_name))
+        elif os.path.isfile(path):
+            add_file(path)
+        else:
+            print(f"Aviso: no existe {path}, se omite.")
+    return images, videos
+
+
+def _video_frames(video_path, img_size, frame_stride):
+    """Generador de (frame RGB redimensionado, índice de frame) de un video"""
+    cap = cv2.VideoCapture(video_path.decode() if isinstance(video_path, bytes) else video_path)
+    img_size = tuple(int(v) for v in img_size)
+    frame_idx = 0
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            if frame_idx % frame_stride == 0:
+                # cv2 recibe (ancho, alto); vecino más cercano como decode_image en el entrenamiento
+                frame = cv2.resize(frame, img_size[::-1], interpolation=cv2.INTER_NEAREST)
+                yield cv2.cvtColor(frame, cv2.COLOR_BGR2RGB), frame_idx
+            frame_idx += 1
+    finally:
+        cap.release()
+
+
+def build_inference_dataset(images, videos, img_size=IMG_SIZE, batch_size=BATCH_SIZE, frame_stride=1,
+                            raw_input=False):
+    """
+    Construye un dataset de (imágenes, ruta, índice de frame) con decodificación en paralelo.
+
+    Las imágenes se decodifican con tf.data (AUTOTUNE) y los videos se leen en
+    paralelo entre sí. Para imágenes sueltas el índice de frame es -1. Con raw_input
+    se entregan uint8 BGR (modelos con preprocesamiento integrado).
+
+    Las imágenes que no se pueden decodificar se descartan sin cortar el dataset;
+    run_batch_inference las detecta porque no aparecen en la salida.
+    """
+    datasets = []
+    if images:
+        image_ds = tf.data.Dataset.from_tensor_slices(images)
+        image_ds = image_ds.map(
+            lambda path: (decode_image(path, img_size), path, tf.constant(-1, tf.int64)),
+            num_parallel_calls=tf.data.AUTOTUNE
+        ).ignore_errors()
+        datasets.append(image_ds)
+
+    if videos:
+        signature = (
+            tf.TensorSpec((*img_size, 3), tf.uint8),
+            tf.TensorSpec((), tf.int64)
+        )
+        video_ds = tf.data.Dataset.from_tensor_slices(videos).interleave(
+            lambda path: tf.data.Dataset.from_generator(
+                _video_frames, args=(path, img_size, frame_stride), output_signature=signature
+            ).map(lambda frame, idx: (frame, path, idx)),
+            cycle_length=tf.data.AUTOTUNE,
+            num_parallel_calls=tf.data.AUTOTUNE,
+            deterministic=False
+        )
+        datasets.append(video_ds)
+
+    dataset = datasets[0]
+    for other in datasets[1:]:
+        dataset = dataset.concatenate(other)
+
+    dataset = dataset.map(
+        lambda img, path, idx: (to_model_input(img, raw_input), path, idx),
+        num_parallel_calls=tf.data.AUTOTUNE
+    )
+    return dataset.batch(batch_size).prefetch(tf.data.AUTOTUNE)
+
+
+class PredictionWriter:
+    """Escribe predicciones en CSV o JSONL a medida que se generan"""
+
+    def __init__(self, output_path, output_format=None):
+        self.format = output_format or ("jsonl" if output_path.endswith(".jsonl") else "csv")
+        if self.format not in OUTPUT_FORMATS:
+            raise ValueError(f"Formato '{self.format}' no soportado. Opciones: {list(OUTPUT_FORMATS)}")
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        self.file = open(output_path, "w", newline="", encoding="utf-8")
+        if self.format == "csv":
+            self.csv = csv.writer(self.file)
+            self.csv.writerow(["source", "frame", "class", "confidence", "top_k", "error"])
+
+    def write(self, source, frame, top_k):
+        """Escribe una predicción; top_k es una lista de (clase, probabilidad)"""
+        class_name, confidence = top_k[0]
+        if self.format == "csv":
+            top_k_text = ";".join(f"{name}:{prob:.4f}" for name, prob in top_k)
+            self.csv.writerow([source, frame, class_name, f"{confidence:.4f}", top_k_text, ""])
+        else:
+            record = {
+                "source": source, "frame": frame, "class": class_name,
+                "confidence": round(confidence, 4),
+                "top_k": [{"class": name, "confidence": round(prob, 4)} for name, prob in top_k]
+            }
+            self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def write_error(self, source, error):
+        """Registra una entrada que no produjo ninguna predicción"""
+        if self.format == "csv":
+            self.csv.writerow([source, -1, "", "", "", error])
+        else:
+            record = {"source": source, "frame": -1, "error": error}
+            self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def close(self):
+        self.file.close()
+
+
+def run_batch_inference(inputs, output_path="predicciones.csv", model_path=None,
+                        architecture=MODEL_ARCHITECTURE, class_names=None,
+                        batch_size=BATCH_SIZE, top_k=TOP_K, frame_stride=1,
+                        output_format=None, cpu_only=True):
+    """
+    Clasifica carpetas de imágenes y videos por lotes y guarda las predicciones.
+
+    Args:
+        inputs: Lista de carpetas, imágenes o videos
+        output_path: Archivo de salida (.csv o .jsonl)
+        model_path: Modelo .h5 o .tflite (por defecto, el entrenado para architecture)
+        architecture: Arquitectura cuyo modelo se usa si no se indica model_path
+        class_names: Nombres de las clases (por defecto, los de los metadatos del modelo)
+        batch_size: Imágenes por lote
+        top_k: Cantidad de clases más probables a reportar
+        frame_stride: Clasificar uno de cada N frames de los videos
+        output_format: "csv" o "jsonl" (por defecto, según la extensión)
+        cpu_only: Ocultar las GPUs a TensorFlow
+
+    Returns:
+        Cantidad de imágenes/frames clasificados
+    """
+    if cpu_only:
+        try:
+            tf.config.set_visible_devices([], "GPU")
+        except RuntimeError:
+            # TensorFlow ya inicializó los dispositivos (p. ej. llamado desde el menú)
+            print("Aviso: TensorFlow ya está inicializado, no se pueden ocultar las GPUs.")
+
+    images, videos = collect_inputs(inputs)
+    if not images and not videos:
+        print("No se encontraron imágenes ni videos para clasificar.")
+        return 0
+    print(f"Entradas: {len(images)} imágenes, {len(videos)} videos")
+
+    print(f"Cargando modelo {model_path or architecture}...")
+    model, registered_names, _ = load_registered_model(model_path, architecture, CLASS_NAMES)
+    class_names = class_names or registered_names
+    img_size = get_input_size(model)
+    top_k = min(top_k, len(class_names))
+
+    if is_keras_model(model):
+        keras_predict = tf.function(lambda batch: model(batch, training=False))
+
+        def predict(batch):
+            return keras_predict(batch).numpy()
+    else:
+        def predict(batch):
+            return model.predict(batch.numpy())
+
+    dataset = build_inference_dataset(images, videos, img_size, batch_size, frame_stride,
+                                      raw_input=uses_raw_input(model))
+    writer = PredictionWriter(output_path, output_format)
+
+    total = 0
+    classified_sources = set()
+    start = time.perf_counter()
+    try:
+        for batch, paths, frames in dataset:
+            probs = predict(batch)
+            top_idx = np.argsort(-probs, axis=1)[:, :top_k]
+            for row, path, frame, idx in zip(probs, paths.numpy(), frames.numpy(), top_idx):
+                source = path.decode()
+                classified_sources.add(source)
+                writer.write(source, int(frame), [(class_names[i], float(row[i])) for i in idx])
+            total += len(probs)
+            elapsed = time.perf_counter() - start
+            print(f"\rClasificadas: {total} ({total / elapsed:.1f} imágenes/s)", end="", flush=True)
+
+        # Las imágenes corruptas (y los videos sin frames legibles) no llegan a la salida del dataset
+        failed = [source for source in images + videos if source not in classified_sources]
+        for source in failed:
+            writer.write_error(source, READ_ERROR)
+    finally:
+        writer.close()
+
+    elapsed = max(time.perf_counter() - start, 1e-9)
+    print(f"\nSe clasificaron {total} imágenes/frames en {elapsed:.1f}s "
+          f"({total / elapsed:.1f} imágenes/s).")
+    if failed:
+        print(f"Aviso: no se pudieron leer {len(failed)} entradas (marcadas en la salida):")
+        for source in failed[:10]:
+            print(f"  {source}")
+        if len(failed) > 10:
+            print(f"  ... y {len(failed) - 10} más")
+    print(f"Predicciones guardadas en {output_path}")
+    return total
+
+
+def main(argv=None):
+    """Punto de entrada por línea de comandos"""
+    parser = argparse.ArgumentParser(description="Clasificación por lotes de imágenes y videos.")
+    parser.add_argument("inputs", nargs="+", help="Carpetas, imágenes o videos a clasificar")
+    parser.add_argument("-o", "--output", default="predicciones.csv", help="Archivo .csv o .jsonl")
+    parser.add_argument("-m", "--model", default=None, help="Ruta del modelo .h5 o .tflite")
+    parser.add_argument("-a", "--architecture", default=MODEL_ARCHITECTURE,
+                        help="Arquitectura del modelo entrenado a usar")
+    parser.add_argument("-b", "--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("-k", "--top-k", type=int, default=TOP_K)
+    parser.add_argument("--frame-stride", type=int, default=1,
+                        help="Clasificar uno de cada N frames de los videos")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default=None)
+    args = parser.parse_args(argv)
+
+    run_batch_inference(
+        args.inputs, args.output, model_path=args.model, architecture=args.architecture,
+        batch_size=args.batch_size, top_k=args.top_k, frame_stride=args.frame_stride,
+        output_format=args.format
+    )
+
+
+if __name__ == "__main__":
+    main()
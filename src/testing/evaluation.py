@@ -0,0 +1,293 @@
+"""
+Evaluación de un modelo sobre un split con métricas por clase.
+
+Las imágenes pasan por el modelo en lotes grandes y la matriz de confusión, la
+precisión/recall/F1 por clase y la precisión top-k se acumulan lote a lote con NumPy.
+Las probabilidades crudas se guardan en EVAL_PREDICTIONS_DIR con el hash del archivo
+del modelo: volver a generar el informe (p. ej. con otro umbral) no repite la inferencia.
+
+Uso:
+    python -m src.testing.evaluation -a mobilenet
+    python -m src.testing.evaluation --model models/mobilenet_carne_vacuna_int8.tflite --threshold 0.6
+"""
+
+import os
+import json
+import time
+import hashlib
+import argparse
+import numpy as np
+import tensorflow as tf
+
+# Importar configuración desde archivo centralizado
+from src.config import (
+    TEST_DIR, TRAIN_DIR, MODEL_ARCHITECTURE, EVAL_BATCH_SIZE, EVAL_TOP_K, EVAL_PREDICTIONS_DIR
+)
+
+from src.training.data_pipeline import get_class_indices, list_image_files, decode_image, to_model_input
+from src.training.model_registry import resolve_model_path, resolve_class_names
+from src.testing.model_loader import is_keras_model, load_inference_model, uses_raw_input, get_input_size
+
+AUTOTUNE = tf.data.AUTOTUNE
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """SHA-256 del contenido de un archivo"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _split_signature(paths, labels):
+    """Firma de los archivos (y sus clases) de un split para invalidar predicciones guardadas"""
+    digest = hashlib.md5()
+    for path, label in zip(paths, labels):
+        stat = os.stat(path)
+        digest.update(f"{path}|{label}|{stat.st_size}|{stat.st_mtime_ns}".encode())
+    return digest.hexdigest()[:12]
+
+
+class StreamingMetrics:
+    """
+    Métricas de clasificación acumuladas lote a lote.
+
+    Args:
+        num_classes: Cantidad de clases
+        top_k: k de la precisión top-k
+        threshold: Confianza mínima para aceptar una predicción (None = aceptar todas).
+                   Las rechazadas no entran en la matriz de confusión pero sí en el soporte
+                   (bajan el recall) y se informan como cobertura; la pérdida y el top-k
+                   se calculan sobre todas las imágenes.
+    """
+
+    def __init__(self, num_classes, top_k=EVAL_TOP_K, threshold=None):
+        self.num_classes = num_classes
+        self.top_k = min(top_k, num_classes)
+        self.threshold = threshold
+        self.confusion = np.zeros((num_classes, num_classes), dtype=np.int64)
+        self.support = np.zeros(num_classes, dtype=np.int64)
+        self.count = 0
+        self.loss_sum = 0.0
+        self.top_k_correct = 0
+
+    def update(self, probs, labels):
+        """Agrega un lote de probabilidades (N, clases) y etiquetas enteras (N,)"""
+        probs = np.asarray(probs, dtype=np.float32)
+        labels = np.asarray(labels, dtype=np.int64)
+        rows = np.arange(len(labels))
+        predictions = probs.argmax(axis=1)
+
+        self.count += len(labels)
+        self.support += np.bincount(labels, minlength=self.num_classes)
+        self.loss_sum += float(-np.log(np.clip(probs[rows, labels], 1e-7, 1.0)).sum())
+        top_k = np.argpartition(-probs, self.top_k - 1, axis=1)[:, :self.top_k]
+        self.top_k_correct += int((top_k == labels[:, None]).any(axis=1).sum())
+
+        if self.threshold is not None:
+            accepted = probs[rows, predictions] >= self.threshold
+            labels, predictions = labels[accepted], predictions[accepted]
+        self.confusion += np.bincount(
+            labels * self.num_classes + predictions, minlength=self.num_classes ** 2
+        ).reshape(self.num_classes, self.num_classes)
+
+    def result(self, class_names):
+        """Diccionario con las métricas globales y por clase"""
+        confusion = self.confusion
+        true_positives = np.diag(confusion).astype(np.float64)
+        predicted = confusion.sum(axis=0)
+        support = self.support
+        accepted = int(confusion.sum())
+
+        precision = np.divide(true_positives, predicted, out=np.zeros_like(true_positives), where=predicted > 0)
+        recall = np.divide(true_positives, support, out=np.zeros_like(true_positives), where=support > 0)
+        denominator = precision + recall
+        f1 = np.divide(2 * precision * recall, denominator, out=np.zeros_like(denominator), where=denominator > 0)
+        weights = support / max(self.count, 1)
+
+        return {
+            "num_images": self.count,
+            "loss": self.loss_sum / max(self.count, 1),
+            "accuracy": float(true_positives.sum() / max(accepted, 1)),
+            "top_k": self.top_k,
+            "top_k_accuracy": self.top_k_correct / max(self.count, 1),
+            "threshold": self.threshold,
+            "coverage": accepted / max(self.count, 1),
+            "macro_f1": float(f1.mean()),
+            "weighted_f1": float((f1 * weights).sum()),
+            "per_class": {
+                name: {
+                    "precision": float(precision[i]),
+                    "recall": float(recall[i]),
+                    "f1": float(f1[i]),
+                    "support": int(support[i])
+                }
+                for i, name in enumerate(class_names)
+            },
+            "class_names": list(class_names),
+            "confusion_matrix": confusion.tolist()
+        }
+
+
+def stream_predictions(model, paths, batch_size=EVAL_BATCH_SIZE):
+    """
+    Clasifica las imágenes en lotes y devuelve las probabilidades lote a lote.
+
+    Yields:
+        Array (lote, clases) de probabilidades float32
+    """
+    img_size = get_input_size(model)
+    raw_input = uses_raw_input(model)
+    dataset = tf.data.Dataset.from_tensor_slices(paths).map(
+        lambda path: to_model_input(decode_image(path, img_size), raw_input),
+        num_parallel_calls=AUTOTUNE
+    ).batch(batch_size).prefetch(AUTOTUNE)
+
+    if is_keras_model(model):
+        keras_predict = tf.function(lambda batch: model(batch, training=False))
+        predict = lambda batch: keras_predict(batch).numpy()
+    else:
+        predict = lambda batch: model.predict(batch.numpy())
+
+    for batch in dataset:
+        yield np.asarray(predict(batch), dtype=np.float32)
+
+
+def get_predictions_path(model_hash, split_dir, signature, predictions_dir=EVAL_PREDICTIONS_DIR):
+    """Archivo de predicciones guardadas de un modelo sobre un split"""
+    split_name = os.path.basename(os.path.normpath(split_dir))
+    return os.path.join(predictions_dir, f"{model_hash[:16]}_{split_name}_{signature}.npz")
+
+
+def evaluate_model(model_path=None, architecture=MODEL_ARCHITECTURE, split_dir=TEST_DIR, model=None,
+                   class_names=None, batch_size=EVAL_BATCH_SIZE, top_k=EVAL_TOP_K, threshold=None,
+                   use_cache=True, verbose=True):
+    """
+    Evalúa un modelo sobre un split con métricas por clase.
+
+    Args:
+        model_path: Modelo .h5 o .tflite (por defecto, el entrenado para architecture)
+        architecture: Arquitectura cuyo modelo se usa si no se indica model_path
+        split_dir: Carpeta del split (una subcarpeta por clase)
+        model: Modelo ya cargado (se usa model_path solo para la caché de predicciones);
+               si no se indica, el modelo se carga solo cuando no hay predicciones guardadas
+        class_names: Clases en el orden de salida (por defecto, las de los metadatos)
+        batch_size: Imágenes por lote
+        top_k: k de la precisión top-k
+        threshold: Confianza mínima para aceptar una predicción
+        use_cache: Reutilizar/guardar las probabilidades por hash del modelo
+        verbose: Imprimir el informe
+
+    Returns:
+        Diccionario con las métricas (ver StreamingMetrics.result)
+    """
+    if model is None:
+        model_path = model_path or resolve_model_path(architecture)
+    if class_names is None:
+        if model_path:
+            num_outputs = model.output_shape[-1] if model is not None else None
+            class_names = resolve_class_names(model_path, num_outputs)
+        else:
+            class_names = list(get_class_indices(TRAIN_DIR))
+
+    paths, labels = list_image_files(split_dir, {name: i for i, name in enumerate(class_names)})
+    if not paths:
+        raise ValueError(f"No se encontraron imágenes de las clases del modelo en {split_dir}")
+    labels = np.asarray(labels, dtype=np.int64)
+
+    predictions_path = None
+    model_hash = None
+    if use_cache and model_path and os.path.exists(model_path):
+        model_hash = file_hash(model_path)
+        predictions_path = get_predictions_path(model_hash, split_dir, _split_signature(paths, labels))
+
+    metrics = StreamingMetrics(len(class_names), top_k, threshold)
+    inference_time = 0.0
+    if predictions_path and os.path.exists(predictions_path):
+        metrics.update(np.load(predictions_path)["probs"], labels)
+        print(f"Predicciones reutilizadas de {predictions_path}")
+    else:
+        if model is None:
+            model = load_inference_model(model_path)
+        print(f"Clasificando {len(paths)} imágenes de {split_dir}...")
+        batches = []
+        start = time.perf_counter()
+        offset = 0
+        for probs in stream_predictions(model, paths, batch_size):
+            metrics.update(probs, labels[offset:offset + len(probs)])
+            offset += len(probs)
+            if predictions_path:
+                batches.append(probs)
+        inference_time = time.perf_counter() - start
+        if predictions_path:
+            os.makedirs(os.path.dirname(predictions_path), exist_ok=True)
+            np.savez(predictions_path, probs=np.concatenate(batches), labels=labels,
+                     paths=np.asarray(paths), class_names=np.asarray(class_names))
+
+    report = {
+        "model_file": os.path.basename(model_path) if model_path else None,
+        "model_hash": model_hash,
+        "split": split_dir,
+        "predictions_path": predictions_path,
+        "inference_time_s": inference_time,
+        **metrics.result(class_names)
+    }
+    if verbose:
+        print_evaluation_report(report)
+    return report
+
+
+def print_evaluation_report(report):
+    """Imprime las métricas globales, por clase y la matriz de confusión"""
+    print(f"\nEvaluación de {report['model_file'] or 'modelo en memoria'} sobre {report['split']} "
+          f"({report['num_images']} imágenes)")
+    print("-" * 60)
+    print(f"  Accuracy:      {report['accuracy'] * 100:.2f}%")
+    top_k_label = f"Top-{report['top_k']}:"
+    print(f"  {top_k_label:<15}{report['top_k_accuracy'] * 100:.2f}%")
+    print(f"  Pérdida:       {report['loss']:.4f}")
+    print(f"  F1 macro:      {report['macro_f1']:.4f}  (ponderado {report['weighted_f1']:.4f})")
+    if report["threshold"] is not None:
+        print(f"  Umbral {report['threshold']:.2f}:   cobertura {report['coverage'] * 100:.1f}%")
+    if report["inference_time_s"]:
+        print(f"  Inferencia:    {report['inference_time_s']:.1f}s "
+              f"({report['num_images'] / report['inference_time_s']:.1f} imágenes/s)")
+
+    names = report["class_names"]
+    width = max(12, max(len(name) for name in names) + 2)
+    print(f"\n{'Clase':<{width}}{'Precisión':>10}{'Recall':>10}{'F1':>8}{'Soporte':>9}")
+    for name in names:
+        metrics = report["per_class"][name]
+        print(f"{name:<{width}}{metrics['precision']:>10.3f}{metrics['recall']:>10.3f}"
+              f"{metrics['f1']:>8.3f}{metrics['support']:>9}")
+
+    print("\nMatriz de confusión (filas = real, columnas = predicha):")
+    print(" " * width + "".join(f"{name[:7]:>8}" for name in names))
+    for name, row in zip(names, report["confusion_matrix"]):
+        print(f"{name:<{width}}" + "".join(f"{count:>8}" for count in row))
+
+
+def main(argv=None):
+    """Punto de entrada por línea de comandos"""
+    parser = argparse.ArgumentParser(description="Evaluación de un modelo con métricas por clase.")
+    parser.add_argument("-a", "--architecture", default=MODEL_ARCHITECTURE)
+    parser.add_argument("--model", help="Modelo .h5 o .tflite (por defecto, el de la arquitectura)")
+    parser.add_argument("--split", default=TEST_DIR, help="Carpeta del split a evaluar")
+    parser.add_argument("-b", "--batch-size", type=int, default=EVAL_BATCH_SIZE)
+    parser.add_argument("-k", "--top-k", type=int, default=EVAL_TOP_K)
+    parser.add_argument("--threshold", type=float, help="Confianza mínima para aceptar una predicción")
+    parser.add_argument("--no-cache", action="store_true", help="No reutilizar ni guardar predicciones")
+    parser.add_argument("--output", help="Guardar el informe en un archivo JSON")
+    args = parser.parse_args(argv)
+
+    report = evaluate_model(args.model, args.architecture, args.split, batch_size=args.batch_size,
+                            top_k=args.top_k, threshold=args.threshold, use_cache=not args.no_cache)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\nInforme guardado en {args.output}")
+
+
+if __name__ == "__main__":
+    main()
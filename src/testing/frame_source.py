@@ -0,0 +1,385 @@
+"""
+Fuentes de frames para la clasificación en tiempo real: cámara, video o secuencia de imágenes.
+
+La decodificación corre en un proceso aparte que escribe los frames en un buffer
+circular de memoria compartida y el proceso de inferencia los lee como vistas de
+NumPy, sin copiarlos. Un decodificador lento no frena la inferencia y un video
+grabado se puede reproducir frame a frame en máquinas sin cámara.
+
+Las fuentes tienen la interfaz de cv2.VideoCapture (read, isOpened, get, release):
+    source = open_frame_source("grabacion.mp4")
+    ret, frame = source.read()
+    source.release()
+"""
+
+import os
+import glob
+import time
+import collections
+import multiprocessing
+from multiprocessing import shared_memory
+import cv2
+import numpy as np
+
+# Frames del buffer circular
+RING_SLOTS = 6
+# Lecturas durante las que un frame devuelto sigue siendo válido (después puede sobrescribirse)
+HOLD_FRAMES = 2
+# FPS de las secuencias de imágenes y de los videos sin FPS en los metadatos
+DEFAULT_FPS = 30.0
+# Espera máxima del primer frame (abrir una cámara puede tardar)
+OPEN_TIMEOUT = 15.0
+
+# Estado compartido al final del encabezado
+_LATEST, _LATEST_SLOT, _CONSUMED, _CLOSED, _STOP = range(5)
+_STATE_FIELDS = 5
+
+
+class ImageSequenceCapture:
+    """Secuencia de imágenes con la interfaz de cv2.VideoCapture"""
+
+    def __init__(self, paths, fps=DEFAULT_FPS):
+        self.paths = list(paths)
+        self.fps = fps
+        self._index = 0
+
+    def isOpened(self):
+        return self._index < len(self.paths)
+
+    def read(self, image=None):
+        # Las imágenes que no se pueden leer se saltean
+        while self._index < len(self.paths):
+            frame = cv2.imread(self.paths[self._index])
+            self._index += 1
+            if frame is not None:
+                return True, frame
+        return False, None
+
+    def get(self, prop):
+        return self.fps if prop == cv2.CAP_PROP_FPS else 0.0
+
+    def release(self):
+        self._index = len(self.paths)
+
+
+def resolve_source(source):
+    """
+    Interpreta una fuente de frames.
+
+    Args:
+        source: Índice de cámara (0 o "0"), archivo de video, carpeta o patrón glob de imágenes
+
+    Returns:
+        Tupla (tipo, argumento) con tipo "camera", "video" o "images"
+    """
+    if isinstance(source, int) or str(source).isdigit():
+        return "camera", int(source)
+    source = str(source)
+    if os.path.isdir(source) or any(char in source for char in "*?["):
+        # Importación diferida: el proceso decodificador no debe cargar TensorFlow
+        from src.training.data_pipeline import IMAGE_EXTENSIONS
+        pattern = os.path.join(source, "*") if os.path.isdir(source) else source
+        paths = sorted(path for path in glob.glob(pattern) if path.lower().endswith(IMAGE_EXTENSIONS))
+        if not paths:
+            raise FileNotFoundError(f"No se encontraron imágenes en {source}")
+        return "images", paths
+    if not os.path.isfile(source):
+        raise FileNotFoundError(f"No se encontró el video {source}")
+    return "video", source
+
+
+def open_capture(kind, argument):
+    """Abre la captura en el proceso actual"""
+    if kind == "images":
+        return ImageSequenceCapture(argument)
+    return cv2.VideoCapture(argument)
+
+
+def _ring_size(slots, shape):
+    return (3 * slots + _STATE_FIELDS) * 8 + slots * int(np.prod(shape))
+
+
+def _ring_views(buffer, slots, shape):
+    """
+    Vistas sobre el bloque compartido: por casilla la secuencia del frame (-1 mientras
+    se escribe), la cantidad de lecturas que lo retienen y su timestamp; el estado
+    global y los frames.
+    """
+    header = np.ndarray((3 * slots + _STATE_FIELDS,), dtype=np.int64, buffer=buffer)
+    seqs = header[:slots]
+    pins = header[slots:2 * slots]
+    timestamps = header[2 * slots:3 * slots].view(np.float64)
+    state = header[3 * slots:]
+    frames = np.ndarray((slots, *shape), dtype=np.uint8, buffer=buffer, offset=header.nbytes)
+    return seqs, pins, timestamps, state, frames
+
+
+def _free_slot(seqs, pins, state, drop_frames):
+    """Casilla más vieja que se puede sobrescribir (None si no hay)"""
+    free = pins == 0
+    if drop_frames:
+        # Nunca el último frame publicado: el lector puede estar por tomarlo
+        if state[_LATEST_SLOT] >= 0:
+            free[state[_LATEST_SLOT]] = False
+    else:
+        # Sin descarte solo se reutilizan casillas ya leídas
+        free &= seqs <= state[_CONSUMED]
+    candidates = np.flatnonzero(free)
+    if len(candidates) == 0:
+        return None
+    return int(candidates[np.argmin(seqs[candidates])])
+
+
+def _write_frames(capture, first_frame, buffer, slots, drop_frames, pace, fps, condition):
+    """Decodifica la fuente en el buffer circular hasta que se termina o se pide parar"""
+    seqs, pins, timestamps, state, frames = _ring_views(buffer, slots, first_frame.shape)
+    height, width = first_frame.shape[:2]
+    interval = 1.0 / fps if pace else 0.0
+    next_time = time.perf_counter()
+    frame = first_frame
+    seq = 0
+    try:
+        while True:
+            with condition:
+                condition.wait_for(lambda: state[_STOP] or _free_slot(seqs, pins, state, drop_frames) is not None)
+                if state[_STOP]:
+                    break
+                slot = _free_slot(seqs, pins, state, drop_frames)
+                seqs[slot] = -1
+            target = frames[slot]
+
+            if frame is None:
+                # Si el tamaño coincide OpenCV decodifica directamente en la memoria compartida
+                ret, frame = capture.read(target)
+                if not ret:
+                    with condition:
+                        seqs[slot] = 0
+                    break
+            if frame.ctypes.data != target.ctypes.data:
+                if frame.shape == target.shape:
+                    np.copyto(target, frame)
+                else:
+                    cv2.resize(frame, (width, height), dst=target)
+            frame = None
+
+            if interval:
+                next_time += interval
+                time.sleep(max(0.0, next_time - time.perf_counter()))
+
+            with condition:
+                seq += 1
+                seqs[slot] = seq
+                timestamps[slot] = time.time()
+                state[_LATEST] = seq
+                state[_LATEST_SLOT] = slot
+                condition.notify_all()
+    finally:
+        with condition:
+            state[_CLOSED] = 1
+            condition.notify_all()
+
+
+def _decode_worker(kind, argument, slots, drop_frames, pace, conn, condition):
+    """Proceso decodificador: abre la fuente, informa el tamaño de frame y escribe en el buffer"""
+    capture = open_capture(kind, argument)
+    ret, frame = capture.read() if capture.isOpened() else (False, None)
+    if not ret:
+        conn.send(("error", f"No se pudo abrir la fuente {argument}"))
+        capture.release()
+        return
+    fps = capture.get(cv2.CAP_PROP_FPS) or DEFAULT_FPS
+    conn.send(("ok", frame.shape, fps))
+    try:
+        name = conn.recv()
+    except EOFError:
+        capture.release()
+        return
+
+    memory = shared_memory.SharedMemory(name=name)
+    try:
+        _write_frames(capture, frame, memory.buf, slots, drop_frames, pace, fps, condition)
+    finally:
+        capture.release()
+        del frame
+        memory.close()
+
+
+class SharedFrameSource:
+    """
+    Fuente de frames decodificada en otro proceso, con la interfaz de cv2.VideoCapture.
+
+    read() devuelve una vista del buffer compartido (sin copia) que sigue siendo válida
+    durante las `hold` lecturas siguientes; para conservar un frame más tiempo hay que copiarlo.
+
+    Args:
+        source: Índice de cámara, archivo de video, carpeta o patrón glob de imágenes
+        drop_frames: Entregar siempre el frame más reciente descartando los no leídos (por
+                     defecto, solo con cámara). Sin descarte se entregan todos los frames en
+                     orden y el decodificador espera cuando el buffer está lleno, así una
+                     grabación se reproduce siempre igual.
+        pace: Reproducir videos y secuencias a sus FPS (si no, tan rápido como se lean)
+        slots: Frames del buffer circular
+        hold: Lecturas durante las que un frame devuelto no se sobrescribe
+    """
+
+    def __init__(self, source=0, drop_frames=None, pace=False, slots=RING_SLOTS, hold=HOLD_FRAMES):
+        if slots < hold + 2:
+            raise ValueError(f"El buffer necesita al menos {hold + 2} casillas para retener {hold} frames")
+        kind, argument = resolve_source(source)
+        self.source = source
+        self.drop_frames = kind == "camera" if drop_frames is None else drop_frames
+        self.slots = slots
+        self.hold = hold
+        self.fps = 0.0
+        self.shape = None
+        self.error = None
+        self._memory = None
+        self._views = None
+        self._leases = collections.deque()
+        self._last_seq = 0
+
+        context = multiprocessing.get_context("spawn")
+        self._condition = context.Condition()
+        conn, child_conn = context.Pipe()
+        self._process = context.Process(
+            target=_decode_worker,
+            args=(kind, argument, slots, self.drop_frames, pace, child_conn, self._condition),
+            name="va-frame-source", daemon=True
+        )
+        self._process.start()
+        child_conn.close()
+
+        if not conn.poll(OPEN_TIMEOUT):
+            self.error = f"La fuente {source} no entregó frames en {OPEN_TIMEOUT:.0f}s"
+            self.release()
+            return
+        message = conn.recv()
+        if message[0] != "ok":
+            self.error = message[1]
+            self.release()
+            return
+        _, self.shape, self.fps = message
+
+        self._memory = shared_memory.SharedMemory(create=True, size=_ring_size(slots, self.shape))
+        self._views = _ring_views(self._memory.buf, slots, self.shape)
+        seqs, pins, _, state, _ = self._views
+        seqs[:] = 0
+        pins[:] = 0
+        state[:] = 0
+        state[_LATEST_SLOT] = -1
+        conn.send(self._memory.name)
+        conn.close()
+
+    def isOpened(self):
+        return self._views is not None
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        if self.shape is not None and prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self.shape[1])
+        if self.shape is not None and prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self.shape[0])
+        return 0.0
+
+    def read(self, image=None):
+        """
+        Espera el siguiente frame.
+
+        Returns:
+            Tupla (True, frame) o (False, None) al terminar la fuente
+        """
+        if self._views is None:
+            return False, None
+        seqs, pins, _, state, frames = self._views
+        if self.drop_frames:
+            def ready():
+                return state[_LATEST] > self._last_seq
+        else:
+            def ready():
+                return bool((seqs == self._last_seq + 1).any())
+
+        with self._condition:
+            while not self._condition.wait_for(lambda: ready() or state[_CLOSED], 0.5):
+                if not self._process.is_alive():
+                    break
+            if not ready():
+                return False, None
+            if self.drop_frames:
+                seq, slot = int(state[_LATEST]), int(state[_LATEST_SLOT])
+            else:
+                seq = self._last_seq + 1
+                slot = int(np.flatnonzero(seqs == seq)[0])
+            # Retener el frame entregado y liberar el más viejo
+            pins[slot] += 1
+            self._leases.append(slot)
+            if len(self._leases) > self.hold:
+                pins[self._leases.popleft()] -= 1
+            state[_CONSUMED] = seq
+            self._condition.notify_all()
+        self._last_seq = seq
+        return True, frames[slot]
+
+    def lease(self):
+        """
+        Retiene el último frame devuelto por read() más allá de las `hold` lecturas.
+
+        Returns:
+            Función que libera el frame (se llama una sola vez, al terminar de usarlo)
+        """
+        slot = self._leases[-1]
+        pins = self._views[1]
+        with self._condition:
+            pins[slot] += 1
+
+        def release():
+            with self._condition:
+                if self._views is not None:
+                    pins[slot] -= 1
+                    self._condition.notify_all()
+        return release
+
+    def release(self):
+        """Detiene el decodificador y libera la memoria compartida"""
+        if self._process is not None:
+            if self._views is not None:
+                with self._condition:
+                    self._views[3][_STOP] = 1
+                    self._condition.notify_all()
+            self._process.join(timeout=2)
+            if self._process.is_alive():
+                self._process.terminate()
+                self._process.join()
+            self._process = None
+        if self._memory is not None:
+            self._views = None
+            try:
+                self._memory.close()
+            except BufferError:
+                # Todavía hay frames en uso: el mapeo se libera junto con ellos
+                pass
+            self._memory.unlink()
+            self._memory = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def open_frame_source(source=0, shared=True, **kwargs):
+    """
+    Abre una fuente de frames.
+
+    Args:
+        source: Índice de cámara, archivo de video, carpeta o patrón glob de imágenes
+        shared: Decodificar en otro proceso con memoria compartida (si no, en el proceso actual)
+        **kwargs: Opciones de SharedFrameSource
+
+    Returns:
+        Objeto con la interfaz de cv2.VideoCapture
+    """
+    if shared:
+        return SharedFrameSource(source, **kwargs)
+    return open_capture(*resolve_source(source))
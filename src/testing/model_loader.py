@@ -0,0 +1,149 @@
+"""
+Carga de modelos para inferencia: Keras (.h5) o TensorFlow Lite (.tflite).
+Ambos exponen input_shape y predict(imágenes) -> probabilidades.
+
+Los modelos con preprocesamiento integrado (create_model con embed_preprocessing)
+reciben imágenes uint8 BGR de cualquier tamaño tal como salen de OpenCV; el resto,
+float32 RGB en [0, 1] del tamaño de entrada. Ver uses_raw_input y get_input_size.
+"""
+
+import os
+from collections import OrderedDict
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras.models import load_model
+
+# Importar configuración desde archivo centralizado
+from src.config import IMG_SIZE, MODEL_CACHE_SIZE
+
+# Hilos para el intérprete TFLite (None = los que decida TFLite)
+TFLITE_THREADS = None
+
+# Modelos que se mantienen cargados entre usos (hasta MODEL_CACHE_SIZE)
+_model_cache = OrderedDict()
+
+
+class TFLiteModel:
+    """
+    Envoltorio de tf.lite.Interpreter con la misma interfaz básica que un modelo Keras.
+
+    Cuantiza la entrada y descuantiza la salida automáticamente para los modelos
+    de cuantización entera, por lo que recibe imágenes float32 en [0, 1] (o uint8 sin
+    procesar si el modelo trae el preprocesamiento integrado).
+    """
+
+    def __init__(self, model_path, num_threads=TFLITE_THREADS):
+        self.model_path = model_path
+        self.interpreter = tf.lite.Interpreter(model_path=model_path, num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self._shape = tuple(int(dim) for dim in self._input["shape"])
+        # Entrada uint8 sin parámetros de cuantización: imágenes crudas (preprocesamiento integrado)
+        self.raw_input = self._input["dtype"] == np.uint8 and not self._input["quantization"][0]
+        self.img_size = self._stored_img_size() if self.raw_input else self._shape[1:3]
+
+    def _stored_img_size(self):
+        """Tamaño interno de un modelo de entrada libre, según sus metadatos"""
+        from src.training.model_registry import read_metadata
+        metadata = read_metadata(self.model_path) or {}
+        return tuple(metadata.get("img_size", IMG_SIZE))
+
+    @property
+    def input_shape(self):
+        signature = self._input.get("shape_signature", self._input["shape"])
+        return (None, *[int(dim) if dim > 0 else None for dim in signature[1:]])
+
+    @property
+    def output_shape(self):
+        return (None, *[int(dim) for dim in self._output["shape"][1:]])
+
+    def _resize_input(self, shape):
+        """Ajusta la forma de entrada del intérprete (lote o, si es libre, tamaño) si cambió"""
+        if shape != self._shape:
+            self.interpreter.resize_tensor_input(self._input["index"], list(shape))
+            self.interpreter.allocate_tensors()
+            self._input = self.interpreter.get_input_details()[0]
+            self._output = self.interpreter.get_output_details()[0]
+            self._shape = shape
+
+    def predict(self, images):
+        """Clasifica un lote de imágenes y devuelve las probabilidades"""
+        images = np.asarray(images)
+        self._resize_input(images.shape)
+
+        dtype = self._input["dtype"]
+        if dtype != np.float32 and not self.raw_input:
+            scale, zero_point = self._input["quantization"]
+            info = np.iinfo(dtype)
+            images = np.clip(np.round(images / scale + zero_point), info.min, info.max)
+        self.interpreter.set_tensor(self._input["index"], images.astype(dtype, copy=False))
+        self.interpreter.invoke()
+
+        outputs = self.interpreter.get_tensor(self._output["index"])
+        if self._output["dtype"] != np.float32:
+            scale, zero_point = self._output["quantization"]
+            outputs = (outputs.astype(np.float32) - zero_point) * scale
+        return outputs
+
+    __call__ = predict
+
+
+def load_inference_model(model_path, use_cache=True):
+    """
+    Carga un modelo según su extensión.
+
+    Los últimos MODEL_CACHE_SIZE modelos quedan en memoria; si el archivo cambia
+    (p. ej. tras reentrenar) se vuelve a cargar.
+
+    Returns:
+        TFLiteModel para .tflite o modelo de Keras para .h5
+    """
+    if not os.path.exists(model_path):
+        raise FileNotFoundError(f"No se encontró el modelo {model_path}")
+
+    key = (os.path.abspath(model_path), os.stat(model_path).st_mtime_ns)
+    if use_cache and key in _model_cache:
+        _model_cache.move_to_end(key)
+        return _model_cache[key]
+
+    if model_path.endswith(".tflite"):
+        model = TFLiteModel(model_path)
+    else:
+        model = load_model(model_path)
+
+    if use_cache and MODEL_CACHE_SIZE > 0:
+        # Descartar versiones anteriores del mismo archivo y luego las menos usadas
+        for old_key in [k for k in _model_cache if k[0] == key[0]]:
+            del _model_cache[old_key]
+        _model_cache[key] = model
+        while len(_model_cache) > MODEL_CACHE_SIZE:
+            _model_cache.popitem(last=False)
+    return model
+
+
+def is_keras_model(model):
+    """Indica si el modelo es de Keras (y no un TFLiteModel)"""
+    return isinstance(model, tf.keras.Model)
+
+
+def uses_raw_input(model):
+    """Indica si el modelo trae el preprocesamiento integrado (recibe uint8 BGR de cualquier tamaño)"""
+    if is_keras_model(model):
+        return model.input.dtype == tf.uint8
+    return model.raw_input
+
+
+def get_input_size(model):
+    """
+    Tamaño de imagen con el que trabaja el modelo.
+
+    En los modelos de entrada libre es el de su capa Resizing: redimensionar antes a
+    ese tamaño (p. ej. para armar lotes) no cambia el resultado.
+    """
+    if not is_keras_model(model):
+        return tuple(model.img_size)
+    for layer in model.layers:
+        if isinstance(layer, tf.keras.layers.Resizing):
+            return (layer.height, layer.width)
+    return tuple(model.input_shape[1:3])
@@ -1,45 +1,88 @@
 """
 Script para clasificación en tiempo real usando la cámara.
 Carga un modelo entrenado y muestra las predicciones en vivo.
+
+También acepta un video o una carpeta de imágenes en lugar de la cámara:
+    python -m src.testing.realtime_classification -a mobilenet --source grabacion.mp4
 """
 
+import argparse
 import cv2
 import numpy as np
-from tensorflow.keras.models import load_model
 import os
 
+from src.training.model_registry import load_registered_model
+from src.testing.realtime_pipeline import run_pipelined_classification
+from src.testing.frame_source import open_frame_source
+from src.testing.model_loader import uses_raw_input, get_input_size
+
 # Configuración
 # Obtener la ruta base del proyecto (dos niveles arriba de este archivo)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) 
 DEFAULT_MODEL_PATH = os.path.join(BASE_DIR, "models", "efficientnet_carne_vacuna.h5")
-IMG_SIZE = (224, 224)
+# Clases de respaldo para modelos sin metadatos (.meta.json) ni carpeta de entrenamiento
 CLASS_NAMES = ["asado", "entrania", "matambre", "nalga", "paleta", "vacio"]
+PIPELINED = True  # Captura e inferencia en hilos separados
+STRIDE = 1  # Clasificar uno de cada N frames (solo en modo pipeline)
+SOURCE = 0  # Índice de cámara, archivo de video o carpeta de imágenes
+SHARED_SOURCE = True  # Decodificar los frames en un proceso aparte con memoria compartida
+
 
+def get_model_path(architecture: str) -> str:
+    """Ruta del modelo entrenado para una arquitectura"""
+    return os.path.join(BASE_DIR, "models", f"{architecture}_carne_vacuna.h5")
 
-def run_realtime_classification(model_path=DEFAULT_MODEL_PATH, class_names=CLASS_NAMES):
-    """Ejecuta la clasificación en tiempo real usando la cámara"""
+
+def run_realtime_classification(model_path=DEFAULT_MODEL_PATH, class_names=None,
+                                architecture=None, pipelined=PIPELINED, stride=STRIDE,
+                                source=SOURCE, shared_source=SHARED_SOURCE):
+    """
+    Ejecuta la clasificación en tiempo real usando la cámara.
+    
+    Args:
+        model_path: Ruta del modelo .h5 o .tflite (se ignora si se indica architecture)
+        class_names: Nombres de las clases (por defecto, los de los metadatos del modelo)
+        architecture: Arquitectura cuyo modelo entrenado se quiere usar
+        pipelined: Capturar e inferir en hilos separados mostrando FPS y latencia
+        stride: Clasificar uno de cada N frames (solo en modo pipeline)
+        source: Índice de cámara, archivo de video, carpeta o patrón glob de imágenes
+        shared_source: Decodificar en un proceso aparte con memoria compartida
+    """
+    if architecture is not None:
+        model_path = get_model_path(architecture)
     
     print(f"Cargando modelo desde {model_path}...")
-    model = load_model(model_path)
+    model, registered_names, _ = load_registered_model(model_path, fallback_class_names=CLASS_NAMES)
+    class_names = class_names or registered_names
+    img_size = get_input_size(model)
+    raw_input = uses_raw_input(model)
     print("Modelo cargado correctamente.")
 
-    cap = cv2.VideoCapture(0)
+    # Los videos y secuencias se reproducen a sus FPS y sin saltear frames
+    cap = open_frame_source(source, shared=shared_source, pace=True)
 
     if not cap.isOpened():
-        print("Error: no se pudo abrir la cámara.")
+        print(f"Error: no se pudo abrir la fuente {source}.")
         return
 
     print("Presiona 'q' para salir del programa.")
 
+    if pipelined:
+        run_pipelined_classification(model, class_names, img_size, cap, stride=stride)
+        return
+
     while True:
         ret, frame = cap.read()
         if not ret:
             break
 
-        # Preprocesamiento
-        img = cv2.resize(frame, IMG_SIZE)
-        img = img.astype("float32") / 255.0
-        img = np.expand_dims(img, axis=0)
+        # Preprocesamiento (integrado en el modelo si recibe uint8)
+        if raw_input:
+            img = frame[np.newaxis]
+        else:
+            img = cv2.resize(frame, img_size)
+            img = img.astype("float32") / 255.0
+            img = np.expand_dims(img, axis=0)
 
         # Predicción
         predictions = model.predict(img)
@@ -60,5 +103,27 @@ def run_realtime_classification(model_path=DEFAULT_MODEL_PATH, class_names=CLASS
     cv2.destroyAllWindows()
 
 
+def main(argv=None):
+    """Punto de entrada por línea de comandos"""
+    parser = argparse.ArgumentParser(description="Clasificación en tiempo real desde cámara, video o imágenes.")
+    parser.add_argument("-a", "--architecture", default=None,
+                        help="Arquitectura del modelo entrenado a usar")
+    parser.add_argument("-m", "--model", default=DEFAULT_MODEL_PATH, help="Ruta del modelo .h5 o .tflite")
+    parser.add_argument("-s", "--source", default=SOURCE,
+                        help="Índice de cámara, archivo de video, carpeta o patrón glob de imágenes")
+    parser.add_argument("--stride", type=int, default=STRIDE,
+                        help="Clasificar uno de cada N frames (solo en modo pipeline)")
+    parser.add_argument("--no-pipeline", action="store_true",
+                        help="Clasificar cada frame en orden en el hilo principal")
+    parser.add_argument("--no-shared-source", action="store_true",
+                        help="Decodificar en el mismo proceso en lugar de usar memoria compartida")
+    args = parser.parse_args(argv)
+
+    run_realtime_classification(
+        model_path=args.model, architecture=args.architecture, pipelined=not args.no_pipeline,
+        stride=args.stride, source=args.source, shared_source=not args.no_shared_source
+    )
+
+
 if __name__ == "__main__":
-    run_realtime_classification()
+    main()
@@ -5,32 +5,49 @@ Incluye visualización de FPS y mejoras en la interfaz.
 
 import cv2
 import numpy as np
-import tensorflow as tf
 import os
 
+from src.training.model_registry import load_registered_model
+from src.testing.realtime_pipeline import run_pipelined_classification
+from src.testing.frame_source import open_frame_source
+from src.testing.model_loader import uses_raw_input, get_input_size
+
 # Configuración
 # Obtener la ruta base del proyecto (dos niveles arriba de este archivo)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) 
 MODEL_PATH = os.path.join(BASE_DIR, "models", "mobilenetv2_finetuned_model.h5")
-IMG_SIZE = (224, 224)
+# Clases del modelo original (solo si el modelo no tiene metadatos)
 CLASS_NAMES = ["asado", "chorizo", "entrania", "matambre", "nalga", "paleta", "vacio"]
+PIPELINED = True  # Captura e inferencia en hilos separados
+STRIDE = 1  # Clasificar uno de cada N frames (solo en modo pipeline)
+SOURCE = 0  # Índice de cámara, archivo de video o carpeta de imágenes
+SHARED_SOURCE = True  # Decodificar los frames en un proceso aparte con memoria compartida
 
 
-def run_mobilenet_classification(model_path=MODEL_PATH, class_names=CLASS_NAMES):
-    """Ejecuta la clasificación en tiempo real con MobileNetV2"""
+def run_mobilenet_classification(model_path=MODEL_PATH, class_names=None,
+                                 pipelined=PIPELINED, stride=STRIDE, source=SOURCE):
+    """Ejecuta la clasificación en tiempo real con MobileNetV2 (source: cámara, video o imágenes)"""
     
     print("Cargando modelo...")
-    model = tf.keras.models.load_model(model_path)
+    model, registered_names, _ = load_registered_model(model_path, fallback_class_names=CLASS_NAMES)
+    class_names = class_names or registered_names
+    img_size = get_input_size(model)
+    raw_input = uses_raw_input(model)
     print("Modelo cargado correctamente.")
 
-    cap = cv2.VideoCapture(0)
+    # Los videos y secuencias se reproducen a sus FPS y sin saltear frames
+    cap = open_frame_source(source, shared=SHARED_SOURCE, pace=True)
 
     if not cap.isOpened():
-        print("Error: no se pudo abrir la cámara.")
+        print(f"Error: no se pudo abrir la fuente {source}.")
         return
 
     print("Presiona 'q' para salir del programa.")
 
+    if pipelined:
+        run_pipelined_classification(model, class_names, img_size, cap, stride=stride)
+        return
+
     while True:
         ret, frame = cap.read()
         if not ret:
@@ -38,10 +55,13 @@ def run_mobilenet_classification(model_path=MODEL_PATH, class_names=CLASS_NAMES)
 
         display_frame = frame.copy()
 
-        # Preprocesamiento
-        img = cv2.resize(frame, IMG_SIZE)
-        img = img.astype("float32") / 255.0
-        img = np.expand_dims(img, axis=0)
+        # Preprocesamiento (integrado en el modelo si recibe uint8)
+        if raw_input:
+            img = frame[np.newaxis]
+        else:
+            img = cv2.resize(frame, img_size)
+            img = img.astype("float32") / 255.0
+            img = np.expand_dims(img, axis=0)
 
         # Predicción
         preds = model.predict(img)
@@ -0,0 +1,295 @@
+"""
+Pipeline de clasificación en tiempo real en hilos separados.
+La captura, la inferencia y la visualización corren en paralelo y siempre se usa el frame más reciente.
+"""
+
+import time
+import weakref
+import threading
+import cv2
+import numpy as np
+import tensorflow as tf
+
+from src.testing.model_loader import is_keras_model, uses_raw_input
+from src.testing.frame_source import SharedFrameSource
+
+WINDOW_NAME = "Clasificacion en tiempo real"
+
+# Funciones ya compiladas por modelo: volver a un modelo en caché no repite el trazado
+_compiled_predict_fns = weakref.WeakKeyDictionary()
+
+
+def _update_fps(fps, elapsed):
+    """Promedio móvil exponencial de los FPS"""
+    instant = 1.0 / max(elapsed, 1e-6)
+    return instant if fps == 0 else 0.9 * fps + 0.1 * instant
+
+
+class FrameLease:
+    """
+    Cuenta las referencias a un frame de memoria compartida.
+
+    La casilla del buffer queda retenida mientras el frame esté publicado o en uso
+    por algún consumidor; al soltarse la última referencia se libera.
+    """
+
+    def __init__(self, release):
+        self._release = release
+        self._count = 1
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            self._count += 1
+
+    def release(self):
+        with self._lock:
+            self._count -= 1
+            done = self._count == 0
+        if done:
+            self._release()
+
+
+def release_frame(item):
+    """Suelta la referencia a un frame obtenido con LatestFrameSlot.get"""
+    if item[3] is not None:
+        item[3].release()
+
+
+class LatestFrameSlot:
+    """
+    Casilla de un solo frame donde el último en llegar reemplaza al anterior.
+
+    Cada frame lleva un número de secuencia, así varios consumidores pueden
+    esperar el siguiente frame sin quitárselo a los demás. Los frames de memoria
+    compartida llevan un FrameLease: quien obtiene uno con get() debe soltarlo con
+    release_frame al terminar de usarlo.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._item = None
+        self._closed = False
+
+    def put(self, frame, timestamp, lease=None):
+        """Publica un frame nuevo descartando el anterior"""
+        with self._condition:
+            previous = self._item
+            seq = previous[0] + 1 if previous else 1
+            self._item = (seq, frame, timestamp, lease)
+            self._condition.notify_all()
+        if previous is not None:
+            release_frame(previous)
+
+    def get(self, last_seq=0, timeout=1.0):
+        """
+        Espera un frame con secuencia mayor a last_seq.
+
+        Returns:
+            Tupla (secuencia, frame, timestamp, lease) o None si la fuente se cerró o no llegó nada
+        """
+        with self._condition:
+            self._condition.wait_for(
+                lambda: self._closed or (self._item and self._item[0] > last_seq), timeout
+            )
+            if self._item and self._item[0] > last_seq:
+                if self._item[3] is not None:
+                    self._item[3].acquire()
+                return self._item
+            return None
+
+    def close(self):
+        """Indica que no llegarán más frames"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    @property
+    def closed(self):
+        return self._closed
+
+
+def compile_predict_fn(model, img_size):
+    """
+    Compila la inferencia de un solo frame con tf.function.
+
+    Llamar al modelo directamente evita el costo fijo de model.predict por frame
+    y la firma fija evita retrazados. Los modelos TFLite se invocan tal cual.
+    Si el modelo trae el preprocesamiento integrado la firma acepta frames uint8
+    de cualquier tamaño.
+    """
+    if not is_keras_model(model):
+        return model.predict
+
+    raw_input = uses_raw_input(model)
+    img_size = (None, None) if raw_input else tuple(img_size)
+    compiled = _compiled_predict_fns.setdefault(model, {})
+    if img_size in compiled:
+        return compiled[img_size]
+
+    # Referencia débil: la función guardada no debe impedir liberar el modelo
+    model_ref = weakref.ref(model)
+
+    @tf.function(input_signature=[tf.TensorSpec((1, *img_size, 3), tf.uint8 if raw_input else tf.float32)])
+    def predict(images):
+        return model_ref()(images, training=False)
+
+    compiled[img_size] = lambda images: predict(tf.constant(images)).numpy()
+    return compiled[img_size]
+
+
+class CaptureThread(threading.Thread):
+    """
+    Lee frames de la fuente y los publica en un LatestFrameSlot.
+
+    Los frames de SharedFrameSource se publican sin copiar: son vistas del buffer
+    compartido que quedan retenidas (FrameLease) mientras se usan.
+    """
+
+    def __init__(self, capture, slot):
+        super().__init__(daemon=True)
+        self.capture = capture
+        self.slot = slot
+        self.stop_event = threading.Event()
+
+    def run(self):
+        while not self.stop_event.is_set():
+            ret, frame = self.capture.read()
+            if not ret:
+                break
+            # cv2.VideoCapture entrega un arreglo nuevo por frame; los de memoria compartida
+            # se retienen para que el decodificador no los sobrescriba mientras se usan
+            lease = FrameLease(self.capture.lease()) if isinstance(self.capture, SharedFrameSource) else None
+            self.slot.put(frame, time.perf_counter(), lease)
+        self.slot.close()
+
+
+class InferenceThread(threading.Thread):
+    """
+    Clasifica el frame más reciente y guarda la última predicción.
+
+    Con raw_input el frame se pasa tal cual (el modelo redimensiona y normaliza);
+    si no, se preprocesa en buffers reutilizados.
+    """
+
+    def __init__(self, predict_fn, slot, img_size, stride=1, raw_input=False):
+        super().__init__(daemon=True)
+        self.predict_fn = predict_fn
+        self.slot = slot
+        self.img_size = img_size
+        self.raw_input = raw_input
+        self.stride = max(1, stride)
+        self.stop_event = threading.Event()
+        self._lock = threading.Lock()
+        self._result = None
+        self.fps = 0.0
+
+    @property
+    def result(self):
+        """Última predicción: (probabilidades, latencia en segundos) o None"""
+        with self._lock:
+            return self._result
+
+    def run(self):
+        last_seq = 0
+        next_seq = 1
+        last_time = None
+        # Buffers reutilizados entre frames: el preprocesamiento no reserva memoria
+        width, height = self.img_size
+        resized = np.empty((height, width, 3), dtype=np.uint8)
+        batch = np.empty((1, height, width, 3), dtype=np.float32)
+        while not self.stop_event.is_set():
+            item = self.slot.get(last_seq)
+            if item is None:
+                if self.slot.closed:
+                    break
+                continue
+            seq, frame, captured_at, _ = item
+            last_seq = seq
+            try:
+                # Clasificar solo uno de cada `stride` frames capturados
+                if seq < next_seq:
+                    continue
+                next_seq = seq + self.stride
+
+                if self.raw_input:
+                    predictions = self.predict_fn(frame[np.newaxis])[0]
+                else:
+                    cv2.resize(frame, self.img_size, dst=resized)
+                    np.multiply(resized, 1.0 / 255.0, out=batch[0], casting="unsafe")
+                    predictions = self.predict_fn(batch)[0]
+            finally:
+                release_frame(item)
+
+            now = time.perf_counter()
+            with self._lock:
+                self._result = (predictions, now - captured_at)
+            if last_time is not None:
+                self.fps = _update_fps(self.fps, now - last_time)
+            last_time = now
+
+
+def run_pipelined_classification(model, class_names, img_size, capture, stride=1,
+                                 window_name=WINDOW_NAME):
+    """
+    Ejecuta la clasificación con captura, inferencia y visualización en paralelo.
+
+    Args:
+        model: Modelo de Keras ya cargado
+        class_names: Nombres de las clases en el orden de salida del modelo
+        img_size: Tamaño de entrada del modelo
+        capture: Fuente de frames con read() y release() (cv2.VideoCapture o una
+                 fuente de src.testing.frame_source)
+        stride: Clasificar uno de cada N frames capturados
+        window_name: Título de la ventana
+    """
+    slot = LatestFrameSlot()
+    capture_thread = CaptureThread(capture, slot)
+    inference_thread = InferenceThread(compile_predict_fn(model, img_size), slot, img_size, stride,
+                                       raw_input=uses_raw_input(model))
+    capture_thread.start()
+    inference_thread.start()
+
+    last_seq = 0
+    display_fps = 0.0
+    last_time = time.perf_counter()
+    try:
+        while True:
+            item = slot.get(last_seq)
+            if item is None:
+                if slot.closed:
+                    break
+                continue
+            last_seq, frame = item[:2]
+
+            now = time.perf_counter()
+            display_fps = _update_fps(display_fps, now - last_time)
+            last_time = now
+
+            # Única copia del frame: se dibuja sobre ella mientras la inferencia
+            # puede seguir leyendo el original
+            display_frame = frame.copy()
+            release_frame(item)
+            result = inference_thread.result
+            if result is not None:
+                predictions, latency = result
+                class_idx = int(np.argmax(predictions))
+                text = f"{class_names[class_idx]} ({predictions[class_idx] * 100:.1f}%)"
+                cv2.putText(display_frame, text, (20, 40),
+                            cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+                stats = (f"FPS: {display_fps:.1f}  Inferencia: {inference_thread.fps:.1f} FPS  "
+                         f"Latencia: {latency * 1000:.0f} ms")
+                cv2.putText(display_frame, stats, (20, 75),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
+
+            cv2.imshow(window_name, display_frame)
+
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                break
+    finally:
+        capture_thread.stop_event.set()
+        inference_thread.stop_event.set()
+        capture_thread.join(timeout=2)
+        inference_thread.join(timeout=2)
+        capture.release()
+        cv2.destroyAllWindows()
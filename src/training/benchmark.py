@@ -0,0 +1,495 @@
+"""
+Benchmark de las arquitecturas registradas en CPU con entradas sintéticas.
+Mide tiempo de construcción, latencia, throughput por tamaño de lote, memoria y parámetros,
+y guarda los resultados en JSON para poder comparar ejecuciones.
+También compara el tiempo por paso y la precisión de los modos de entrenamiento (XLA / bfloat16)
+y el entrenamiento con resolución progresiva contra la resolución fija.
+
+Uso:
+    python -m src.training.benchmark
+    python -m src.training.benchmark --training-modes -a mobilenet --epochs 2
+    python -m src.training.benchmark --progressive -a mobilenet --epochs 6
+    python -m src.training.benchmark --compare models/benchmarks/a.json models/benchmarks/b.json
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+# Importar configuración desde archivo centralizado
+from src.config import (
+    IMG_SIZE, NUM_CLASSES, MODEL_SAVE_DIR, MODEL_ARCHITECTURE, LEARNING_RATE, EMBED_PREPROCESSING
+)
+
+from src.training.architectures import ARCHITECTURES
+
+BENCHMARK_DIR = os.path.join(MODEL_SAVE_DIR, "benchmarks")
+BATCH_SIZES = (1, 8, 32)
+LATENCY_RUNS = 100
+THROUGHPUT_RUNS = 10
+WARMUP_RUNS = 5
+
+# Tamaño (alto, ancho) de los frames sintéticos para modelos con preprocesamiento
+# integrado: reciben la imagen de la cámara sin redimensionar
+RAW_FRAME_SIZE = (480, 640)
+
+# Métricas donde un valor mayor es mejor (el resto: menor es mejor)
+HIGHER_IS_BETTER = ("throughput",)
+
+# Modos de entrenamiento comparados: nombre -> (jit_compile, precisión)
+TRAINING_MODES = {
+    "float32": (False, "float32"),
+    "xla": (True, "float32"),
+    "bfloat16": (False, "mixed_bfloat16"),
+    "xla_bfloat16": (True, "mixed_bfloat16")
+}
+TRAINING_EPOCHS = 2
+
+
+def _peak_rss_mb():
+    """Pico de memoria residente del proceso actual en MB"""
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa KB y macOS bytes
+    return peak / 1e6 if sys.platform == "darwin" else peak / 1e3
+
+
+def synthetic_images(batch_size, img_size=IMG_SIZE, raw_input=False, seed=0):
+    """
+    Lote de imágenes aleatorias con el formato de entrada del modelo.
+
+    Con raw_input son frames uint8 BGR de RAW_FRAME_SIZE, como los de la cámara,
+    para que la medición incluya el redimensionado integrado en el modelo; si no,
+    float32 en [0, 1] de img_size.
+    """
+    import numpy as np
+    import tensorflow as tf
+
+    rng = np.random.default_rng(seed)
+    if raw_input:
+        return tf.constant(rng.integers(0, 256, (batch_size, *RAW_FRAME_SIZE, 3), dtype=np.uint8))
+    return tf.constant(rng.random((batch_size, *img_size, 3), dtype=np.float32))
+
+
+def measure_latency_percentiles(predict, img_size=IMG_SIZE, runs=LATENCY_RUNS, raw_input=False):
+    """
+    Latencia de clasificar una sola imagen con el modelo ya caliente.
+
+    Args:
+        predict: Función compilada (tf.function) que recibe un lote de imágenes
+        raw_input: El modelo recibe frames uint8 BGR (ver synthetic_images)
+
+    Returns:
+        Diccionario con los percentiles p50, p95 y p99 en ms
+    """
+    import numpy as np
+
+    single = synthetic_images(1, img_size, raw_input)
+    for _ in range(WARMUP_RUNS):
+        predict(single)
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        predict(single).numpy()
+        times.append((time.perf_counter() - start) * 1000)
+    return {
+        "p50": float(np.percentile(times, 50)),
+        "p95": float(np.percentile(times, 95)),
+        "p99": float(np.percentile(times, 99))
+    }
+
+
+def _benchmark_architecture(architecture, batch_sizes, latency_runs, throughput_runs):
+    """
+    Mide una arquitectura dentro de un proceso nuevo (para aislar la memoria).
+
+    Returns:
+        Diccionario con las métricas de la arquitectura
+    """
+    import tensorflow as tf
+    tf.config.set_visible_devices([], "GPU")
+    from src.training.train_model import create_model
+    from src.testing.model_loader import uses_raw_input
+
+    # Pesos de ImageNet si están en caché, si no pesos aleatorios (mismo costo de cómputo)
+    try:
+        start = time.perf_counter()
+        model = create_model(architecture, NUM_CLASSES, weights="imagenet")
+        weights = "imagenet"
+    except Exception:
+        start = time.perf_counter()
+        model = create_model(architecture, NUM_CLASSES, weights=None)
+        weights = "random"
+    build_time = time.perf_counter() - start
+
+    predict = tf.function(lambda images: model(images, training=False))
+    raw_input = uses_raw_input(model)
+
+    latency = measure_latency_percentiles(predict, IMG_SIZE, latency_runs, raw_input)
+
+    # Throughput por tamaño de lote
+    throughput = {}
+    for batch_size in batch_sizes:
+        batch = synthetic_images(batch_size, IMG_SIZE, raw_input)
+        for _ in range(2):
+            predict(batch)
+        start = time.perf_counter()
+        for _ in range(throughput_runs):
+            predict(batch).numpy()
+        throughput[str(batch_size)] = batch_size * throughput_runs / (time.perf_counter() - start)
+
+    return {
+        "name": ARCHITECTURES[architecture]["name"],
+        "weights": weights,
+        "params": int(model.count_params()),
+        "input": {"size": list(RAW_FRAME_SIZE if raw_input else IMG_SIZE),
+                  "dtype": "uint8" if raw_input else "float32"},
+        "build_time_s": build_time,
+        "latency_ms": latency,
+        "throughput": throughput,
+        "peak_rss_mb": _peak_rss_mb()
+    }
+
+
+def _host_info():
+    """Datos de la máquina donde se ejecuta el benchmark"""
+    import tensorflow as tf
+    from src.training.train_model import cpu_supports_bfloat16
+    return {
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "tensorflow": tf.__version__,
+        "cpu_bfloat16": cpu_supports_bfloat16()
+    }
+
+
+def benchmark_architectures(architectures=None, batch_sizes=BATCH_SIZES,
+                            latency_runs=LATENCY_RUNS, throughput_runs=THROUGHPUT_RUNS,
+                            output_dir=BENCHMARK_DIR):
+    """
+    Ejecuta el benchmark de cada arquitectura en un proceso separado y guarda el JSON.
+
+    Returns:
+        Ruta del archivo de resultados
+    """
+    architectures = architectures or list(ARCHITECTURES.keys())
+
+    report = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "host": _host_info(),
+        "img_size": list(IMG_SIZE),
+        "batch_sizes": list(batch_sizes),
+        "results": {}
+    }
+
+    context = multiprocessing.get_context("spawn")
+    for architecture in architectures:
+        print(f"Midiendo {ARCHITECTURES[architecture]['name']}...")
+        # Un proceso nuevo por arquitectura: construcción en frío y memoria pico aislada
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            result = executor.submit(
+                _benchmark_architecture, architecture, batch_sizes, latency_runs, throughput_runs
+            ).result()
+        report["results"][architecture] = result
+
+    print_benchmark(report)
+
+    os.makedirs(output_dir, exist_ok=True)
+    output_path = os.path.join(output_dir, f"benchmark_{datetime.now():%Y%m%d_%H%M%S}.json")
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResultados guardados en {output_path}")
+    return output_path
+
+
+def print_benchmark(report):
+    """Imprime la tabla de resultados de un benchmark"""
+    batch_sizes = report["batch_sizes"]
+    header = (f"{'Arquitectura':<16}{'Params (M)':>11}{'Build (s)':>10}"
+              f"{'p50 (ms)':>10}{'p95 (ms)':>10}{'p99 (ms)':>10}{'RSS (MB)':>10}")
+    header += "".join(f"{f'img/s b={b}':>12}" for b in batch_sizes)
+    print(f"\n{header}")
+    print("-" * len(header))
+    for result in report["results"].values():
+        line = (f"{result['name']:<16}{result['params'] / 1e6:>11.2f}{result['build_time_s']:>10.2f}"
+                f"{result['latency_ms']['p50']:>10.2f}{result['latency_ms']['p95']:>10.2f}"
+                f"{result['latency_ms']['p99']:>10.2f}{result['peak_rss_mb']:>10.0f}")
+        line += "".join(f"{result['throughput'].get(str(b), 0):>12.1f}" for b in batch_sizes)
+        print(line)
+
+
+def _flatten(result, prefix=""):
+    """Aplana las métricas numéricas de un resultado ("latency_ms.p50": valor)"""
+    flat = {}
+    for key, value in result.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)):
+            flat[name] = value
+    return flat
+
+
+def compare_benchmarks(baseline_path, candidate_path, threshold=0.10):
+    """
+    Compara dos resultados de benchmark e informa regresiones.
+
+    Args:
+        baseline_path: JSON de referencia
+        candidate_path: JSON a comparar
+        threshold: Variación relativa a partir de la cual se marca un cambio
+
+    Returns:
+        Lista de regresiones (arquitectura, métrica, antes, después)
+    """
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(candidate_path, "r", encoding="utf-8") as f:
+        candidate = json.load(f)
+
+    regressions = []
+    for architecture, base_result in baseline["results"].items():
+        if architecture not in candidate["results"]:
+            continue
+        print(f"\n{base_result['name']}")
+        base_flat = _flatten(base_result)
+        cand_flat = _flatten(candidate["results"][architecture])
+        for metric, before in base_flat.items():
+            after = cand_flat.get(metric)
+            if after is None or before == 0:
+                continue
+            change = (after - before) / before
+            higher_is_better = metric.startswith(HIGHER_IS_BETTER)
+            worse = change < -threshold if higher_is_better else change > threshold
+            better = change > threshold if higher_is_better else change < -threshold
+            mark = "REGRESIÓN" if worse else ("mejora" if better else "")
+            print(f"  {metric:<22}{before:>12.2f} -> {after:>12.2f} ({change * 100:+6.1f}%) {mark}")
+            if worse and metric != "params":
+                regressions.append((architecture, metric, before, after))
+
+    print(f"\nRegresiones: {len(regressions)}")
+    return regressions
+
+
+def _train_with_mode(architecture, jit_compile, precision, epochs, embed_preprocessing=EMBED_PREPROCESSING):
+    """
+    Entrena unas épocas con un modo dado dentro de un proceso nuevo.
+
+    Los datos se entregan en el formato de entrada del modelo (uint8 BGR si trae el
+    preprocesamiento integrado), igual que en train_model.
+
+    Returns:
+        Diccionario con tiempos por paso y precisiones
+    """
+    import numpy as np
+    import tensorflow as tf
+    from tensorflow.keras.optimizers import Adam
+    from src.training.train_model import create_model
+    from src.training.data_pipeline import create_datasets
+
+    tf.keras.utils.set_random_seed(0)
+    try:
+        model = create_model(architecture, NUM_CLASSES, weights="imagenet", precision=precision,
+                             embed_preprocessing=embed_preprocessing)
+        weights = "imagenet"
+    except Exception:
+        model = create_model(architecture, NUM_CLASSES, weights=None, precision=precision,
+                             embed_preprocessing=embed_preprocessing)
+        weights = "random"
+    model.compile(
+        optimizer=Adam(learning_rate=LEARNING_RATE),
+        loss="categorical_crossentropy",
+        metrics=["accuracy"],
+        jit_compile=jit_compile
+    )
+
+    # Imágenes decodificadas en memoria: se mide el modelo y no la lectura de disco
+    train_ds, val_ds, test_ds = create_datasets(cache="memory", raw_input=embed_preprocessing)
+    step_times = []
+
+    class StepTimer(tf.keras.callbacks.Callback):
+        def on_train_batch_begin(self, batch, logs=None):
+            self._start = time.perf_counter()
+
+        def on_train_batch_end(self, batch, logs=None):
+            step_times.append(time.perf_counter() - self._start)
+
+    history = model.fit(train_ds, epochs=epochs, validation_data=val_ds,
+                        callbacks=[StepTimer()], verbose=0)
+    test_loss, test_accuracy = model.evaluate(test_ds, verbose=0)
+
+    # El primer paso incluye el trazado (y la compilación XLA); se informa aparte.
+    # La primera época además llena la caché de imágenes, por eso se usa la última.
+    steps_per_epoch = len(step_times) // epochs
+    steady = step_times[-steps_per_epoch:] if epochs > 1 else step_times[1:]
+    return {
+        "weights": weights,
+        "first_step_s": step_times[0],
+        "step_ms": float(np.median(steady) * 1000) if steady else 0.0,
+        "val_accuracy": float(history.history["val_accuracy"][-1]),
+        "test_accuracy": float(test_accuracy),
+        "test_loss": float(test_loss)
+    }
+
+
+def benchmark_training_modes(architecture=MODEL_ARCHITECTURE, modes=None, epochs=TRAINING_EPOCHS,
+                             output_dir=BENCHMARK_DIR, embed_preprocessing=EMBED_PREPROCESSING):
+    """
+    Compara tiempo por paso y precisión de los modos de entrenamiento contra float32.
+
+    Cada modo se entrena desde la misma semilla en un proceso nuevo, así la
+    política de precisión y la compilación XLA no se mezclan entre modos.
+
+    Returns:
+        Ruta del archivo de resultados
+    """
+    # float32 siempre se entrena: es la referencia de la comparación
+    modes = ["float32"] + [mode for mode in (modes or TRAINING_MODES) if mode != "float32"]
+    report = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "host": _host_info(),
+        "architecture": architecture,
+        "img_size": list(IMG_SIZE),
+        "embed_preprocessing": embed_preprocessing,
+        "epochs": epochs,
+        "results": {}
+    }
+    if not report["host"]["cpu_bfloat16"] and any("bfloat16" in mode for mode in modes):
+        print("Aviso: la CPU no tiene instrucciones bfloat16 nativas; "
+              "los modos bfloat16 se emulan y suelen ser más lentos.")
+
+    context = multiprocessing.get_context("spawn")
+    for mode in modes:
+        jit_compile, precision = TRAINING_MODES[mode]
+        print(f"Entrenando {ARCHITECTURES[architecture]['name']} en modo {mode}...")
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            report["results"][mode] = executor.submit(
+                _train_with_mode, architecture, jit_compile, precision, epochs, embed_preprocessing
+            ).result()
+
+    baseline = report["results"]["float32"]
+    print(f"\n{'Modo':<14}{'Paso (ms)':>11}{'Aceleración':>13}{'1er paso (s)':>14}"
+          f"{'Val acc':>10}{'Test acc':>10}{'Δ acc':>9}")
+    print("-" * 81)
+    for mode, result in report["results"].items():
+        speedup = baseline["step_ms"] / result["step_ms"] if result["step_ms"] else 0.0
+        delta = (result["test_accuracy"] - baseline["test_accuracy"]) * 100
+        print(f"{mode:<14}{result['step_ms']:>11.1f}{speedup:>12.2f}x{result['first_step_s']:>14.1f}"
+              f"{result['val_accuracy'] * 100:>9.1f}%{result['test_accuracy'] * 100:>9.1f}%{delta:>+8.1f}")
+
+    os.makedirs(output_dir, exist_ok=True)
+    output_path = os.path.join(output_dir, f"training_modes_{datetime.now():%Y%m%d_%H%M%S}.json")
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResultados guardados en {output_path}")
+    return output_path
+
+
+def _train_with_schedule(architecture, progressive, epochs):
+    """Entrena sin guardar el modelo, con o sin resolución progresiva (en un proceso nuevo)"""
+    import tensorflow as tf
+    from src.training.train_model import train_model
+
+    tf.keras.utils.set_random_seed(0)
+    # Imágenes decodificadas en memoria: se mide el modelo y no la lectura de disco
+    _, results = train_model(architecture, use_feature_cache=False, loader="tfdata", cache="memory",
+                             progressive=progressive, epochs=epochs, checkpoints=False,
+                             run_log=False, save_model=False, return_results=True)
+    return results
+
+
+def benchmark_progressive(architecture=MODEL_ARCHITECTURE, epochs=TRAINING_EPOCHS, output_dir=BENCHMARK_DIR):
+    """
+    Compara tiempo total y precisión del entrenamiento con resolución progresiva
+    contra el entrenamiento a resolución fija, con las mismas épocas y semilla.
+
+    Returns:
+        Ruta del archivo de resultados
+    """
+    from src.config import PROGRESSIVE_SIZES
+    from src.training.progressive import parse_sizes, build_schedule
+
+    schedule = build_schedule(epochs, parse_sizes(PROGRESSIVE_SIZES))
+    report = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "host": _host_info(),
+        "architecture": architecture,
+        "img_size": list(IMG_SIZE),
+        "epochs": epochs,
+        "schedule": [{**stage, "img_size": list(stage["img_size"])} for stage in schedule],
+        "results": {}
+    }
+
+    context = multiprocessing.get_context("spawn")
+    for mode, progressive in (("fija", False), ("progresiva", True)):
+        print(f"Entrenando {ARCHITECTURES[architecture]['name']} con resolución {mode}...")
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            report["results"][mode] = executor.submit(
+                _train_with_schedule, architecture, progressive, epochs
+            ).result()
+
+    print("\nEtapas: " + ", ".join(
+        f"{stage['img_size'][0]}x{stage['img_size'][1]} (lote {stage['batch_size']}, "
+        f"hasta la época {stage['end_epoch']})" for stage in schedule
+    ))
+    baseline = report["results"]["fija"]
+    print(f"\n{'Resolución':<14}{'Tiempo (s)':>12}{'Aceleración':>13}{'Test acc':>10}{'Δ acc':>9}")
+    print("-" * 58)
+    for mode, result in report["results"].items():
+        speedup = baseline["train_time_s"] / result["train_time_s"] if result["train_time_s"] else 0.0
+        delta = (result["test_accuracy"] - baseline["test_accuracy"]) * 100
+        print(f"{mode:<14}{result['train_time_s']:>12.1f}{speedup:>12.2f}x"
+              f"{result['test_accuracy'] * 100:>9.1f}%{delta:>+8.1f}")
+
+    os.makedirs(output_dir, exist_ok=True)
+    output_path = os.path.join(output_dir, f"progressive_{datetime.now():%Y%m%d_%H%M%S}.json")
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResultados guardados en {output_path}")
+    return output_path
+
+
+def main(argv=None):
+    """Punto de entrada por línea de comandos"""
+    parser = argparse.ArgumentParser(description="Benchmark de arquitecturas en CPU.")
+    parser.add_argument("-a", "--architectures", nargs="+", choices=list(ARCHITECTURES.keys()))
+    parser.add_argument("-b", "--batch-sizes", nargs="+", type=int, default=list(BATCH_SIZES))
+    parser.add_argument("--runs", type=int, default=LATENCY_RUNS, help="Repeticiones de latencia")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NUEVO"),
+                        help="Comparar dos archivos de resultados")
+    parser.add_argument("--threshold", type=float, default=0.10)
+    parser.add_argument("--training-modes", nargs="*", choices=list(TRAINING_MODES.keys()),
+                        help="Comparar modos de entrenamiento (XLA / bfloat16) contra float32")
+    parser.add_argument("--progressive", action="store_true",
+                        help="Comparar resolución progresiva contra resolución fija")
+    parser.add_argument("--epochs", type=int, default=TRAINING_EPOCHS)
+    args = parser.parse_args(argv)
+
+    if args.progressive:
+        architecture = args.architectures[0] if args.architectures else MODEL_ARCHITECTURE
+        benchmark_progressive(architecture, args.epochs)
+        return 0
+
+    if args.training_modes is not None:
+        architecture = args.architectures[0] if args.architectures else MODEL_ARCHITECTURE
+        benchmark_training_modes(architecture, args.training_modes, args.epochs)
+        return 0
+
+    if args.compare:
+        regressions = compare_benchmarks(*args.compare, threshold=args.threshold)
+        return 1 if regressions else 0
+
+    benchmark_architectures(args.architectures, tuple(args.batch_sizes), args.runs)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,201 @@
+"""
+Checkpoints del entrenamiento: reanudación, parada temprana y mejor modelo.
+
+Al final de cada época se guarda un checkpoint con los pesos, el estado del optimizador
+y el progreso (época, mejor val_loss, épocas sin mejora). Si val_loss mejora se guarda
+además en una carpeta aparte que conserva solo el mejor. La escritura es asíncrona:
+tras copiar las variables el entrenamiento sigue mientras los archivos se escriben en
+segundo plano (la primera escritura es más lenta porque prepara la copia).
+
+Junto a los checkpoints se guarda una huella de la configuración (hiperparámetros y
+firma de los datos). Si al reanudar la huella no coincide, el checkpoint viejo se
+descarta y el entrenamiento empieza de cero.
+"""
+
+import os
+import json
+import shutil
+import numpy as np
+import tensorflow as tf
+
+# Importar configuración desde archivo centralizado
+from src.config import (
+    CHECKPOINT_DIR, CHECKPOINT_KEEP, EARLY_STOPPING_PATIENCE, EARLY_STOPPING_MIN_DELTA, RESTORE_BEST
+)
+
+
+def get_checkpoint_dir(architecture, checkpoint_dir=CHECKPOINT_DIR):
+    """Carpeta de checkpoints de una arquitectura"""
+    return os.path.join(checkpoint_dir, architecture)
+
+
+# Archivo con la huella de la configuración dentro de la carpeta de checkpoints
+FINGERPRINT_FILE = "fingerprint.json"
+
+
+class TrainingCheckpoint:
+    """
+    Estado guardable de un entrenamiento.
+
+    Args:
+        model: Modelo completo (también se guarda si solo se entrena la cabeza)
+        optimizer: Optimizador cuyo estado se guarda con cada checkpoint
+        directory: Carpeta de checkpoints de la ejecución
+        keep: Cantidad de checkpoints periódicos que se conservan
+        fingerprint: Diccionario serializable en JSON con la configuración del entrenamiento;
+                     solo se reanuda un checkpoint guardado con la misma huella
+    """
+
+    def __init__(self, model, optimizer, directory, keep=CHECKPOINT_KEEP, fingerprint=None):
+        self.directory = directory
+        # Ida y vuelta por JSON para comparar con la huella leída del archivo (tuplas -> listas)
+        self.fingerprint = json.loads(json.dumps(fingerprint)) if fingerprint is not None else None
+        self.optimizer = optimizer
+        self.model = model
+        self.epoch = tf.Variable(0, dtype=tf.int64, trainable=False)
+        self.best_val_loss = tf.Variable(np.inf, dtype=tf.float64, trainable=False)
+        self.best_epoch = tf.Variable(0, dtype=tf.int64, trainable=False)
+        self.epochs_without_improvement = tf.Variable(0, dtype=tf.int64, trainable=False)
+
+        self.checkpoint = tf.train.Checkpoint(
+            model=model,
+            optimizer=optimizer,
+            epoch=self.epoch,
+            best_val_loss=self.best_val_loss,
+            best_epoch=self.best_epoch,
+            epochs_without_improvement=self.epochs_without_improvement
+        )
+        self.latest_manager = tf.train.CheckpointManager(
+            self.checkpoint, os.path.join(directory, "latest"), max_to_keep=keep
+        )
+        # Mismo objeto para ambos: la preparación de la escritura asíncrona se hace una vez
+        self.best_manager = tf.train.CheckpointManager(
+            self.checkpoint, os.path.join(directory, "best"), max_to_keep=1
+        )
+        self.options = tf.train.CheckpointOptions(experimental_enable_async_checkpoint=True)
+
+    def restore_latest(self):
+        """
+        Restaura el último checkpoint periódico, si existe.
+
+        Returns:
+            Época desde la que se debe continuar (0 si no había checkpoint)
+        """
+        latest = self.latest_manager.latest_checkpoint
+        if latest is None:
+            return 0
+        changed = self._changed_settings()
+        if changed:
+            print(f"Aviso: el checkpoint {latest} se guardó con otra configuración "
+                  f"({', '.join(changed)}); se descarta y se empieza de cero.")
+            self.clear()
+            return 0
+        # Las variables del optimizador deben existir para restaurar su estado
+        self.optimizer.build(self.model.trainable_variables)
+        try:
+            self.checkpoint.restore(latest).assert_existing_objects_matched()
+        except (AssertionError, ValueError) as e:
+            raise ValueError(
+                f"El checkpoint {latest} no coincide con el modelo actual ({e}). "
+                f"Borra {self.directory} o entrena sin reanudar."
+            ) from None
+        print(f"Reanudando desde la época {int(self.epoch.numpy())} ({latest})")
+        return int(self.epoch.numpy())
+
+    def _fingerprint_path(self):
+        return os.path.join(self.directory, FINGERPRINT_FILE)
+
+    def _changed_settings(self):
+        """Claves de la huella que difieren de la guardada (vacío si coinciden o no se usa)"""
+        if self.fingerprint is None:
+            return []
+        try:
+            with open(self._fingerprint_path(), "r", encoding="utf-8") as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return ["huella no encontrada"]
+        keys = sorted(set(saved) | set(self.fingerprint))
+        return [key for key in keys if saved.get(key) != self.fingerprint.get(key)]
+
+    def save_latest(self):
+        if self.fingerprint is not None and not os.path.exists(self._fingerprint_path()):
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self._fingerprint_path(), "w", encoding="utf-8") as f:
+                json.dump(self.fingerprint, f, indent=2, sort_keys=True)
+        self.latest_manager.save(checkpoint_number=int(self.epoch.numpy()), options=self.options)
+
+    def save_best(self):
+        self.best_manager.save(checkpoint_number=int(self.best_epoch.numpy()), options=self.options)
+
+    def sync(self):
+        """Espera a que terminen las escrituras pendientes"""
+        self.checkpoint.sync()
+
+    def restore_best(self):
+        """Carga los pesos del mejor modelo guardado (False si no hay)"""
+        self.sync()
+        best = self.best_manager.latest_checkpoint
+        if best is None:
+            return False
+        # Solo los pesos: el progreso y el optimizador quedan como están
+        tf.train.Checkpoint(model=self.model).restore(best).expect_partial()
+        return True
+
+    def clear(self):
+        """Borra los checkpoints de la ejecución"""
+        self.sync()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class CheckpointCallback(tf.keras.callbacks.Callback):
+    """
+    Guarda checkpoints al final de cada época y detiene el entrenamiento si val_loss
+    no mejora en `patience` épocas (0 = sin parada temprana).
+
+    Los contadores forman parte del checkpoint, así la parada temprana sigue
+    funcionando igual después de reanudar. Con restore_best, al terminar se cargan
+    los pesos de la mejor época antes de evaluar.
+    """
+
+    def __init__(self, state, patience=EARLY_STOPPING_PATIENCE, min_delta=EARLY_STOPPING_MIN_DELTA,
+                 restore_best=RESTORE_BEST):
+        super().__init__()
+        self.state = state
+        self.patience = patience
+        self.min_delta = min_delta
+        self.restore_best = restore_best
+        self.stopped_epoch = None
+
+    def on_epoch_end(self, epoch, logs=None):
+        state = self.state
+        state.epoch.assign(epoch + 1)
+
+        val_loss = (logs or {}).get("val_loss")
+        if val_loss is not None:
+            if val_loss < state.best_val_loss.numpy() - self.min_delta:
+                state.best_val_loss.assign(val_loss)
+                state.best_epoch.assign(epoch + 1)
+                state.epochs_without_improvement.assign(0)
+                state.save_best()
+            else:
+                state.epochs_without_improvement.assign_add(1)
+        state.save_latest()
+
+        if self.patience and state.epochs_without_improvement.numpy() >= self.patience:
+            self.stopped_epoch = epoch + 1
+            self.model.stop_training = True
+            print(f"\nParada temprana: val_loss no mejoró en {self.patience} épocas "
+                  f"(mejor {state.best_val_loss.numpy():.4f} en la época {int(state.best_epoch.numpy())})")
+
+    def restore_best_weights(self):
+        """Carga los pesos de la mejor época si no es la última entrenada"""
+        state = self.state
+        best_epoch = int(state.best_epoch.numpy())
+        if best_epoch and best_epoch != int(state.epoch.numpy()) and state.restore_best():
+            print(f"Usando los pesos de la mejor época ({best_epoch}, "
+                  f"val_loss {state.best_val_loss.numpy():.4f})")
+
+    def on_train_end(self, logs=None):
+        if self.restore_best:
+            self.restore_best_weights()
+        self.state.sync()
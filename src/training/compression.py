@@ -0,0 +1,370 @@
+"""
+Compresión de modelos entrenados: poda por magnitud y agrupamiento de pesos (clustering),
+con un ajuste fino corto sobre TRAIN_DIR.
+
+- Poda: los pesos de menor magnitud de cada capa se ponen en cero, subiendo la dispersión
+  de 0 a la meta durante el ajuste fino (calendario polinomial) para que la red se adapte.
+- Agrupamiento: los pesos de cada capa se reemplazan por el más cercano de num_clusters
+  valores compartidos (k-means 1D); durante el ajuste fino cada centroide pasa a ser la
+  media de sus pesos. Con poda previa los ceros se conservan.
+
+Se aplica con callbacks sobre capas estándar (Conv2D, DepthwiseConv2D, Dense): el .h5
+resultante se carga igual que el original, sin envoltorios ni objetos personalizados.
+Los ceros y los valores repetidos no achican el .h5 ni aceleran el modelo denso: la
+ganancia aparece al comprimir el archivo (se informa el tamaño con gzip) y al exportar
+a TFLite con soporte de dispersión, que XNNPACK usa para acelerar la inferencia en CPU.
+
+Uso:
+    python -m src.training.compression -a resnet --method prune_cluster
+"""
+
+import os
+import json
+import gzip
+import argparse
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras.layers import Conv2D, DepthwiseConv2D, Dense
+from tensorflow.keras.optimizers import Adam
+
+# Importar configuración desde archivo centralizado
+from src.config import (
+    MODEL_ARCHITECTURE, TRAIN_DIR, TEST_DIR, BATCH_SIZE, PIPELINE_CACHE,
+    COMPRESSION_METHOD, TARGET_SPARSITY, NUM_CLUSTERS, COMPRESSION_EPOCHS,
+    COMPRESSION_LEARNING_RATE, SPARSE_TFLITE
+)
+
+from src.training.train_model import get_model_save_path, unfreeze_top_layers
+from src.training.data_pipeline import create_datasets, get_class_indices, list_image_files, decode_image, to_model_input
+from src.training.export_tflite import measure_latency
+from src.training.model_registry import copy_metadata
+from src.testing.evaluation import evaluate_model
+from src.testing.model_loader import TFLiteModel, load_inference_model, uses_raw_input, get_input_size
+
+COMPRESSION_METHODS = ("prune", "cluster", "prune_cluster")
+
+# Sufijo del archivo del modelo comprimido según el método
+COMPRESSED_VARIANTS = {"prune": "pruned", "cluster": "clustered", "prune_cluster": "pruned_clustered"}
+
+# Capas cuyo kernel se comprime
+COMPRESSIBLE_LAYERS = (Conv2D, DepthwiseConv2D, Dense)
+
+# Kernels más chicos no se comprimen (la ganancia es despreciable y dañan la precisión)
+MIN_KERNEL_SIZE = 1024
+
+# Cada cuántos pasos se recalculan las máscaras de poda
+PRUNING_FREQUENCY = 10
+
+# Fracción de los pasos del ajuste fino en la que la dispersión llega a la meta
+PRUNING_RAMP = 0.7
+
+# Iteraciones de k-means al inicializar los centroides
+KMEANS_ITERATIONS = 15
+
+
+def get_compressible_kernels(model):
+    """
+    Kernels que se comprimen: los de Conv2D/DepthwiseConv2D/Dense con al menos
+    MIN_KERNEL_SIZE pesos, salvo la capa de salida (decide directamente la clase).
+    """
+    layers = []
+    for layer in model.layers:
+        layers.extend(layer.layers if isinstance(layer, tf.keras.Model) else [layer])
+
+    kernels = []
+    for layer in layers[:-1]:
+        if not isinstance(layer, COMPRESSIBLE_LAYERS) or layer.name == "bgr_to_rgb":
+            continue
+        kernel = layer.depthwise_kernel if isinstance(layer, DepthwiseConv2D) else layer.kernel
+        if int(np.prod(kernel.shape)) >= MIN_KERNEL_SIZE:
+            kernels.append(kernel)
+    return kernels
+
+
+def magnitude_mask(weights, sparsity):
+    """Máscara que anula la fracción sparsity de pesos de menor magnitud"""
+    magnitudes = np.abs(weights).ravel()
+    num_pruned = int(sparsity * magnitudes.size)
+    if num_pruned == 0:
+        return np.ones_like(weights)
+    threshold = np.partition(magnitudes, num_pruned - 1)[num_pruned - 1]
+    return (np.abs(weights) > threshold).astype(weights.dtype)
+
+
+def kmeans_1d(values, num_clusters, iterations=KMEANS_ITERATIONS):
+    """
+    k-means sobre valores escalares con centroides iniciales equiespaciados.
+
+    Returns:
+        Tupla (centroides ordenados, índice del centroide de cada valor)
+    """
+    centroids = np.linspace(values.min(), values.max(), num_clusters)
+    for _ in range(iterations):
+        assignment = np.searchsorted((centroids[1:] + centroids[:-1]) / 2, values)
+        sums = np.bincount(assignment, weights=values, minlength=num_clusters)
+        counts = np.bincount(assignment, minlength=num_clusters)
+        # Los centroides sin valores asignados quedan donde estaban
+        centroids = np.where(counts > 0, sums / np.maximum(counts, 1), centroids)
+        centroids.sort()
+    assignment = np.searchsorted((centroids[1:] + centroids[:-1]) / 2, values)
+    return centroids, assignment
+
+
+def polynomial_sparsity(step, end_step, target_sparsity):
+    """Dispersión en un paso: sube rápido al principio y se estabiliza al llegar a la meta"""
+    progress = min(step / max(end_step, 1), 1.0)
+    return target_sparsity * (1 - (1 - progress) ** 3)
+
+
+class PruningCallback(tf.keras.callbacks.Callback):
+    """
+    Poda por magnitud durante el ajuste fino.
+
+    Cada PRUNING_FREQUENCY pasos se recalcula la máscara de cada kernel según el
+    calendario de dispersión, y tras cada paso se vuelven a anular los pesos podados
+    (el optimizador los mueve). Al terminar los kernels quedan con target_sparsity.
+    """
+
+    def __init__(self, kernels, target_sparsity, total_steps, frequency=PRUNING_FREQUENCY):
+        super().__init__()
+        self.kernels = kernels
+        self.target_sparsity = target_sparsity
+        self.end_step = int(total_steps * PRUNING_RAMP)
+        self.frequency = frequency
+        self.masks = [tf.Variable(tf.ones_like(kernel), trainable=False) for kernel in kernels]
+        self.step = 0
+
+    def update_masks(self, sparsity):
+        for kernel, mask in zip(self.kernels, self.masks):
+            mask.assign(magnitude_mask(kernel.numpy(), sparsity))
+
+    @tf.function
+    def apply_masks(self):
+        for kernel, mask in zip(self.kernels, self.masks):
+            kernel.assign(kernel * mask)
+
+    def on_train_batch_end(self, batch, logs=None):
+        self.step += 1
+        if self.step % self.frequency == 0 or self.step == self.end_step:
+            self.update_masks(polynomial_sparsity(self.step, self.end_step, self.target_sparsity))
+        self.apply_masks()
+
+    def on_train_end(self, logs=None):
+        self.update_masks(self.target_sparsity)
+        self.apply_masks()
+
+
+class ClusteringCallback(tf.keras.callbacks.Callback):
+    """
+    Agrupamiento de pesos durante el ajuste fino.
+
+    Al empezar cada kernel se agrupa con k-means; tras cada paso los centroides pasan
+    a ser la media de sus pesos (ya actualizados por el optimizador) y los pesos se
+    reemplazan por su centroide. Los pesos en cero (podados) forman un grupo fijo en 0.
+    """
+
+    def __init__(self, kernels, num_clusters):
+        super().__init__()
+        self.kernels = kernels
+        self.num_clusters = num_clusters
+        self.assignments = []
+        for kernel in kernels:
+            weights = kernel.numpy().ravel()
+            nonzero = weights != 0
+            _, assignment = kmeans_1d(weights[nonzero], num_clusters)
+            # El índice num_clusters corresponde al grupo de los ceros
+            full_assignment = np.full(weights.size, num_clusters, dtype=np.int32)
+            full_assignment[nonzero] = assignment
+            self.assignments.append(tf.constant(full_assignment.reshape(kernel.shape)))
+
+    @tf.function
+    def apply_clusters(self):
+        for kernel, assignment in zip(self.kernels, self.assignments):
+            centroids = tf.math.unsorted_segment_mean(kernel, assignment, self.num_clusters + 1)
+            centroids = tf.concat([centroids[:-1], tf.zeros([1], kernel.dtype)], axis=0)
+            kernel.assign(tf.gather(centroids, assignment))
+
+    def on_train_begin(self, logs=None):
+        self.apply_clusters()
+
+    def on_train_batch_end(self, batch, logs=None):
+        self.apply_clusters()
+
+
+def compression_stats(kernels):
+    """Dispersión global y máximo de valores distintos por kernel"""
+    total = sum(int(np.prod(kernel.shape)) for kernel in kernels)
+    zeros = sum(int(np.sum(kernel.numpy() == 0)) for kernel in kernels)
+    unique = max((len(np.unique(kernel.numpy())) for kernel in kernels), default=0)
+    return {"sparsity": zeros / max(total, 1), "max_unique_weights": unique}
+
+
+def gzip_size(path):
+    """Tamaño (MB) del archivo comprimido con gzip: refleja los ceros y valores repetidos"""
+    with open(path, "rb") as f:
+        return len(gzip.compress(f.read())) / 1e6
+
+
+def fine_tune(model, callback, epochs, learning_rate, cache=PIPELINE_CACHE):
+    """Ajuste fino de todo el modelo (salvo BatchNormalization) con un callback de compresión"""
+    train_ds, val_ds, _ = create_datasets(img_size=get_input_size(model), cache=cache,
+                                          raw_input=uses_raw_input(model))
+    model.compile(optimizer=Adam(learning_rate=learning_rate), loss="categorical_crossentropy",
+                  metrics=["accuracy"])
+    model.fit(train_ds, epochs=epochs, validation_data=val_ds, callbacks=[callback])
+
+
+def compress_model(architecture=MODEL_ARCHITECTURE, method=COMPRESSION_METHOD, model_path=None,
+                   target_sparsity=TARGET_SPARSITY, num_clusters=NUM_CLUSTERS,
+                   epochs=COMPRESSION_EPOCHS, learning_rate=COMPRESSION_LEARNING_RATE,
+                   sparse_tflite=SPARSE_TFLITE):
+    """
+    Comprime el modelo entrenado de una arquitectura.
+
+    Args:
+        architecture: Arquitectura cuyo modelo se comprime
+        method: "prune", "cluster" o "prune_cluster" (poda y luego agrupamiento)
+        model_path: Modelo .h5 a comprimir (por defecto, el de la arquitectura)
+        target_sparsity: Fracción de pesos en cero al terminar la poda
+        num_clusters: Valores distintos por kernel tras el agrupamiento
+        epochs: Épocas de ajuste fino por etapa
+        learning_rate: Tasa de aprendizaje del ajuste fino
+        sparse_tflite: Exportar también un .tflite que aprovecha la dispersión
+
+    Returns:
+        Diccionario {formato: ruta} de los modelos comprimidos
+    """
+    if method not in COMPRESSION_METHODS:
+        raise ValueError(f"Método '{method}' no soportado. Opciones: {list(COMPRESSION_METHODS)}")
+    if not 0.0 <= target_sparsity < 1.0:
+        raise ValueError(f"La dispersión debe estar entre 0 y 1 (se recibió {target_sparsity})")
+
+    model_path = model_path or get_model_save_path(architecture)
+    print(f"Cargando modelo desde {model_path}...")
+    # Copia propia: el modelo se modifica y no debe quedar en la caché de modelos
+    model = load_inference_model(model_path, use_cache=False)
+    unfreeze_top_layers(model, None)
+    kernels = get_compressible_kernels(model)
+    print(f"Kernels a comprimir: {len(kernels)} "
+          f"({sum(int(np.prod(kernel.shape)) for kernel in kernels):,} pesos)")
+
+    steps_per_epoch = -(-len(list_image_files(TRAIN_DIR)[0]) // BATCH_SIZE)
+    if method in ("prune", "prune_cluster"):
+        print(f"Podando hasta {target_sparsity:.0%} de dispersión...")
+        fine_tune(model, PruningCallback(kernels, target_sparsity, epochs * steps_per_epoch),
+                  epochs, learning_rate)
+    if method in ("cluster", "prune_cluster"):
+        print(f"Agrupando los pesos en {num_clusters} valores por kernel...")
+        fine_tune(model, ClusteringCallback(kernels, num_clusters), epochs, learning_rate)
+
+    stats = compression_stats(kernels)
+    print(f"Dispersión: {stats['sparsity']:.1%} - valores distintos por kernel: {stats['max_unique_weights']}")
+
+    compressed = {}
+    variant = COMPRESSED_VARIANTS[method]
+    h5_path = get_model_save_path(architecture, variant=variant)
+    # Sin el estado del optimizador: con todo el modelo entrenable duplicaría el tamaño
+    model.save(h5_path, include_optimizer=False)
+    compressed["h5"] = h5_path
+    print(f"Guardado en {h5_path}")
+    if sparse_tflite:
+        converter = tf.lite.TFLiteConverter.from_keras_model(model)
+        converter.optimizations = [tf.lite.Optimize.EXPERIMENTAL_SPARSITY]
+        tflite_path = get_model_save_path(architecture, variant=variant, extension=".tflite")
+        with open(tflite_path, "wb") as f:
+            f.write(converter.convert())
+        compressed["tflite"] = tflite_path
+        print(f"Guardado en {tflite_path}")
+
+    compression = {
+        "method": method,
+        "source_model": os.path.basename(model_path),
+        "target_sparsity": target_sparsity if "prune" in method else None,
+        "num_clusters": num_clusters if "cluster" in method else None,
+        "fine_tune_epochs": epochs,
+        "learning_rate": learning_rate,
+        **stats
+    }
+    for path in compressed.values():
+        copy_metadata(model_path, path, variant=variant, compression=compression)
+    return compressed
+
+
+def compare_compression(model_path, compressed, test_dir=TEST_DIR):
+    """
+    Compara tamaño en disco (directo y con gzip), latencia por imagen en CPU y
+    precisión de los modelos comprimidos contra el original.
+
+    Returns:
+        Lista de resultados por modelo (también se guarda como JSON junto al modelo comprimido)
+    """
+    sample_path = list_image_files(test_dir, get_class_indices(test_dir))[0][0]
+    candidates = [("original", model_path)]
+    # El .tflite sin comprimir (export_tflite) separa la ganancia de TFLite de la de la dispersión
+    original_tflite = os.path.splitext(model_path)[0] + "_float32.tflite"
+    if "tflite" in compressed and os.path.exists(original_tflite):
+        candidates.append(("orig tflite", original_tflite))
+    candidates += list(compressed.items())
+    results = []
+    for name, path in candidates:
+        print(f"Evaluando {name}...")
+        evaluation = evaluate_model(path, split_dir=test_dir, verbose=False)
+        model = load_inference_model(path)
+        image = to_model_input(decode_image(sample_path, get_input_size(model)), uses_raw_input(model))
+        if isinstance(model, TFLiteModel):
+            predict = model.predict
+            image = image.numpy()
+        else:
+            predict = tf.function(lambda batch, model=model: model(batch, training=False))
+        results.append({
+            "model": name,
+            "path": path,
+            "size_mb": os.path.getsize(path) / 1e6,
+            "gzip_mb": gzip_size(path),
+            "latency_ms": measure_latency(predict, image[np.newaxis]),
+            "test_accuracy": evaluation["accuracy"],
+            "test_macro_f1": evaluation["macro_f1"]
+        })
+
+    print(f"\n{'Modelo':<12}{'Tamaño (MB)':>13}{'gzip (MB)':>11}{'Latencia (ms)':>15}"
+          f"{'Precisión':>11}{'F1 macro':>10}")
+    print("-" * 72)
+    for result in results:
+        print(f"{result['model']:<12}{result['size_mb']:>13.2f}{result['gzip_mb']:>11.2f}"
+              f"{result['latency_ms']:>15.2f}{result['test_accuracy'] * 100:>10.2f}%"
+              f"{result['test_macro_f1']:>10.3f}")
+
+    report_path = os.path.splitext(compressed["h5"])[0] + "_report.json"
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    print(f"\nReporte guardado en {report_path}")
+    return results
+
+
+def compress_and_compare(architecture=MODEL_ARCHITECTURE, method=COMPRESSION_METHOD, **kwargs):
+    """Comprime el modelo y genera el reporte comparativo"""
+    model_path = kwargs.pop("model_path", None) or get_model_save_path(architecture)
+    compressed = compress_model(architecture, method, model_path=model_path, **kwargs)
+    return compare_compression(model_path, compressed)
+
+
+def main(argv=None):
+    """Punto de entrada por línea de comandos"""
+    parser = argparse.ArgumentParser(description="Poda y agrupamiento de pesos de un modelo entrenado.")
+    parser.add_argument("-a", "--architecture", default=MODEL_ARCHITECTURE)
+    parser.add_argument("--model", help="Modelo .h5 a comprimir (por defecto, el de la arquitectura)")
+    parser.add_argument("-m", "--method", default=COMPRESSION_METHOD, choices=COMPRESSION_METHODS)
+    parser.add_argument("--sparsity", type=float, default=TARGET_SPARSITY)
+    parser.add_argument("--clusters", type=int, default=NUM_CLUSTERS)
+    parser.add_argument("-e", "--epochs", type=int, default=COMPRESSION_EPOCHS)
+    parser.add_argument("--lr", type=float, default=COMPRESSION_LEARNING_RATE)
+    parser.add_argument("--no-tflite", action="store_true", help="No exportar el .tflite disperso")
+    args = parser.parse_args(argv)
+
+    compress_and_compare(args.architecture, args.method, model_path=args.model,
+                         target_sparsity=args.sparsity, num_clusters=args.clusters,
+                         epochs=args.epochs, learning_rate=args.lr, sparse_tflite=not args.no_tflite)
+
+
+if __name__ == "__main__":
+    main()
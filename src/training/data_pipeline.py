@@ -0,0 +1,428 @@
+""" Pipeline de entrada tf.data con decodificación y redimensionado en paralelo. """
+
+import os
+import time
+import random
+import hashlib
+import functools
+import numpy as np
+import tensorflow as tf
+
+# Importar configuración desde archivo centralizado
+from src.config import (
+    IMG_SIZE, BATCH_SIZE, TRAIN_DIR, VAL_DIR, TEST_DIR,
+    PIPELINE_CACHE, PIPELINE_CACHE_DIR, PACKED_DIR
+)
+
+AUTOTUNE = tf.data.AUTOTUNE
+
+# Formatos que tf.io.decode_image sabe decodificar
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".gif")
+
+# Tamaño máximo del buffer de mezcla cuando las imágenes ya están decodificadas
+SHUFFLE_BUFFER = 1024
+
+# Semilla del orden fijo en que se guardan las imágenes en la caché (misma semilla =
+# mismo archivo de caché en disco)
+CACHE_ORDER_SEED = 42
+
+CACHE_MODES = ("none", "memory", "disk")
+
+# Shards empaquetados que cada proceso mantiene abiertos (mapeados a memoria)
+OPEN_SHARDS = 64
+
+# "nearest" es la interpolación por defecto de flow_from_directory; la capa Resizing
+# de los modelos con preprocesamiento integrado usa la misma
+RESIZE_METHOD = "nearest"
+
+
+def get_class_indices(directory):
+    """
+    Obtiene el mapeo clase -> índice igual que flow_from_directory.
+
+    Args:
+        directory: Carpeta con una subcarpeta por clase
+
+    Returns:
+        Diccionario {nombre_clase: índice} en orden alfabético
+    """
+    class_names = sorted(
+        name for name in os.listdir(directory)
+        if os.path.isdir(os.path.join(directory, name))
+    )
+    return {name: i for i, name in enumerate(class_names)}
+
+
+def list_image_files(directory, class_indices=None):
+    """
+    Lista las imágenes de una carpeta organizada por clases.
+
+    Args:
+        directory: Carpeta con una subcarpeta por clase
+        class_indices: Mapeo clase -> índice (por defecto, el de la propia carpeta)
+
+    Returns:
+        Tupla (rutas, etiquetas) en orden determinista
+    """
+    if class_indices is None:
+        class_indices = get_class_indices(directory)
+
+    paths, labels = [], []
+    for class_name, class_idx in class_indices.items():
+        class_dir = os.path.join(directory, class_name)
+        if not os.path.isdir(class_dir):
+            continue
+        for root, _, files in sorted(os.walk(class_dir)):
+            for file_name in sorted(files):
+                if file_name.lower().endswith(IMAGE_EXTENSIONS):
+                    paths.append(os.path.join(root, file_name))
+                    labels.append(class_idx)
+    return paths, labels
+
+
+def _files_signature(paths, img_size):
+    """Firma de la lista de archivos para invalidar la caché en disco"""
+    digest = hashlib.md5(f"{img_size}".encode())
+    for path in paths:
+        stat = os.stat(path)
+        digest.update(f"{path}|{stat.st_size}|{stat.st_mtime_ns}".encode())
+    return digest.hexdigest()[:12]
+
+
+def dataset_signature(directory, img_size=IMG_SIZE):
+    """Firma de las imágenes de una carpeta (cambia si se agregan, quitan o modifican archivos)"""
+    paths, _ = list_image_files(directory, get_class_indices(directory))
+    return _files_signature(paths, img_size)
+
+
+def decode_image(path, img_size=IMG_SIZE):
+    """Lee, decodifica y redimensiona una imagen a uint8 RGB"""
+    data = tf.io.read_file(path)
+    img = tf.io.decode_image(data, channels=3, expand_animations=False)
+    img = tf.image.resize(img, img_size, method=RESIZE_METHOD)
+    img.set_shape((*img_size, 3))
+    return tf.cast(img, tf.uint8)
+
+
+def to_model_input(images, raw_input=False):
+    """
+    Convierte imágenes uint8 RGB a la entrada del modelo.
+
+    Args:
+        images: Imagen o lote uint8 RGB (de decode_image)
+        raw_input: El modelo trae el preprocesamiento integrado y recibe uint8 BGR,
+                   el orden de OpenCV (ver create_model)
+
+    Returns:
+        uint8 BGR si raw_input, si no float32 RGB en [0, 1]
+    """
+    if raw_input:
+        return tf.reverse(images, axis=[-1])
+    return tf.cast(images, tf.float32) / 255.0
+
+
+def cache_dataset(dataset, paths, img_size=IMG_SIZE, cache=PIPELINE_CACHE, cache_name="dataset"):
+    """
+    Aplica el modo de caché a un dataset de imágenes decodificadas.
+
+    Args:
+        dataset: Dataset cuyos elementos salen de decodificar paths, en ese orden
+        paths: Rutas de las imágenes (firman el archivo de caché en disco)
+        img_size: Tamaño de las imágenes decodificadas
+        cache: "none", "memory" o "disk"
+        cache_name: Prefijo del archivo de caché en disco
+
+    Returns:
+        Dataset con la caché aplicada
+    """
+    if cache not in CACHE_MODES:
+        raise ValueError(f"Caché '{cache}' no soportada. Opciones: {list(CACHE_MODES)}")
+    if cache == "memory":
+        return dataset.cache()
+    if cache == "disk":
+        os.makedirs(PIPELINE_CACHE_DIR, exist_ok=True)
+        signature = _files_signature(paths, img_size)
+        return dataset.cache(os.path.join(PIPELINE_CACHE_DIR, f"{cache_name}_{signature}"))
+    return dataset
+
+
+def limit_threads(dataset, threads=None):
+    """
+    Ejecuta el dataset en un pool de hilos propio de `threads` hilos.
+
+    Sin límite, tf.data usa un pool global del tamaño de la máquina aunque el proceso
+    tenga un presupuesto de hilos menor (entrenamientos en paralelo de train_all).
+    """
+    if not threads:
+        return dataset
+    options = tf.data.Options()
+    options.threading.private_threadpool_size = int(threads)
+    return dataset.with_options(options)
+
+
+def build_dataset(directory, class_indices, img_size=IMG_SIZE, batch_size=BATCH_SIZE,
+                  shuffle=False, cache=PIPELINE_CACHE, cache_name=None, raw_input=False, threads=None):
+    """
+    Construye un tf.data.Dataset de (imágenes, etiquetas one-hot) para una carpeta.
+
+    Args:
+        directory: Carpeta con una subcarpeta por clase
+        class_indices: Mapeo clase -> índice compartido entre los splits
+        img_size: Tamaño al que se redimensionan las imágenes
+        batch_size: Tamaño de lote
+        shuffle: Si se mezclan las imágenes en cada época
+        cache: Modo de caché tras decodificar ("none", "memory" o "disk")
+        cache_name: Prefijo del archivo de caché en disco
+        raw_input: Entregar uint8 BGR para modelos con preprocesamiento integrado
+        threads: Hilos del pool propio del dataset (None = pool global de tf.data)
+
+    Returns:
+        Dataset listo para model.fit / model.evaluate
+    """
+    if cache not in CACHE_MODES:
+        raise ValueError(f"Caché '{cache}' no soportada. Opciones: {list(CACHE_MODES)}")
+
+    paths, labels = list_image_files(directory, class_indices)
+    if not paths:
+        raise ValueError(f"No se encontraron imágenes en {directory}")
+    num_classes = len(class_indices)
+
+    # list_image_files devuelve las imágenes agrupadas por clase y el buffer de mezcla
+    # posterior a la caché es chico: se mezclan una vez antes de decodificar y cachear
+    if shuffle:
+        order = list(range(len(paths)))
+        random.Random(CACHE_ORDER_SEED).shuffle(order)
+        paths = [paths[i] for i in order]
+        labels = [labels[i] for i in order]
+
+    dataset = tf.data.Dataset.from_tensor_slices((paths, labels))
+
+    # Sin caché basta con mezclar las rutas, que es mucho más barato
+    if shuffle and cache == "none":
+        dataset = dataset.shuffle(len(paths), reshuffle_each_iteration=True)
+
+    dataset = dataset.map(
+        lambda path, label: (decode_image(path, img_size), label),
+        num_parallel_calls=AUTOTUNE
+    )
+
+    dataset = cache_dataset(dataset, paths, img_size, cache,
+                            cache_name or os.path.basename(os.path.normpath(directory)))
+
+    if shuffle and cache != "none":
+        dataset = dataset.shuffle(min(len(paths), SHUFFLE_BUFFER), reshuffle_each_iteration=True)
+
+    dataset = dataset.map(
+        lambda img, label: (to_model_input(img, raw_input), tf.one_hot(label, num_classes)),
+        num_parallel_calls=AUTOTUNE
+    )
+    dataset = limit_threads(dataset.batch(batch_size).prefetch(AUTOTUNE), threads)
+    print(f"Se encontraron {len(paths)} imágenes de {num_classes} clases en {directory}")
+    return dataset
+
+
+def create_datasets(train_dir=TRAIN_DIR, val_dir=VAL_DIR, test_dir=TEST_DIR,
+                    img_size=IMG_SIZE, batch_size=BATCH_SIZE, cache=PIPELINE_CACHE, raw_input=False,
+                    threads=None):
+    """Crea los datasets tf.data para entrenamiento, validación y prueba"""
+    class_indices = get_class_indices(train_dir)
+
+    train_ds = build_dataset(train_dir, class_indices, img_size, batch_size, shuffle=True, cache=cache,
+                             cache_name="train", raw_input=raw_input, threads=threads)
+    val_ds = build_dataset(val_dir, class_indices, img_size, batch_size,
+                           cache=cache, cache_name="val", raw_input=raw_input, threads=threads)
+    test_ds = build_dataset(test_dir, class_indices, img_size, batch_size,
+                            cache=cache, cache_name="test", raw_input=raw_input, threads=threads)
+
+    return train_ds, val_ds, test_ds
+
+
+@functools.lru_cache(maxsize=OPEN_SHARDS)
+def _open_shard(images_path, labels_path, checksum):
+    """
+    Abre un shard (imágenes mapeadas a memoria y etiquetas) una sola vez por proceso.
+
+    La suma de control del índice forma parte de la clave: si el shard se vuelve a
+    empaquetar en el mismo proceso (menú, worker persistente) no se reusa el mapeo viejo.
+    """
+    return np.load(images_path, mmap_mode="r"), np.load(labels_path)
+
+
+def _gather_packed(images_path, labels_path, checksum, indices):
+    """Copia de un shard las imágenes y etiquetas de un lote de índices"""
+    images, labels = _open_shard(images_path.decode(), labels_path.decode(), checksum.decode())
+    return images[indices], labels[indices]
+
+
+def build_packed_dataset(split_dir, img_size=IMG_SIZE, batch_size=BATCH_SIZE, shuffle=False, raw_input=False,
+                         threads=None):
+    """
+    Construye un dataset de (imágenes, etiquetas one-hot) desde los shards de un split.
+
+    Cada lote se copia del shard mapeado a memoria con una sola lectura indexada.
+    Con shuffle se mezclan el orden de los shards, el orden dentro de cada shard
+    y, además, los ejemplos de varios shards leídos a la vez. threads limita el pool
+    de hilos del dataset como en build_dataset.
+
+    Returns:
+        Dataset listo para model.fit / model.evaluate
+    """
+    from src.preprocessing.pack_dataset import load_index
+
+    index = load_index(split_dir)
+    if index is None:
+        raise FileNotFoundError(
+            f"No hay shards en {split_dir}. Ejecuta antes: python -m src.preprocessing.pack_dataset"
+        )
+    if tuple(index["img_size"]) != tuple(img_size):
+        raise ValueError(
+            f"Los shards de {split_dir} son de {tuple(index['img_size'])} y se pidió {tuple(img_size)}. "
+            "Vuelve a empaquetar el dataset."
+        )
+
+    num_classes = len(index["class_indices"])
+    shard_files = (
+        [os.path.join(split_dir, shard["images"]) for shard in index["shards"]],
+        [os.path.join(split_dir, shard["labels"]) for shard in index["shards"]],
+        [shard["checksum"] for shard in index["shards"]],
+        np.array([shard["count"] for shard in index["shards"]], dtype=np.int64)
+    )
+
+    def read_shard(images_path, labels_path, checksum, count):
+        # Lotes de índices del shard; cada lote se lee de una vez
+        indices = tf.data.Dataset.range(count)
+        if shuffle:
+            indices = indices.shuffle(count, reshuffle_each_iteration=True)
+        return indices.batch(batch_size).map(lambda batch: (images_path, labels_path, checksum, batch))
+
+    def gather(images_path, labels_path, checksum, indices):
+        images, labels = tf.numpy_function(
+            _gather_packed, [images_path, labels_path, checksum, indices], (tf.uint8, tf.int32)
+        )
+        images.set_shape((None, *img_size, 3))
+        labels.set_shape((None,))
+        return images, labels
+
+    dataset = tf.data.Dataset.from_tensor_slices(shard_files)
+    if shuffle:
+        dataset = dataset.shuffle(len(index["shards"]), reshuffle_each_iteration=True)
+        dataset = dataset.interleave(
+            read_shard, cycle_length=min(len(index["shards"]), 4),
+            num_parallel_calls=AUTOTUNE, deterministic=False
+        )
+    else:
+        dataset = dataset.flat_map(read_shard)
+    dataset = dataset.map(gather, num_parallel_calls=AUTOTUNE, deterministic=not shuffle)
+
+    # Rearmar los lotes para que no queden cortos al final de cada shard
+    # (y, al mezclar, combinar los ejemplos de los shards leídos a la vez)
+    dataset = dataset.unbatch()
+    if shuffle:
+        dataset = dataset.shuffle(min(index["num_images"], SHUFFLE_BUFFER), reshuffle_each_iteration=True)
+    dataset = dataset.batch(batch_size)
+
+    dataset = dataset.map(
+        lambda images, labels: (to_model_input(images, raw_input), tf.one_hot(labels, num_classes)),
+        num_parallel_calls=AUTOTUNE
+    ).prefetch(AUTOTUNE)
+    dataset = limit_threads(dataset, threads)
+    print(f"Se encontraron {index['num_images']} imágenes de {num_classes} clases "
+          f"en {len(index['shards'])} shards de {split_dir}")
+    return dataset
+
+
+def create_packed_datasets(packed_dir=PACKED_DIR, img_size=IMG_SIZE, batch_size=BATCH_SIZE, raw_input=False,
+                           threads=None):
+    """Crea los datasets de entrenamiento, validación y prueba desde los shards empaquetados"""
+    train_ds = build_packed_dataset(os.path.join(packed_dir, "train"), img_size, batch_size,
+                                    shuffle=True, raw_input=raw_input, threads=threads)
+    val_ds = build_packed_dataset(os.path.join(packed_dir, "val"), img_size, batch_size,
+                                  raw_input=raw_input, threads=threads)
+    test_ds = build_packed_dataset(os.path.join(packed_dir, "test"), img_size, batch_size,
+                                   raw_input=raw_input, threads=threads)
+    return train_ds, val_ds, test_ds
+
+
+def resize_batches(dataset, batch_size, img_size):
+    """
+    Rearma los lotes de un dataset con otro tamaño de lote y de imagen.
+
+    Las imágenes salen de la caché del dataset original, así que cambiar de
+    resolución no vuelve a decodificarlas (entrenamiento con resolución progresiva).
+    """
+    # Con "nearest" los valores no cambian: se conserva el tipo (uint8 para entrada cruda)
+    return dataset.unbatch().batch(batch_size).map(
+        lambda images, labels: (
+            tf.cast(tf.image.resize(images, img_size, method=RESIZE_METHOD), images.dtype), labels
+        ),
+        num_parallel_calls=AUTOTUNE
+    ).prefetch(AUTOTUNE)
+
+
+def warm_disk_cache(train_dir=TRAIN_DIR, val_dir=VAL_DIR, test_dir=TEST_DIR,
+                    img_size=IMG_SIZE, batch_size=BATCH_SIZE):
+    """
+    Decodifica todos los splits una vez y deja escrita la caché en disco.
+
+    Después, cualquier proceso que use cache="disk" con las mismas imágenes
+    lee los tensores ya decodificados en lugar de volver a leer los JPEG.
+    """
+    for dataset in create_datasets(train_dir, val_dir, test_dir, img_size, batch_size, cache="disk"):
+        for _ in dataset:
+            pass
+
+
+def measure_throughput(batches, num_batches):
+    """
+    Mide las imágenes por segundo que entrega un generador o dataset.
+
+    Args:
+        batches: Iterable de lotes (imágenes, etiquetas)
+        num_batches: Cantidad de lotes a consumir
+
+    Returns:
+        Imágenes por segundo
+    """
+    total_images = 0
+    start = time.perf_counter()
+    for i, (images, _) in enumerate(batches):
+        if i >= num_batches:
+            break
+        total_images += images.shape[0]
+    elapsed = time.perf_counter() - start
+    return total_images / elapsed if elapsed > 0 else 0.0
+
+
+def benchmark_input_pipelines(train_dir=TRAIN_DIR, num_batches=50, cache=PIPELINE_CACHE):
+    """Compara las imágenes/seg de ImageDataGenerator contra tf.data (y los shards, si existen)"""
+    from src.training.train_model import create_data_generators
+
+    print("Midiendo ImageDataGenerator...")
+    train_gen, _, _ = create_data_generators(train_dir=train_dir, loader="generator")
+    generator_ips = measure_throughput(train_gen, num_batches)
+
+    print("Midiendo pipeline tf.data...")
+    class_indices = get_class_indices(train_dir)
+    train_ds = build_dataset(train_dir, class_indices, shuffle=True, cache=cache, cache_name="train")
+    tfdata_ips = measure_throughput(train_ds, num_batches)
+
+    results = {"generator": generator_ips, "tfdata": tfdata_ips}
+    if os.path.exists(os.path.join(PACKED_DIR, "train", "index.json")):
+        print("Midiendo shards empaquetados...")
+        packed_ds = build_packed_dataset(os.path.join(PACKED_DIR, "train"), shuffle=True)
+        results["packed"] = measure_throughput(packed_ds, num_batches)
+
+    print(f"\n{'Cargador':<20}{'Imágenes/seg':>15}")
+    print("-" * 35)
+    for loader, ips in results.items():
+        print(f"{loader:<20}{ips:>15.1f}")
+    if generator_ips > 0:
+        for loader, ips in results.items():
+            if loader != "generator":
+                print(f"Aceleración {loader}: x{ips / generator_ips:.2f}")
+
+    return results
+
+
+if __name__ == "__main__":
+    benchmark_input_pipelines()
@@ -0,0 +1,376 @@
+"""
+Destilación de conocimiento: un modelo maestro pesado ya entrenado (DenseNet121,
+ResNet50, ...) enseña a un alumno liviano (MobileNetV2) para inferencia barata en CPU.
+
+El alumno aprende de las etiquetas reales y de las probabilidades "suavizadas" del
+maestro (softmax con temperatura), que indican qué clases se parecen entre sí. Las
+salidas del maestro se calculan una sola vez por imagen (según el hash del modelo
+maestro y el del contenido) y se reutilizan en todas las épocas y ejecuciones.
+
+Uso:
+    python -m src.training.distillation --teacher densenet
+"""
+
+import os
+import json
+import time
+import random
+import argparse
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras.optimizers import Adam
+
+# Importar configuración desde archivo centralizado
+from src.config import (
+    IMG_SIZE, BATCH_SIZE, EPOCHS, JIT_COMPILE, PRECISION, EMBED_PREPROCESSING, PIPELINE_CACHE,
+    TRAIN_DIR, VAL_DIR, TEST_DIR, FEATURE_CACHE_DIR, CHECKPOINTS_ENABLED, RESUME_TRAINING,
+    RESTORE_BEST, DISTILL_TEACHER, DISTILL_STUDENT, DISTILL_TEMPERATURE, DISTILL_ALPHA,
+    DISTILL_FINE_TUNE_LAYERS, DISTILL_LEARNING_RATE
+)
+
+from src.training.architectures import ARCHITECTURES
+from src.training.train_model import create_model, get_model_save_path, resolve_precision, unfreeze_top_layers
+from src.training.data_pipeline import (
+    get_class_indices, list_image_files, decode_image, to_model_input, cache_dataset, dataset_signature,
+    AUTOTUNE, SHUFFLE_BUFFER, CACHE_ORDER_SEED
+)
+from src.training.feature_cache import FeatureStore
+from src.training.model_registry import load_registered_model, write_metadata, EMBEDDED_PREPROCESSING
+from src.training.checkpoints import TrainingCheckpoint, CheckpointCallback, get_checkpoint_dir
+from src.training.export_tflite import measure_latency
+from src.testing.evaluation import file_hash, stream_predictions, evaluate_model
+from src.testing.model_loader import load_inference_model, uses_raw_input, get_input_size
+from src.preprocessing.split_dataset import hash_images
+
+# Piso de las probabilidades antes del logaritmo
+LOG_EPSILON = 1e-7
+
+
+def get_teacher_store_dir(teacher_hash):
+    """Carpeta de la caché de salidas de un modelo maestro (una por versión del .h5)"""
+    return os.path.join(FEATURE_CACHE_DIR, f"teacher_{teacher_hash[:16]}")
+
+
+def load_teacher_outputs(teacher, paths, store):
+    """
+    Log-probabilidades del maestro para una lista de imágenes.
+
+    Solo se clasifican las imágenes que no están en la caché. Se guarda el logaritmo
+    de la softmax, que equivale a los logits salvo una constante por imagen: aplicar
+    la temperatura sobre él da la misma distribución que sobre los logits.
+
+    Returns:
+        Array (imágenes, clases) float32
+    """
+    hashes = hash_images(paths)
+    missing = set(store.missing(hashes))
+    if missing:
+        path_by_hash = {}
+        for path, img_hash in zip(paths, hashes):
+            if img_hash in missing:
+                path_by_hash.setdefault(img_hash, path)
+        print(f"Clasificando {len(path_by_hash)} imágenes nuevas con el maestro...")
+        probabilities = np.concatenate(list(stream_predictions(teacher, list(path_by_hash.values()))))
+        store.add(list(path_by_hash), np.log(np.maximum(probabilities, LOG_EPSILON)))
+    print(f"{len(paths) - len(missing)} salidas del maestro reutilizadas de la caché")
+    return store.get(hashes)
+
+
+def soften(log_probs, temperature):
+    """Distribución del maestro suavizada con la temperatura"""
+    logits = log_probs / temperature
+    logits -= logits.max(axis=1, keepdims=True)
+    probabilities = np.exp(logits)
+    return (probabilities / probabilities.sum(axis=1, keepdims=True)).astype(np.float32)
+
+
+def build_distillation_dataset(paths, labels, soft_targets, num_classes, img_size=IMG_SIZE,
+                               batch_size=BATCH_SIZE, shuffle=False, raw_input=False,
+                               cache=PIPELINE_CACHE, cache_name="distill"):
+    """
+    Dataset de (imágenes, objetivos) donde cada objetivo concatena la etiqueta
+    one-hot y la distribución suavizada del maestro (ver distillation_loss).
+
+    Las imágenes decodificadas siguen el modo de caché de [data_pipeline], igual que
+    build_dataset. Solo se cachean las imágenes: los objetivos dependen del maestro y
+    de la temperatura y se vuelven a unir después de la caché.
+    """
+    targets = np.concatenate([np.eye(num_classes, dtype=np.float32)[labels], soft_targets], axis=1)
+
+    # Mezcla única antes de la caché para que el buffer posterior no vea una clase a la vez
+    if shuffle:
+        order = list(range(len(paths)))
+        random.Random(CACHE_ORDER_SEED).shuffle(order)
+        paths = [paths[i] for i in order]
+        targets = targets[order]
+
+    if cache == "none":
+        dataset = tf.data.Dataset.from_tensor_slices((paths, targets))
+        if shuffle:
+            dataset = dataset.shuffle(len(paths), reshuffle_each_iteration=True)
+        dataset = dataset.map(lambda path, target: (decode_image(path, img_size), target),
+                              num_parallel_calls=AUTOTUNE)
+    else:
+        images = tf.data.Dataset.from_tensor_slices(paths).map(
+            lambda path: decode_image(path, img_size), num_parallel_calls=AUTOTUNE
+        )
+        images = cache_dataset(images, paths, img_size, cache, cache_name)
+        dataset = tf.data.Dataset.zip((images, tf.data.Dataset.from_tensor_slices(targets)))
+        if shuffle:
+            dataset = dataset.shuffle(min(len(paths), SHUFFLE_BUFFER), reshuffle_each_iteration=True)
+    return dataset.batch(batch_size).map(
+        lambda images, target: (to_model_input(images, raw_input), target),
+        num_parallel_calls=AUTOTUNE
+    ).prefetch(AUTOTUNE)
+
+
+def distillation_loss(num_classes, temperature=DISTILL_TEMPERATURE, alpha=DISTILL_ALPHA):
+    """
+    Pérdida de destilación: alpha * CE(etiquetas) + (1 - alpha) * T² * KL(maestro || alumno).
+
+    La divergencia se mide entre las distribuciones suavizadas con la temperatura T; el
+    factor T² mantiene la escala de sus gradientes al cambiar T. El alumno entrega
+    probabilidades: su logaritmo reemplaza a los logits.
+    """
+    def loss(y_true, y_pred):
+        hard, soft = y_true[:, :num_classes], y_true[:, num_classes:]
+        log_probs = tf.math.log(tf.maximum(y_pred, LOG_EPSILON))
+        soft_pred = tf.nn.softmax(log_probs / temperature)
+        hard_loss = tf.keras.losses.categorical_crossentropy(hard, y_pred)
+        soft_loss = tf.keras.losses.kl_divergence(soft, soft_pred) * temperature ** 2
+        return alpha * hard_loss + (1 - alpha) * soft_loss
+
+    def accuracy(y_true, y_pred):
+        return tf.keras.metrics.categorical_accuracy(y_true[:, :num_classes], y_pred)
+
+    return loss, accuracy
+
+
+def distill_model(teacher: str = DISTILL_TEACHER, student: str = DISTILL_STUDENT,
+                  teacher_path: str = None, temperature: float = DISTILL_TEMPERATURE,
+                  alpha: float = DISTILL_ALPHA, fine_tune_layers: int = DISTILL_FINE_TUNE_LAYERS,
+                  learning_rate: float = DISTILL_LEARNING_RATE, epochs: int = EPOCHS,
+                  precision: str = PRECISION, jit_compile: bool = JIT_COMPILE,
+                  embed_preprocessing: bool = EMBED_PREPROCESSING,
+                  checkpoints: bool = CHECKPOINTS_ENABLED, resume: bool = RESUME_TRAINING):
+    """
+    Entrena un alumno con las salidas de un maestro ya entrenado.
+
+    Args:
+        teacher: Arquitectura del maestro (se usa su modelo entrenado)
+        student: Arquitectura del alumno
+        teacher_path: Modelo del maestro (por defecto, el de la arquitectura teacher)
+        temperature: Temperatura de la softmax con la que se comparan las distribuciones
+        alpha: Peso de las etiquetas reales (1 - alpha para el maestro)
+        fine_tune_layers: Capas finales del modelo base del alumno que también se entrenan
+        learning_rate: Tasa de aprendizaje del alumno
+        epochs: Épocas de entrenamiento
+        precision: "float32", "mixed_bfloat16" o "auto"
+        jit_compile: Compilar los pasos con XLA
+        embed_preprocessing: Guardar un alumno que recibe uint8 BGR de cualquier tamaño
+        checkpoints: Guardar checkpoints por época con parada temprana (ver checkpoints.py)
+        resume: Continuar desde el último checkpoint si existe
+
+    Returns:
+        Tupla (alumno entrenado, ruta del .h5 guardado)
+    """
+    if not 0.0 <= alpha <= 1.0:
+        raise ValueError(f"alpha debe estar entre 0 y 1 (se recibió {alpha})")
+    if temperature <= 0:
+        raise ValueError(f"La temperatura debe ser positiva (se recibió {temperature})")
+
+    print(f"\n{'='*50}")
+    print(f"Destilando {ARCHITECTURES[teacher]['name']} -> {ARCHITECTURES[student]['name']}")
+    print(f"{'='*50}\n")
+
+    start_time = time.perf_counter()
+    teacher_path = teacher_path or get_model_save_path(teacher)
+    if not os.path.exists(teacher_path):
+        raise FileNotFoundError(f"No se encontró el maestro {teacher_path}: hay que entrenarlo primero")
+
+    class_indices = get_class_indices(TRAIN_DIR)
+    num_classes = len(class_indices)
+    print(f"Cargando maestro desde {teacher_path}...")
+    teacher_model, teacher_classes, _ = load_registered_model(teacher_path, teacher)
+    if teacher_classes != list(class_indices):
+        raise ValueError(f"Las clases del maestro {teacher_classes} no coinciden con las de {TRAIN_DIR}")
+
+    teacher_hash = file_hash(teacher_path)
+    store = FeatureStore(get_teacher_store_dir(teacher_hash), num_classes)
+    splits = {}
+    for name, directory in (("train", TRAIN_DIR), ("val", VAL_DIR)):
+        paths, labels = list_image_files(directory, class_indices)
+        if not paths:
+            raise ValueError(f"No se encontraron imágenes en {directory}")
+        log_probs = load_teacher_outputs(teacher_model, paths, store)
+        splits[name] = (paths, labels, soften(log_probs, temperature))
+
+    print("Creando alumno...")
+    model = create_model(student, num_classes, precision=precision, embed_preprocessing=embed_preprocessing)
+    unfreeze_top_layers(model, fine_tune_layers)
+    loss, accuracy = distillation_loss(num_classes, temperature, alpha)
+    model.compile(optimizer=Adam(learning_rate=learning_rate), loss=loss, metrics=[accuracy],
+                  jit_compile=jit_compile)
+
+    train_data = build_distillation_dataset(*splits["train"], num_classes, shuffle=True,
+                                            raw_input=embed_preprocessing, cache_name="distill_train")
+    val_data = build_distillation_dataset(*splits["val"], num_classes, raw_input=embed_preprocessing,
+                                          cache_name="distill_val")
+
+    callbacks = []
+    initial_epoch = 0
+    checkpoint = None
+    if checkpoints:
+        # El hash del maestro en el nombre evita retomar un alumno de otra versión del maestro
+        checkpoint = TrainingCheckpoint(
+            model, model.optimizer,
+            get_checkpoint_dir(f"{student}_distilled_{teacher}_{teacher_hash[:16]}"),
+            fingerprint={
+                "teacher_hash": teacher_hash,
+                "temperature": temperature,
+                "alpha": alpha,
+                "fine_tune_layers": fine_tune_layers,
+                "learning_rate": learning_rate,
+                "batch_size": BATCH_SIZE,
+                "img_size": IMG_SIZE,
+                "precision": resolve_precision(precision),
+                "embed_preprocessing": embed_preprocessing,
+                "train_data": dataset_signature(TRAIN_DIR),
+                "val_data": dataset_signature(VAL_DIR)
+            }
+        )
+        if resume:
+            initial_epoch = checkpoint.restore_latest()
+        else:
+            checkpoint.clear()
+        callbacks.append(CheckpointCallback(checkpoint, restore_best=RESTORE_BEST))
+
+    print("Iniciando destilación...")
+    model.fit(train_data, epochs=epochs, initial_epoch=initial_epoch,
+              validation_data=val_data, callbacks=callbacks)
+    train_time = time.perf_counter() - start_time
+
+    # Compilado estándar: el .h5 se carga sin la pérdida personalizada
+    model.compile(optimizer=Adam(learning_rate=learning_rate), loss="categorical_crossentropy",
+                  metrics=["accuracy"])
+    model_save_path = get_model_save_path(student, variant=f"distilled_{teacher}")
+    print(f"Guardando modelo en {model_save_path}...")
+    os.makedirs(os.path.dirname(model_save_path), exist_ok=True)
+    model.save(model_save_path)
+
+    print("Evaluando alumno...")
+    evaluation = evaluate_model(model_save_path, model=model, split_dir=TEST_DIR,
+                                class_names=list(class_indices), verbose=False)
+    results = {
+        "test_loss": evaluation["loss"],
+        "test_accuracy": evaluation["accuracy"],
+        f"test_top_{evaluation['top_k']}_accuracy": evaluation["top_k_accuracy"],
+        "test_macro_f1": evaluation["macro_f1"],
+        "train_time_s": train_time
+    }
+    write_metadata(
+        model_save_path, student, class_indices, IMG_SIZE, results,
+        preprocessing=EMBEDDED_PREPROCESSING if embed_preprocessing else None,
+        training={
+            "epochs": epochs,
+            "batch_size": BATCH_SIZE,
+            "learning_rate": learning_rate,
+            "precision": resolve_precision(precision),
+            "jit_compile": jit_compile,
+            "data_loader": "distillation",
+            "resumed_from_epoch": initial_epoch,
+            "epochs_run": int(checkpoint.epoch.numpy()) if checkpoint else epochs,
+            "best_epoch": int(checkpoint.best_epoch.numpy()) if checkpoint else None
+        },
+        distillation={
+            "teacher": teacher,
+            "teacher_model": os.path.basename(teacher_path),
+            "teacher_hash": teacher_hash,
+            "temperature": temperature,
+            "alpha": alpha,
+            "fine_tune_layers": fine_tune_layers
+        }
+    )
+    if checkpoint is not None:
+        checkpoint.clear()
+    print(f"Test Accuracy: {evaluation['accuracy'] * 100:.2f}%")
+    return model, model_save_path
+
+
+def compare_distillation(student_path, teacher_path, baseline_path=None, test_dir=TEST_DIR):
+    """
+    Compara precisión, F1 macro, latencia por imagen en CPU y tamaño del alumno
+    destilado contra el maestro y el alumno entrenado sin destilación.
+
+    Returns:
+        Lista de resultados por modelo (también se guarda como JSON junto al alumno)
+    """
+    candidates = [("alumno destilado", student_path), ("maestro", teacher_path)]
+    if baseline_path and os.path.exists(baseline_path):
+        candidates.append(("alumno base", baseline_path))
+    else:
+        print("No hay alumno entrenado sin destilación: se omite de la comparación.")
+
+    sample_path = list_image_files(test_dir, get_class_indices(test_dir))[0][0]
+    results = []
+    for name, path in candidates:
+        print(f"Evaluando {name}...")
+        # Las predicciones sobre test quedan guardadas por hash del modelo
+        evaluation = evaluate_model(path, split_dir=test_dir, verbose=False)
+        model = load_inference_model(path)
+        image = to_model_input(decode_image(sample_path, get_input_size(model)), uses_raw_input(model))
+        predict = tf.function(lambda batch: model(batch, training=False))
+        results.append({
+            "model": name,
+            "path": path,
+            "parameters": int(model.count_params()),
+            "size_mb": os.path.getsize(path) / 1e6,
+            "latency_ms": measure_latency(predict, image[tf.newaxis]),
+            "test_accuracy": evaluation["accuracy"],
+            "test_macro_f1": evaluation["macro_f1"]
+        })
+
+    print(f"\n{'Modelo':<18}{'Parámetros':>12}{'Tamaño (MB)':>13}{'Latencia (ms)':>15}"
+          f"{'Precisión':>11}{'F1 macro':>10}")
+    print("-" * 79)
+    for result in results:
+        print(f"{result['model']:<18}{result['parameters']:>12,}{result['size_mb']:>13.2f}"
+              f"{result['latency_ms']:>15.2f}{result['test_accuracy'] * 100:>10.2f}%"
+              f"{result['test_macro_f1']:>10.3f}")
+
+    report_path = os.path.splitext(student_path)[0] + "_report.json"
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    print(f"\nReporte guardado en {report_path}")
+    return results
+
+
+def distill_and_compare(teacher: str = DISTILL_TEACHER, student: str = DISTILL_STUDENT, **kwargs):
+    """Destila el alumno y genera el reporte comparativo"""
+    teacher_path = kwargs.pop("teacher_path", None) or get_model_save_path(teacher)
+    _, student_path = distill_model(teacher, student, teacher_path=teacher_path, **kwargs)
+    return compare_distillation(student_path, teacher_path, get_model_save_path(student))
+
+
+def main(argv=None):
+    """Punto de entrada por línea de comandos"""
+    parser = argparse.ArgumentParser(description="Destilación de un maestro entrenado en un alumno liviano.")
+    parser.add_argument("-t", "--teacher", default=DISTILL_TEACHER, choices=list(ARCHITECTURES))
+    parser.add_argument("-s", "--student", default=DISTILL_STUDENT, choices=list(ARCHITECTURES))
+    parser.add_argument("--teacher-model", help="Modelo .h5 del maestro (por defecto, el de la arquitectura)")
+    parser.add_argument("-T", "--temperature", type=float, default=DISTILL_TEMPERATURE)
+    parser.add_argument("--alpha", type=float, default=DISTILL_ALPHA, help="Peso de las etiquetas reales")
+    parser.add_argument("--fine-tune-layers", type=int, default=DISTILL_FINE_TUNE_LAYERS)
+    parser.add_argument("--lr", type=float, default=DISTILL_LEARNING_RATE)
+    parser.add_argument("-e", "--epochs", type=int, default=EPOCHS)
+    parser.add_argument("--no-resume", action="store_true", help="Ignorar checkpoints previos")
+    args = parser.parse_args(argv)
+
+    distill_and_compare(args.teacher, args.student, teacher_path=args.teacher_model,
+                        temperature=args.temperature, alpha=args.alpha,
+                        fine_tune_layers=args.fine_tune_layers, learning_rate=args.lr,
+                        epochs=args.epochs, resume=not args.no_resume)
+
+
+if __name__ == "__main__":
+    main()
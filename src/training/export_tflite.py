@@ -0,0 +1,188 @@
+"""
+Exporta un modelo entrenado a TensorFlow Lite (float32, rango dinámico e int8)
+y compara tamaño, latencia en CPU y precisión contra el .h5 original.
+"""
+
+import os
+import json
+import time
+import random
+import numpy as np
+import tensorflow as tf
+
+# Importar configuración desde archivo centralizado
+from src.config import IMG_SIZE, MODEL_ARCHITECTURE, TRAIN_DIR, TEST_DIR
+
+from src.training.train_model import get_model_save_path
+from src.training.data_pipeline import list_image_files, decode_image, to_model_input
+from src.training.model_registry import copy_metadata, resolve_class_names
+from src.testing.model_loader import TFLiteModel, load_inference_model, uses_raw_input, get_input_size
+
+TFLITE_VARIANTS = ("float32", "dynamic", "int8")
+
+# Imágenes de TRAIN_DIR usadas para calibrar la cuantización int8
+REPRESENTATIVE_SAMPLES = 200
+
+# Repeticiones para medir la latencia por imagen
+LATENCY_RUNS = 50
+
+EVAL_BATCH_SIZE = 32
+
+
+def _load_images(paths, img_size, raw_input=False):
+    """Decodifica una lista de imágenes a float32 en [0, 1] (o uint8 BGR con raw_input)"""
+    return np.stack([to_model_input(decode_image(path, img_size), raw_input).numpy() for path in paths])
+
+
+def representative_dataset(train_dir=TRAIN_DIR, img_size=IMG_SIZE, num_samples=REPRESENTATIVE_SAMPLES,
+                           raw_input=False):
+    """Generador de imágenes de entrenamiento para calibrar la cuantización"""
+    paths, _ = list_image_files(train_dir)
+    random.Random(0).shuffle(paths)
+
+    def generator():
+        for path in paths[:num_samples]:
+            img = to_model_input(decode_image(path, img_size), raw_input)
+            yield [tf.expand_dims(img, 0)]
+
+    return generator
+
+
+def convert_model(model, variant, train_dir=TRAIN_DIR):
+    """
+    Convierte un modelo Keras a TFLite.
+
+    Args:
+        model: Modelo de Keras
+        variant: "float32", "dynamic" (pesos int8) o "int8" (cuantización entera completa)
+        train_dir: Carpeta de donde se toman las imágenes representativas (int8)
+
+    Returns:
+        Bytes del modelo .tflite
+    """
+    if variant not in TFLITE_VARIANTS:
+        raise ValueError(f"Variante '{variant}' no soportada. Opciones: {list(TFLITE_VARIANTS)}")
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if variant in ("dynamic", "int8"):
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if variant == "int8":
+        raw_input = uses_raw_input(model)
+        converter.representative_dataset = representative_dataset(
+            train_dir, get_input_size(model), raw_input=raw_input
+        )
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        # Con el preprocesamiento integrado la entrada ya es uint8 sin cuantizar
+        if not raw_input:
+            converter.inference_input_type = tf.uint8
+        converter.inference_output_type = tf.uint8
+    return converter.convert()
+
+
+def export_tflite(architecture=MODEL_ARCHITECTURE, variants=TFLITE_VARIANTS, model_path=None,
+                  train_dir=TRAIN_DIR):
+    """
+    Exporta el modelo entrenado de una arquitectura a las variantes TFLite pedidas.
+
+    Returns:
+        Diccionario {variante: ruta del .tflite}
+    """
+    model_path = model_path or get_model_save_path(architecture)
+    print(f"Cargando modelo desde {model_path}...")
+    model = load_inference_model(model_path)
+
+    exported = {}
+    for variant in variants:
+        print(f"Convirtiendo a TFLite ({variant})...")
+        tflite_path = get_model_save_path(architecture, variant=variant, extension=".tflite")
+        with open(tflite_path, "wb") as f:
+            f.write(convert_model(model, variant, train_dir))
+        copy_metadata(model_path, tflite_path, variant=variant)
+        exported[variant] = tflite_path
+        print(f"Guardado en {tflite_path}")
+    return exported
+
+
+def measure_latency(predict_fn, image, runs=LATENCY_RUNS):
+    """Latencia mediana (ms) de clasificar una sola imagen"""
+    predict_fn(image)  # Calentamiento
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        predict_fn(image)
+        times.append(time.perf_counter() - start)
+    return float(np.median(times) * 1000)
+
+
+def measure_accuracy(predict_fn, paths, labels, img_size, batch_size=EVAL_BATCH_SIZE, raw_input=False):
+    """Precisión de un modelo sobre una lista de imágenes etiquetadas"""
+    correct = 0
+    for i in range(0, len(paths), batch_size):
+        images = _load_images(paths[i:i + batch_size], img_size, raw_input)
+        predictions = np.argmax(predict_fn(images), axis=1)
+        correct += int(np.sum(predictions == np.asarray(labels[i:i + batch_size])))
+    return correct / max(len(paths), 1)
+
+
+def compare_exports(architecture=MODEL_ARCHITECTURE, exported=None, test_dir=TEST_DIR):
+    """
+    Compara tamaño, latencia por imagen en CPU y precisión del .h5 y sus exportaciones.
+
+    Returns:
+        Lista de resultados por modelo (también se guarda como JSON junto al modelo)
+    """
+    h5_path = get_model_save_path(architecture)
+    if exported is None:
+        exported = {
+            variant: get_model_save_path(architecture, variant=variant, extension=".tflite")
+            for variant in TFLITE_VARIANTS
+        }
+        exported = {variant: path for variant, path in exported.items() if os.path.exists(path)}
+
+    keras_model = load_inference_model(h5_path)
+    img_size = get_input_size(keras_model)
+    raw_input = uses_raw_input(keras_model)
+    # Etiquetas en el orden de salida del modelo (metadatos o TRAIN_DIR), no el de test_dir,
+    # que puede no tener todas las clases
+    class_names = resolve_class_names(h5_path, keras_model.output_shape[-1])
+    class_indices = {name: i for i, name in enumerate(class_names)}
+    paths, labels = list_image_files(test_dir, class_indices)
+    sample = _load_images(paths[:1], img_size, raw_input)
+
+    keras_predict = tf.function(lambda images: keras_model(images, training=False))
+    candidates = [("h5", h5_path, lambda images: keras_predict(images).numpy())]
+    for variant, path in exported.items():
+        candidates.append((variant, path, TFLiteModel(path).predict))
+
+    results = []
+    for name, path, predict_fn in candidates:
+        print(f"Evaluando {name}...")
+        results.append({
+            "model": name,
+            "path": path,
+            "size_mb": os.path.getsize(path) / 1e6,
+            "latency_ms": measure_latency(predict_fn, sample),
+            "test_accuracy": measure_accuracy(predict_fn, paths, labels, img_size, raw_input=raw_input)
+        })
+
+    print(f"\n{'Modelo':<10}{'Tamaño (MB)':>14}{'Latencia (ms)':>16}{'Precisión':>12}")
+    print("-" * 52)
+    for result in results:
+        print(f"{result['model']:<10}{result['size_mb']:>14.2f}"
+              f"{result['latency_ms']:>16.2f}{result['test_accuracy'] * 100:>11.2f}%")
+
+    report_path = get_model_save_path(architecture, variant="tflite_report", extension=".json")
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nReporte guardado en {report_path}")
+    return results
+
+
+def export_and_compare(architecture=MODEL_ARCHITECTURE):
+    """Exporta las tres variantes TFLite y genera el reporte comparativo"""
+    exported = export_tflite(architecture)
+    return compare_exports(architecture, exported)
+
+
+if __name__ == "__main__":
+    export_and_compare()
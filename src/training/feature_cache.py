@@ -0,0 +1,218 @@
+"""
+Caché de embeddings del modelo base congelado.
+Calcula la salida del pooling una sola vez por imagen y entrena solo la cabeza del modelo.
+"""
+
+import os
+import json
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras.models import Model
+from tensorflow.keras.layers import Input, GlobalAveragePooling2D
+from tensorflow.keras.utils import to_categorical
+
+# Importar configuración desde archivo centralizado
+from src.config import (
+    IMG_SIZE, BATCH_SIZE, EPOCHS, FEATURE_CACHE_DIR,
+    TRAIN_DIR, VAL_DIR
+)
+
+from src.training.data_pipeline import get_class_indices, list_image_files, decode_image, to_model_input
+from src.testing.model_loader import uses_raw_input
+from src.preprocessing.split_dataset import hash_images
+
+# Tamaño de lote para calcular embeddings (solo inferencia)
+EMBEDDING_BATCH_SIZE = 64
+
+
+class FeatureStore:
+    """
+    Almacén de embeddings indexado por hash de contenido.
+
+    Los vectores se guardan en un .npy mapeado a memoria que crece por duplicación,
+    y un index.json asocia cada hash con su fila.
+    """
+
+    def __init__(self, store_dir, feature_dim):
+        self.store_dir = store_dir
+        self.feature_dim = feature_dim
+        self.features_path = os.path.join(store_dir, "features.npy")
+        self.index_path = os.path.join(store_dir, "index.json")
+        os.makedirs(store_dir, exist_ok=True)
+
+        self.index = {}
+        self._features = None
+        if os.path.exists(self.index_path) and os.path.exists(self.features_path):
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                self.index = json.load(f)["rows"]
+            self._features = np.load(self.features_path, mmap_mode="r+")
+            if self._features.shape[1] != feature_dim:
+                raise ValueError(
+                    f"La caché {store_dir} tiene dimensión {self._features.shape[1]}, "
+                    f"se esperaba {feature_dim}"
+                )
+
+    def __len__(self):
+        return len(self.index)
+
+    def missing(self, hashes):
+        """Devuelve los hashes (sin repetir) que todavía no tienen embedding"""
+        return [h for h in dict.fromkeys(hashes) if h not in self.index]
+
+    def _ensure_capacity(self, rows):
+        """Agranda el archivo mapeado (duplicando su tamaño) si no entran las filas"""
+        capacity = 0 if self._features is None else self._features.shape[0]
+        if rows <= capacity:
+            return
+        new_capacity = max(rows, capacity * 2, 1024)
+        tmp_path = self.features_path + ".tmp.npy"
+        grown = np.lib.format.open_memmap(
+            tmp_path, mode="w+", dtype=np.float32, shape=(new_capacity, self.feature_dim)
+        )
+        if capacity:
+            grown[:capacity] = self._features
+        grown.flush()
+        del grown
+        self._features = None
+        os.replace(tmp_path, self.features_path)
+        self._features = np.load(self.features_path, mmap_mode="r+")
+
+    def add(self, hashes, features):
+        """Agrega los embeddings de nuevas imágenes y persiste el índice"""
+        start = len(self.index)
+        self._ensure_capacity(start + len(hashes))
+        self._features[start:start + len(hashes)] = features
+        self._features.flush()
+        for i, img_hash in enumerate(hashes):
+            self.index[img_hash] = start + i
+
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"feature_dim": self.feature_dim, "rows": self.index}, f)
+        os.replace(tmp_path, self.index_path)
+
+    def get(self, hashes):
+        """Devuelve una copia en memoria de los embeddings de los hashes pedidos"""
+        rows = np.fromiter((self.index[h] for h in hashes), dtype=np.int64, count=len(hashes))
+        return np.asarray(self._features[rows])
+
+
+def get_store_dir(architecture, img_size=IMG_SIZE, dtype="float32"):
+    """Carpeta de la caché para una arquitectura, tamaño de imagen y precisión del extractor"""
+    suffix = "" if dtype == "float32" else f"_{dtype}"
+    return os.path.join(FEATURE_CACHE_DIR, f"{architecture}_{img_size[0]}x{img_size[1]}{suffix}")
+
+
+def split_model(model):
+    """
+    Separa un modelo de create_model en extractor de embeddings y cabeza.
+
+    Las capas de la cabeza se comparten con el modelo original, por lo que
+    entrenar la cabeza actualiza directamente los pesos del modelo completo.
+
+    Returns:
+        Tupla (extractor, cabeza)
+    """
+    pool_idx = next(
+        i for i, layer in enumerate(model.layers)
+        if isinstance(layer, GlobalAveragePooling2D)
+    )
+    extractor = Model(inputs=model.input, outputs=model.layers[pool_idx].output)
+
+    head_input = Input(shape=extractor.output_shape[1:])
+    x = head_input
+    for layer in model.layers[pool_idx + 1:]:
+        x = layer(x)
+    head = Model(inputs=head_input, outputs=x)
+    return extractor, head
+
+
+def compute_embeddings(extractor, paths, img_size=IMG_SIZE, raw_input=None):
+    """
+    Calcula los embeddings de una lista de imágenes con un pipeline paralelo.
+
+    raw_input indica si el extractor recibe uint8 BGR (por defecto, según su entrada).
+    """
+    if raw_input is None:
+        raw_input = uses_raw_input(extractor)
+    dataset = tf.data.Dataset.from_tensor_slices(paths)
+    dataset = dataset.map(
+        lambda path: to_model_input(decode_image(path, img_size), raw_input),
+        num_parallel_calls=tf.data.AUTOTUNE
+    )
+    dataset = dataset.batch(EMBEDDING_BATCH_SIZE).prefetch(tf.data.AUTOTUNE)
+    return extractor.predict(dataset, verbose=1)
+
+
+def load_split_features(directory, class_indices, extractor, store, raw_input=None):
+    """
+    Obtiene los embeddings y etiquetas de un split, calculando solo los que falten.
+
+    Returns:
+        Tupla (embeddings, etiquetas one-hot)
+    """
+    paths, labels = list_image_files(directory, class_indices)
+    hashes = hash_images(paths)
+
+    missing = set(store.missing(hashes))
+    if missing:
+        # Una ruta representativa por cada hash nuevo
+        path_by_hash = {}
+        for path, img_hash in zip(paths, hashes):
+            if img_hash in missing:
+                path_by_hash.setdefault(img_hash, path)
+        new_hashes = list(path_by_hash)
+        print(f"Calculando embeddings de {len(new_hashes)} imágenes nuevas en {directory}...")
+        store.add(new_hashes, compute_embeddings(extractor, list(path_by_hash.values()), raw_input=raw_input))
+    print(f"{directory}: {len(paths) - len(missing)} embeddings reutilizados de la caché")
+
+    features = store.get(hashes)
+    return features, to_categorical(labels, num_classes=len(class_indices))
+
+
+def train_on_cached_features(model, architecture, optimizer, epochs=EPOCHS,
+                             batch_size=BATCH_SIZE, train_dir=TRAIN_DIR,
+                             val_dir=VAL_DIR, jit_compile=False,
+                             callbacks=None, initial_epoch=0):
+    """
+    Entrena la cabeza de un modelo de create_model sobre embeddings cacheados.
+
+    El split de prueba no se toca: el modelo completo se evalúa después sobre las imágenes.
+
+    Args:
+        model: Modelo completo (base congelada + cabeza)
+        architecture: Nombre de la arquitectura (clave de la caché)
+        optimizer: Optimizador para la cabeza
+        jit_compile: Compilar los pasos de la cabeza con XLA
+        callbacks: Callbacks de Keras para el entrenamiento de la cabeza
+        initial_epoch: Época desde la que se continúa (al reanudar)
+
+    Returns:
+        Historial del entrenamiento de la cabeza
+    """
+    class_indices = get_class_indices(train_dir)
+    extractor, head = split_model(model)
+    # Los embeddings en bfloat16 difieren de los float32: se guardan por separado
+    store_dir = get_store_dir(architecture, dtype=extractor.output.dtype.name)
+    store = FeatureStore(store_dir, extractor.output_shape[-1])
+
+    x_train, y_train = load_split_features(train_dir, class_indices, extractor, store)
+    x_val, y_val = load_split_features(val_dir, class_indices, extractor, store)
+
+    head.compile(
+        optimizer=optimizer,
+        loss="categorical_crossentropy",
+        metrics=["accuracy"],
+        jit_compile=jit_compile
+    )
+
+    print("Iniciando entrenamiento de la cabeza sobre embeddings cacheados...")
+    return head.fit(
+        x_train, y_train,
+        batch_size=batch_size,
+        epochs=epochs,
+        validation_data=(x_val, y_val),
+        shuffle=True,
+        callbacks=callbacks,
+        initial_epoch=initial_epoch
+    )
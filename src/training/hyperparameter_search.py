@@ -0,0 +1,416 @@
+"""
+Búsqueda de hiperparámetros (batch_size, learning_rate, dense_units y dropout_rate) con
+successive halving asíncrono (ASHA).
+
+Cada prueba entrena una configuración muestreada del espacio de búsqueda en un proceso
+propio, con un presupuesto de hilos de la CPU. Las pruebas se evalúan en "escalones" de
+épocas (p. ej. 1, 3, 9): cuando un proceso queda libre se promueve al escalón siguiente
+la mejor prueba pendiente del 1/reduction_factor superior de su escalón (según val_loss);
+si no hay ninguna, se empieza una prueba nueva. Las malas configuraciones se descartan
+tras pocas épocas sin esperar a que terminen las demás.
+
+El estado se guarda en search_dir/<arquitectura>/search.json después de cada escalón
+y cada prueba tiene sus checkpoints: una búsqueda interrumpida continúa donde quedó.
+Al terminar se escribe una copia de config.ini con la mejor configuración.
+
+Uso:
+    python -m src.training.hyperparameter_search -a mobilenet --trials 20 --concurrent 2
+"""
+
+import os
+import sys
+import json
+import math
+import random
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime
+
+# Importar configuración desde archivo centralizado
+from src.config import (
+    CONFIG_PATH, MODEL_ARCHITECTURE, EMBED_PREPROCESSING, SEARCH_TRIALS, SEARCH_MIN_EPOCHS, SEARCH_MAX_EPOCHS,
+    SEARCH_REDUCTION_FACTOR, SEARCH_CONCURRENT_TRIALS, SEARCH_FEATURE_CACHE, SEARCH_DIR, SEARCH_SEED
+)
+
+from src.training.architectures import ARCHITECTURES
+
+# Espacio de búsqueda: (distribución, parámetros) por hiperparámetro
+SEARCH_SPACE = {
+    "batch_size": ("choice", [8, 16, 32, 64]),
+    "learning_rate": ("log_uniform", 1e-4, 1e-2),
+    "dense_units": ("choice", [64, 128, 256, 512]),
+    "dropout_rate": ("uniform", 0.1, 0.6)
+}
+
+# Sección de config.ini de cada hiperparámetro
+CONFIG_SECTIONS = {
+    "batch_size": "training",
+    "learning_rate": "training",
+    "dense_units": "architecture",
+    "dropout_rate": "architecture"
+}
+
+
+def sample_params(trial_index, seed=SEARCH_SEED, space=SEARCH_SPACE):
+    """Configuración de una prueba (siempre la misma para el mismo índice y semilla)"""
+    rng = random.Random(seed * 100003 + trial_index)
+    params = {}
+    for name, (distribution, *args) in space.items():
+        if distribution == "choice":
+            params[name] = rng.choice(args[0])
+        elif distribution == "uniform":
+            params[name] = round(rng.uniform(*args), 3)
+        elif distribution == "log_uniform":
+            params[name] = float(f"{math.exp(rng.uniform(math.log(args[0]), math.log(args[1]))):.2e}")
+        else:
+            raise ValueError(f"Distribución '{distribution}' no soportada para {name}")
+    return params
+
+
+def get_rungs(min_epochs=SEARCH_MIN_EPOCHS, max_epochs=SEARCH_MAX_EPOCHS,
+              reduction_factor=SEARCH_REDUCTION_FACTOR):
+    """Épocas de cada escalón: min_epochs * reduction_factor^k hasta max_epochs"""
+    rungs = [min_epochs]
+    while rungs[-1] * reduction_factor <= max_epochs:
+        rungs.append(rungs[-1] * reduction_factor)
+    return rungs
+
+
+def export_features(architecture, path, embed_preprocessing=EMBED_PREPROCESSING):
+    """
+    Calcula (o reutiliza de la caché) los embeddings de train y val y los guarda en un
+    .npz que leen las pruebas: así ningún proceso escribe en la caché a la vez que otro.
+    """
+    import numpy as np
+    from src.config import TRAIN_DIR, VAL_DIR
+    from src.training.train_model import create_model
+    from src.training.data_pipeline import get_class_indices
+    from src.training.feature_cache import FeatureStore, get_store_dir, split_model, load_split_features
+
+    class_indices = get_class_indices(TRAIN_DIR)
+    extractor, _ = split_model(create_model(architecture, len(class_indices),
+                                            embed_preprocessing=embed_preprocessing))
+    store = FeatureStore(get_store_dir(architecture, dtype=extractor.output.dtype.name),
+                         extractor.output_shape[-1])
+    x_train, y_train = load_split_features(TRAIN_DIR, class_indices, extractor, store, embed_preprocessing)
+    x_val, y_val = load_split_features(VAL_DIR, class_indices, extractor, store, embed_preprocessing)
+    np.savez(path, x_train=x_train, y_train=y_train, x_val=x_val, y_val=y_val)
+
+
+def _run_trial(architecture, params, epochs, trial_dir, threads, features_path, embed_preprocessing):
+    """
+    Entrena una prueba hasta `epochs` épocas en un proceso nuevo, continuando desde su
+    último checkpoint si ya había llegado a un escalón anterior.
+
+    Returns:
+        Diccionario con val_loss y val_accuracy al terminar
+    """
+    import tensorflow as tf
+    # Debe hacerse antes de ejecutar cualquier operación de TensorFlow
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(max(1, threads // 2))
+
+    import numpy as np
+    from tensorflow.keras.optimizers import Adam
+    from src.config import TRAIN_DIR
+    from src.training.train_model import create_model, create_data_generators
+    from src.training.data_pipeline import get_class_indices
+    from src.training.feature_cache import split_model
+    from src.training.checkpoints import TrainingCheckpoint, CheckpointCallback
+
+    num_classes = len(get_class_indices(TRAIN_DIR))
+    # Con embeddings solo se entrena la cabeza: el modelo base no necesita sus pesos
+    model = create_model(architecture, num_classes, weights=None if features_path else "imagenet",
+                         embed_preprocessing=embed_preprocessing,
+                         dense_units=params["dense_units"], dropout_rate=params["dropout_rate"])
+    if features_path:
+        _, model = split_model(model)
+    model.compile(optimizer=Adam(learning_rate=params["learning_rate"]),
+                  loss="categorical_crossentropy", metrics=["accuracy"])
+
+    checkpoint = TrainingCheckpoint(model, model.optimizer, trial_dir, keep=1)
+    initial_epoch = checkpoint.restore_latest()
+    callbacks = [CheckpointCallback(checkpoint, patience=0, restore_best=False)]
+
+    if features_path:
+        data = np.load(features_path)
+        train_data = (data["x_train"], data["y_train"])
+        val_data = (data["x_val"], data["y_val"])
+        model.fit(*train_data, batch_size=params["batch_size"], epochs=epochs, initial_epoch=initial_epoch,
+                  validation_data=val_data, shuffle=True, callbacks=callbacks, verbose=0)
+        val_loss, val_accuracy = model.evaluate(*val_data, batch_size=params["batch_size"], verbose=0)
+    else:
+        # Las imágenes deben tener el formato que espera la entrada del modelo
+        train_gen, val_gen, _ = create_data_generators(loader="tfdata", cache="disk",
+                                                       batch_size=params["batch_size"],
+                                                       raw_input=embed_preprocessing,
+                                                       threads=threads)
+        model.fit(train_gen, epochs=epochs, initial_epoch=initial_epoch, validation_data=val_gen,
+                  callbacks=callbacks, verbose=0)
+        val_loss, val_accuracy = model.evaluate(val_gen, verbose=0)
+    checkpoint.sync()
+    return {"val_loss": float(val_loss), "val_accuracy": float(val_accuracy)}
+
+
+class SearchState:
+    """
+    Estado persistente de una búsqueda: configuración de cada prueba, resultados por
+    escalón y escalón en curso. Se escribe de forma atómica tras cada cambio.
+    """
+
+    def __init__(self, path, settings):
+        self.path = path
+        self.settings = settings
+        self.trials = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+            if saved["settings"] != settings:
+                raise ValueError(
+                    f"La búsqueda guardada en {path} usa otra configuración ({saved['settings']}). "
+                    "Usar --restart para empezar una nueva."
+                )
+            self.trials = saved["trials"]
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"settings": self.settings, "updated": datetime.now().isoformat(timespec="seconds"),
+                       "trials": self.trials}, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def results_at(self, epochs):
+        """Pruebas con resultado en un escalón: lista (val_loss, trial_id)"""
+        return [(trial["results"][str(epochs)]["val_loss"], trial_id)
+                for trial_id, trial in self.trials.items() if str(epochs) in trial["results"]]
+
+    def promotable(self, trial_id, epochs):
+        """Si una prueba puede pasar al escalón indicado (no lo tiene, no lo calcula y no falló)"""
+        trial = self.trials[trial_id]
+        return not (str(epochs) in trial["results"] or trial.get("running") == epochs or trial.get("error"))
+
+    def last_result(self, trial_id):
+        """Escalón más alto alcanzado por una prueba y su resultado"""
+        results = self.trials[trial_id]["results"]
+        epochs = max(results, key=int)
+        return int(epochs), results[epochs]
+
+    def ranking(self):
+        """Pruebas con resultados, ordenadas por escalón alcanzado (mayor primero) y val_loss"""
+        rows = []
+        for trial_id, trial in self.trials.items():
+            if trial["results"]:
+                epochs, result = self.last_result(trial_id)
+                rows.append((-epochs, result["val_loss"], trial_id))
+        return [trial_id for _, _, trial_id in sorted(rows)]
+
+
+def next_job(state, rungs, num_trials, reduction_factor, seed, running):
+    """
+    Siguiente trabajo según ASHA.
+
+    Primero se retoman las pruebas que quedaron a medias al interrumpir la búsqueda;
+    después, empezando por el escalón más alto, se promueve una prueba que esté en el
+    1/reduction_factor superior de su escalón; si no hay, se empieza una prueba nueva.
+
+    Returns:
+        Tupla (trial_id, épocas) o None si por ahora no hay trabajo
+    """
+    for trial_id, trial in state.trials.items():
+        if trial.get("running") and trial_id not in running:
+            return trial_id, trial["running"]
+
+    for k in range(len(rungs) - 2, -1, -1):
+        ranking = sorted(state.results_at(rungs[k]))
+        for _, trial_id in ranking[:len(ranking) // reduction_factor]:
+            if trial_id not in running and state.promotable(trial_id, rungs[k + 1]):
+                return trial_id, rungs[k + 1]
+
+    if len(state.trials) < num_trials:
+        trial_id = f"trial_{len(state.trials):03d}"
+        state.trials[trial_id] = {"params": sample_params(len(state.trials), seed), "results": {}}
+        return trial_id, rungs[0]
+    return None
+
+
+def write_best_config(params, output_path, source_path=CONFIG_PATH):
+    """
+    Copia config.ini reemplazando los hiperparámetros buscados (conserva los comentarios).
+
+    Returns:
+        Ruta del archivo escrito
+    """
+    with open(source_path, "r", encoding="utf-8") as f:
+        lines = f.readlines()
+    section = None
+    for i, line in enumerate(lines):
+        stripped = line.strip()
+        if stripped.startswith("[") and stripped.endswith("]"):
+            section = stripped[1:-1]
+            continue
+        key = stripped.split("=", 1)[0].strip() if "=" in stripped and not stripped.startswith("#") else None
+        if key in params and CONFIG_SECTIONS[key] == section:
+            lines[i] = f"{key} = {params[key]}\n"
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as f:
+        f.writelines(lines)
+    return output_path
+
+
+def print_search_summary(state, rungs, limit=10):
+    """Imprime las mejores pruebas ordenadas por escalón alcanzado y val_loss"""
+    ranking = state.ranking()
+    print(f"\n{'Prueba':<11}{'Épocas':>7}{'val_loss':>10}{'val_acc':>9}{'batch':>7}"
+          f"{'lr':>10}{'dense':>7}{'dropout':>9}")
+    print("-" * 70)
+    for trial_id in ranking[:limit]:
+        epochs, result = state.last_result(trial_id)
+        params = state.trials[trial_id]["params"]
+        print(f"{trial_id:<11}{epochs:>7}{result['val_loss']:>10.4f}{result['val_accuracy'] * 100:>8.2f}%"
+              f"{params['batch_size']:>7}{params['learning_rate']:>10.2e}{params['dense_units']:>7}"
+              f"{params['dropout_rate']:>9.3f}")
+    failed = sum(1 for trial in state.trials.values() if trial.get("error"))
+    print(f"\n{len(state.trials)} pruebas, {len(ranking)} con resultados, {failed} con error. "
+          f"Escalones: {rungs} épocas")
+
+
+def search_hyperparameters(architecture=MODEL_ARCHITECTURE, num_trials=SEARCH_TRIALS,
+                           min_epochs=SEARCH_MIN_EPOCHS, max_epochs=SEARCH_MAX_EPOCHS,
+                           reduction_factor=SEARCH_REDUCTION_FACTOR,
+                           concurrent_trials=SEARCH_CONCURRENT_TRIALS,
+                           use_feature_cache=SEARCH_FEATURE_CACHE, search_dir=SEARCH_DIR,
+                           seed=SEARCH_SEED, embed_preprocessing=EMBED_PREPROCESSING, restart=False):
+    """
+    Busca la mejor configuración de entrenamiento con ASHA.
+
+    Args:
+        architecture: Arquitectura a entrenar
+        num_trials: Configuraciones a probar
+        min_epochs: Épocas del primer escalón
+        max_epochs: Épocas máximas de una prueba
+        reduction_factor: Solo 1 de cada reduction_factor pruebas pasa al escalón siguiente
+        concurrent_trials: Pruebas simultáneas; los hilos de la CPU se reparten entre ellas
+        use_feature_cache: Entrenar solo la cabeza sobre embeddings cacheados (mucho más rápido)
+        search_dir: Carpeta del estado, los checkpoints y la mejor configuración
+        seed: Semilla del muestreo de configuraciones
+        embed_preprocessing: Entrenar modelos con el preprocesamiento integrado (ver create_model)
+        restart: Descartar una búsqueda anterior en lugar de continuarla
+
+    Returns:
+        Tupla (mejores hiperparámetros, ruta del config.ini generado) o (None, None)
+    """
+    if reduction_factor < 2:
+        raise ValueError(f"reduction_factor debe ser al menos 2 (se recibió {reduction_factor})")
+    if not 1 <= min_epochs <= max_epochs:
+        raise ValueError(f"Se requiere 1 <= min_epochs <= max_epochs ({min_epochs}, {max_epochs})")
+
+    run_dir = os.path.join(search_dir, architecture)
+    state_path = os.path.join(run_dir, "search.json")
+    if restart and os.path.isdir(run_dir):
+        import shutil
+        shutil.rmtree(run_dir)
+
+    rungs = get_rungs(min_epochs, max_epochs, reduction_factor)
+    settings = {"min_epochs": min_epochs, "max_epochs": max_epochs, "reduction_factor": reduction_factor,
+                "seed": seed, "feature_cache": use_feature_cache, "embed_preprocessing": embed_preprocessing,
+                "space": SEARCH_SPACE}
+    # Misma forma que al leer el JSON (las tuplas se guardan como listas)
+    settings = json.loads(json.dumps(settings))
+    state = SearchState(state_path, settings)
+    if state.trials:
+        print(f"Continuando la búsqueda de {state_path} ({len(state.trials)} pruebas previas)")
+
+    features_path = None
+    if use_feature_cache:
+        features_path = os.path.join(run_dir, "features.npz")
+        print("Preparando los embeddings de train y val...")
+        os.makedirs(run_dir, exist_ok=True)
+        export_features(architecture, features_path, embed_preprocessing)
+    else:
+        from src.training.data_pipeline import warm_disk_cache
+        print("Decodificando el dataset en la caché compartida...")
+        warm_disk_cache()
+
+    concurrent_trials = max(1, concurrent_trials)
+    threads = max(1, (os.cpu_count() or 1) // concurrent_trials)
+    print(f"Buscando hasta {num_trials} configuraciones de {ARCHITECTURES[architecture]['name']} "
+          f"(escalones {rungs} épocas, {concurrent_trials} a la vez, {threads} hilos cada una)...")
+
+    context = multiprocessing.get_context("spawn")
+    running = {}
+    # Un proceso nuevo por trabajo: no comparten grafo ni memoria de Keras
+    with ProcessPoolExecutor(max_workers=concurrent_trials, mp_context=context,
+                             max_tasks_per_child=1) as executor:
+        while True:
+            while len(running) < concurrent_trials:
+                job = next_job(state, rungs, num_trials, reduction_factor, seed, set(running.values()))
+                if job is None:
+                    break
+                trial_id, epochs = job
+                state.trials[trial_id]["running"] = epochs
+                state.save()
+                future = executor.submit(_run_trial, architecture, state.trials[trial_id]["params"], epochs,
+                                         os.path.join(run_dir, trial_id), threads, features_path,
+                                         embed_preprocessing)
+                running[future] = trial_id
+            if not running:
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                trial_id = running.pop(future)
+                trial = state.trials[trial_id]
+                epochs = trial.pop("running")
+                try:
+                    trial["results"][str(epochs)] = future.result()
+                    print(f"{trial_id} ({epochs} épocas): val_loss {trial['results'][str(epochs)]['val_loss']:.4f}")
+                except Exception as e:
+                    # Una configuración que falla (p. ej. sin memoria) no se vuelve a intentar
+                    trial["error"] = str(e)
+                    print(f"Error en {trial_id}: {e}")
+                state.save()
+
+    if features_path and os.path.exists(features_path):
+        os.remove(features_path)
+
+    ranking = state.ranking()
+    if not ranking:
+        print("Ninguna prueba terminó.")
+        return None, None
+
+    print_search_summary(state, rungs)
+    best_id = ranking[0]
+    best_params = state.trials[best_id]["params"]
+    config_path = write_best_config(best_params, os.path.join(run_dir, "best_config.ini"))
+    print(f"\nMejor configuración ({best_id}): {best_params}")
+    print(f"Guardada en {config_path} (para usarla, reemplazar config.ini)")
+    return best_params, config_path
+
+
+def main(argv=None):
+    """Punto de entrada por línea de comandos"""
+    parser = argparse.ArgumentParser(description="Búsqueda de hiperparámetros con successive halving (ASHA).")
+    parser.add_argument("-a", "--architecture", default=MODEL_ARCHITECTURE, choices=list(ARCHITECTURES))
+    parser.add_argument("-n", "--trials", type=int, default=SEARCH_TRIALS)
+    parser.add_argument("--min-epochs", type=int, default=SEARCH_MIN_EPOCHS)
+    parser.add_argument("--max-epochs", type=int, default=SEARCH_MAX_EPOCHS)
+    parser.add_argument("--eta", type=int, default=SEARCH_REDUCTION_FACTOR, help="Factor de reducción")
+    parser.add_argument("-c", "--concurrent", type=int, default=SEARCH_CONCURRENT_TRIALS,
+                        help="Pruebas simultáneas (los hilos se reparten entre ellas)")
+    parser.add_argument("--full-model", action="store_true",
+                        help="Entrenar con imágenes en lugar de embeddings cacheados")
+    parser.add_argument("--seed", type=int, default=SEARCH_SEED)
+    parser.add_argument("--restart", action="store_true", help="Descartar la búsqueda anterior")
+    args = parser.parse_args(argv)
+
+    best_params, _ = search_hyperparameters(
+        args.architecture, args.trials, args.min_epochs, args.max_epochs, args.eta, args.concurrent,
+        use_feature_cache=not args.full_model, seed=args.seed, restart=args.restart
+    )
+    return 0 if best_params else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,204 @@
+"""
+Registro de modelos entrenados y sus metadatos.
+
+Junto a cada modelo se guarda un archivo <modelo>.meta.json con las clases, el tamaño
+de entrada, la arquitectura, el preprocesamiento y las métricas del entrenamiento.
+Los modelos se cargan a través de la caché LRU de model_loader (ruta + fecha de
+modificación), así que volver a pedir un modelo ya usado es instantáneo.
+
+Uso:
+    python -m src.training.model_registry
+"""
+
+import os
+import json
+from datetime import datetime
+
+# Importar configuración desde archivo centralizado
+from src.config import MODEL_SAVE_DIR, MODEL_ARCHITECTURE, TRAIN_DIR
+
+METADATA_VERSION = 1
+METADATA_SUFFIX = ".meta.json"
+MODEL_EXTENSIONS = (".h5", ".keras", ".tflite")
+
+# Preprocesamiento que aplican todos los cargadores de entrenamiento
+DEFAULT_PREPROCESSING = {
+    "color_order": "RGB",
+    "resize": "nearest",
+    "rescale": 1.0 / 255,
+    "input_dtype": "float32",
+    "in_model": False
+}
+
+# Modelos con el preprocesamiento en el grafo: reciben uint8 BGR de cualquier tamaño
+EMBEDDED_PREPROCESSING = {
+    "color_order": "BGR",
+    "resize": "nearest",
+    "rescale": 1.0 / 255,
+    "input_dtype": "uint8",
+    "in_model": True
+}
+
+
+def get_metadata_path(model_path):
+    """Ruta del archivo de metadatos de un modelo"""
+    return os.path.splitext(model_path)[0] + METADATA_SUFFIX
+
+
+def _save_metadata(model_path, metadata):
+    """Escribe el archivo de metadatos de forma atómica"""
+    metadata_path = get_metadata_path(model_path)
+    tmp_path = metadata_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(metadata, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, metadata_path)
+    return metadata_path
+
+
+def write_metadata(model_path, architecture, class_indices, img_size, metrics=None,
+                   preprocessing=None, **extra):
+    """
+    Guarda los metadatos de un modelo junto al archivo del modelo.
+
+    Args:
+        model_path: Ruta del modelo guardado
+        architecture: Clave de la arquitectura en ARCHITECTURES
+        class_indices: Mapeo clase -> índice de salida del modelo
+        img_size: Tamaño de entrada del modelo
+        metrics: Métricas de evaluación (precisión, pérdida, tiempos...)
+        preprocessing: Preprocesamiento de entrada (por defecto, el de entrenamiento)
+        **extra: Datos adicionales (parámetros de entrenamiento, variante, etc.)
+
+    Returns:
+        Ruta del archivo de metadatos
+    """
+    class_names = [name for name, _ in sorted(class_indices.items(), key=lambda item: item[1])]
+    metadata = {
+        "version": METADATA_VERSION,
+        "model_file": os.path.basename(model_path),
+        "architecture": architecture,
+        "class_indices": dict(class_indices),
+        "class_names": class_names,
+        "img_size": list(img_size),
+        "preprocessing": preprocessing or DEFAULT_PREPROCESSING,
+        "metrics": metrics or {},
+        "created": datetime.now().isoformat(timespec="seconds"),
+        **extra
+    }
+    return _save_metadata(model_path, metadata)
+
+
+def read_metadata(model_path):
+    """Lee los metadatos de un modelo (None si no tiene)"""
+    metadata_path = get_metadata_path(model_path)
+    if not os.path.exists(metadata_path):
+        return None
+    with open(metadata_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def copy_metadata(source_model_path, target_model_path, **extra):
+    """Copia los metadatos de un modelo a un derivado (p. ej. su exportación TFLite)"""
+    metadata = read_metadata(source_model_path)
+    if metadata is None:
+        return None
+    metadata.update(extra)
+    metadata["model_file"] = os.path.basename(target_model_path)
+    metadata["created"] = datetime.now().isoformat(timespec="seconds")
+    return _save_metadata(target_model_path, metadata)
+
+
+def list_models(model_dir=MODEL_SAVE_DIR):
+    """
+    Lista los modelos guardados en una carpeta.
+
+    Returns:
+        Lista de diccionarios {path, size_mb, modified, metadata} ordenada por nombre
+    """
+    if not os.path.isdir(model_dir):
+        return []
+    models = []
+    for file_name in sorted(os.listdir(model_dir)):
+        if not file_name.endswith(MODEL_EXTENSIONS):
+            continue
+        path = os.path.join(model_dir, file_name)
+        stat = os.stat(path)
+        models.append({
+            "path": path,
+            "size_mb": stat.st_size / 1e6,
+            "modified": datetime.fromtimestamp(stat.st_mtime).isoformat(timespec="seconds"),
+            "metadata": read_metadata(path)
+        })
+    return models
+
+
+def print_models(model_dir=MODEL_SAVE_DIR):
+    """Imprime los modelos disponibles con su arquitectura, clases y precisión"""
+    models = list_models(model_dir)
+    if not models:
+        print(f"No hay modelos en {model_dir}")
+        return models
+
+    print(f"{'Modelo':<44}{'Tamaño (MB)':>12}{'Clases':>8}{'Test acc':>10}  Modificado")
+    print("-" * 96)
+    for model in models:
+        metadata = model["metadata"] or {}
+        accuracy = metadata.get("metrics", {}).get("test_accuracy")
+        classes = len(metadata["class_names"]) if "class_names" in metadata else "-"
+        accuracy_text = f"{accuracy * 100:.2f}%" if accuracy is not None else "-"
+        print(f"{os.path.basename(model['path']):<44}{model['size_mb']:>12.2f}{classes:>8}"
+              f"{accuracy_text:>10}  {model['modified']}")
+    return models
+
+
+def resolve_model_path(architecture=MODEL_ARCHITECTURE, variant=None):
+    """Ruta del modelo entrenado de una arquitectura (o de una variante exportada)"""
+    from src.training.train_model import get_model_save_path
+    extension = ".tflite" if variant else ".h5"
+    return get_model_save_path(architecture, variant=variant, extension=extension)
+
+
+def resolve_class_names(model_path, num_outputs=None, fallback=None):
+    """
+    Nombres de las clases en el orden de salida de un modelo.
+
+    Se usan, en orden de prioridad, los metadatos del modelo, las carpetas de
+    TRAIN_DIR y por último fallback. Si se indica num_outputs se verifica que la
+    cantidad de clases coincida con la salida del modelo.
+    """
+    metadata = read_metadata(model_path)
+    candidates = []
+    if metadata and metadata.get("class_names"):
+        candidates.append(metadata["class_names"])
+    if os.path.isdir(TRAIN_DIR):
+        from src.training.data_pipeline import get_class_indices
+        candidates.append(list(get_class_indices(TRAIN_DIR)))
+    if fallback:
+        candidates.append(list(fallback))
+
+    for class_names in candidates:
+        if class_names and (num_outputs is None or len(class_names) == num_outputs):
+            return class_names
+    raise ValueError(
+        f"No se encontraron nombres de clase para {model_path} que coincidan con sus "
+        f"{num_outputs} salidas. Vuelve a entrenar el modelo para generar {get_metadata_path(model_path)}."
+    )
+
+
+def load_registered_model(model_path=None, architecture=MODEL_ARCHITECTURE, fallback_class_names=None):
+    """
+    Carga un modelo (desde la caché LRU si ya se usó) junto con sus clases y metadatos.
+
+    Returns:
+        Tupla (modelo, nombres de clase, metadatos o None)
+    """
+    from src.testing.model_loader import load_inference_model
+
+    model_path = model_path or resolve_model_path(architecture)
+    model = load_inference_model(model_path)
+    class_names = resolve_class_names(model_path, model.output_shape[-1], fallback_class_names)
+    return model, class_names, read_metadata(model_path)
+
+
+if __name__ == "__main__":
+    print_models()
@@ -0,0 +1,380 @@
+"""
+Instrumentación de los pasos de entrenamiento.
+
+TrainingMonitor registra, por paso y por época, cuánto tiempo se esperó al pipeline
+de entrada y cuánto llevó el cálculo, imágenes/s y memoria residente del proceso,
+y lo escribe en un registro JSONL por ejecución. Opcionalmente captura una traza
+del profiler de TensorFlow para un rango de pasos.
+
+Uso:
+    python -m src.training.profiling                      # resumen del último registro
+    python -m src.training.profiling models/runs/a.jsonl  # resumen de un registro
+    python -m src.training.profiling --compare a.jsonl b.jsonl
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from collections import deque
+from datetime import datetime
+import numpy as np
+import tensorflow as tf
+
+# Importar configuración desde archivo centralizado
+from src.config import RUN_LOG_DIR, PROFILE_DIR
+
+# Fracción del paso esperando datos a partir de la cual el entrenamiento se considera
+# limitado por la entrada
+INPUT_BOUND_THRESHOLD = 0.2
+
+# Métricas del resumen: (clave, etiqueta)
+SUMMARY_FIELDS = (
+    ("steps", "Pasos"),
+    ("train_time_s", "Tiempo en pasos (s)"),
+    ("first_step_s", "Primer paso (s)"),
+    ("median_step_ms", "Paso mediano (ms)"),
+    ("p90_step_ms", "Paso p90 (ms)"),
+    ("input_wait_fraction", "Espera de datos"),
+    ("images_per_s", "Imágenes/s"),
+    ("peak_rss_mb", "RSS máxima (MB)"),
+    ("bottleneck", "Limitado por")
+)
+
+
+def _current_rss_mb():
+    """Memoria residente actual del proceso en MB (pico si no hay /proc)"""
+    try:
+        with open("/proc/self/statm", "r", encoding="utf-8") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except (OSError, ValueError, IndexError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1e6 if sys.platform == "darwin" else peak / 1e3
+
+
+def parse_step_range(text):
+    """
+    Interpreta un rango de pasos para el profiler ("10-20", "15" o vacío).
+
+    Returns:
+        Tupla (primer paso, último paso) o None si está vacío
+    """
+    text = (text or "").strip()
+    if not text:
+        return None
+    first, _, last = text.partition("-")
+    try:
+        first, last = int(first), int(last or first)
+    except ValueError:
+        raise ValueError(f"Rango de pasos no válido: '{text}'. Usa el formato inicio-fin, p. ej. 10-20.") from None
+    if first < 1 or last < first:
+        raise ValueError(f"Rango de pasos no válido: '{text}'. Los pasos empiezan en 1 y fin >= inicio.")
+    return first, last
+
+
+def get_run_log_path(architecture, run_log_dir=RUN_LOG_DIR):
+    """Ruta del registro de una ejecución nueva"""
+    return os.path.join(run_log_dir, f"{architecture}_{datetime.now():%Y%m%d_%H%M%S}.jsonl")
+
+
+class _TimedSequence(tf.keras.utils.Sequence):
+    """Envuelve un generador de Keras (p. ej. flow_from_directory) y marca cada lote entregado"""
+
+    def __init__(self, sequence, monitor):
+        super().__init__()
+        self._sequence = sequence
+        self._monitor = monitor
+
+    def __len__(self):
+        return len(self._sequence)
+
+    def __getitem__(self, index):
+        batch = self._sequence[index]
+        self._monitor.mark_batch(len(batch[0]))
+        return batch
+
+    def on_epoch_end(self):
+        self._sequence.on_epoch_end()
+
+    def __getattr__(self, name):
+        # class_indices, samples, etc. del generador original
+        return getattr(self._sequence, name)
+
+
+def instrument_dataset(dataset, monitor):
+    """
+    Marca el momento en que cada lote sale del pipeline de entrada.
+
+    En tf.data la marca es la última etapa del dataset y se ejecuta cuando el paso
+    pide el lote, así el tiempo entre el inicio del paso y la marca es la espera a
+    los datos. Los generadores de Keras se envuelven y la marca se toma al terminar
+    de armar cada lote.
+    """
+    if isinstance(dataset, tf.keras.utils.Sequence):
+        return _TimedSequence(dataset, monitor)
+    if not isinstance(dataset, tf.data.Dataset):
+        return dataset
+
+    def mark(images, labels):
+        stamp = tf.py_function(monitor.mark_batch, [tf.shape(images)[0]], tf.int32)
+        with tf.control_dependencies([stamp]):
+            return tf.identity(images), labels
+
+    # Sin prefetch automático después de la marca: debe ejecutarse al pedir el lote
+    options = tf.data.Options()
+    options.experimental_optimization.inject_prefetch = False
+    return dataset.map(mark).with_options(options)
+
+
+def _summarize_steps(steps):
+    """Resumen de una lista de registros de paso (el primero incluye el trazado y se excluye)"""
+    if not steps:
+        return {}
+    steady = steps[1:] or steps
+    step_ms = np.array([step["step_ms"] for step in steady])
+    waited = [step for step in steady if step["wait_ms"] is not None]
+    images = sum(step["images"] for step in steady)
+    input_wait = None
+    if waited:
+        input_wait = sum(step["wait_ms"] for step in waited) / max(sum(step["step_ms"] for step in waited), 1e-9)
+    return {
+        "steps": len(steps),
+        "train_time_s": sum(step["step_ms"] for step in steps) / 1000,
+        "first_step_s": steps[0]["step_ms"] / 1000,
+        "median_step_ms": float(np.median(step_ms)),
+        "p90_step_ms": float(np.percentile(step_ms, 90)),
+        "input_wait_fraction": input_wait,
+        "images_per_s": images / (step_ms.sum() / 1000) if step_ms.sum() else 0.0,
+        "peak_rss_mb": max(step["rss_mb"] for step in steps),
+        "bottleneck": None if input_wait is None else (
+            "entrada" if input_wait >= INPUT_BOUND_THRESHOLD else "cómputo"
+        )
+    }
+
+
+class TrainingMonitor(tf.keras.callbacks.Callback):
+    """
+    Callback que mide cada paso de model.fit y lo escribe en un registro JSONL.
+
+    El registro tiene una línea "run" con los datos de la ejecución, una línea "step"
+    por paso, una "epoch" por época y una "summary" al final de cada llamada a fit
+    (acumulado: con varias etapas, como en la resolución progresiva, vale la última).
+    Para separar la espera de datos del cálculo el dataset de entrenamiento debe pasar
+    por instrument_dataset.
+    """
+
+    def __init__(self, log_path=None, profile_steps=None, profile_dir=PROFILE_DIR, run_info=None,
+                 verbose=True):
+        super().__init__()
+        self.verbose = verbose
+        self.log_path = log_path
+        self.profile_steps = profile_steps
+        self.profile_dir = profile_dir
+        self.run_info = run_info or {}
+        self.summary = None
+        self._deliveries = deque()
+        self._file = None
+        self._steps = []
+        self._global_step = 0
+        self._profiling = False
+        self._started = False
+
+    def mark_batch(self, batch_size):
+        """Llamado desde el pipeline de entrada cuando un lote queda disponible"""
+        self._deliveries.append((time.perf_counter(), int(batch_size)))
+        return 0
+
+    def _write(self, record):
+        if self._file is not None:
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def _start_profiler(self):
+        name = os.path.splitext(os.path.basename(self.log_path or "run"))[0]
+        logdir = os.path.join(self.profile_dir, name)
+        try:
+            tf.profiler.experimental.start(logdir)
+        except Exception as e:
+            print(f"No se pudo iniciar el profiler: {e}")
+            return
+        self._profiling = True
+        print(f"\nCapturando traza del profiler en {logdir} (pasos {self.profile_steps[0]}-{self.profile_steps[1]})")
+
+    def _stop_profiler(self):
+        if self._profiling:
+            tf.profiler.experimental.stop()
+            self._profiling = False
+
+    def on_train_begin(self, logs=None):
+        if self.log_path:
+            os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+            self._file = open(self.log_path, "a" if self._started else "w", encoding="utf-8")
+        if not self._started:
+            self._write({"type": "run", "started": datetime.now().isoformat(timespec="seconds"),
+                         **self.run_info})
+            self._started = True
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._epoch = epoch
+        self._epoch_start = time.perf_counter()
+        self._epoch_steps = []
+
+    def on_train_batch_begin(self, batch, logs=None):
+        self._global_step += 1
+        if self.profile_steps and self._global_step == self.profile_steps[0]:
+            self._start_profiler()
+        self._step_start = time.perf_counter()
+
+    def on_train_batch_end(self, batch, logs=None):
+        # Leer la pérdida espera a que el paso termine realmente
+        loss = float(logs["loss"]) if logs and "loss" in logs else None
+        end = time.perf_counter()
+
+        delivery = None
+        while self._deliveries and self._deliveries[0][0] <= end:
+            delivery = self._deliveries.popleft()
+        step_ms = (end - self._step_start) * 1000
+        if delivery is not None:
+            wait_ms = max(0.0, (delivery[0] - self._step_start) * 1000)
+            images = delivery[1]
+        else:
+            wait_ms, images = None, self.run_info.get("batch_size", 0)
+
+        record = {
+            "type": "step",
+            "epoch": self._epoch + 1,
+            "step": batch + 1,
+            "global_step": self._global_step,
+            "step_ms": step_ms,
+            "wait_ms": wait_ms,
+            "compute_ms": step_ms - wait_ms if wait_ms is not None else None,
+            "images": images,
+            "images_per_s": images / (step_ms / 1000) if step_ms else 0.0,
+            "rss_mb": _current_rss_mb(),
+            "loss": loss
+        }
+        self._write(record)
+        self._steps.append(record)
+        self._epoch_steps.append(record)
+
+        if self.profile_steps and self._global_step == self.profile_steps[1]:
+            self._stop_profiler()
+
+    def on_epoch_end(self, epoch, logs=None):
+        record = {
+            "type": "epoch",
+            "epoch": epoch + 1,
+            "epoch_time_s": time.perf_counter() - self._epoch_start,
+            **_summarize_steps(self._epoch_steps),
+            "metrics": {key: float(value) for key, value in (logs or {}).items()}
+        }
+        self._write(record)
+        if self._file is not None:
+            self._file.flush()
+
+    def on_train_end(self, logs=None):
+        self._stop_profiler()
+        self.summary = _summarize_steps(self._steps)
+        self._write({"type": "summary", **self.summary})
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self.verbose:
+            print_run_summary(self.summary, self.log_path)
+
+
+def load_run_log(log_path):
+    """Lee todos los registros de un archivo JSONL"""
+    with open(log_path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def summarize_run_log(log_path):
+    """Resumen de un registro (se recalcula desde los pasos si la ejecución no terminó)"""
+    records = load_run_log(log_path)
+    summaries = [record for record in records if record["type"] == "summary"]
+    if summaries:
+        summary = summaries[-1]
+    else:
+        summary = _summarize_steps([record for record in records if record["type"] == "step"])
+    run = next((record for record in records if record["type"] == "run"), {})
+    return {**summary, "run": run}
+
+
+def _format_value(key, value):
+    if value is None:
+        return "-"
+    if key == "input_wait_fraction":
+        return f"{value * 100:.1f}%"
+    if isinstance(value, float):
+        return f"{value:.2f}"
+    return str(value)
+
+
+def print_run_summary(summary, log_path=None):
+    """Imprime el resumen de una ejecución"""
+    print("\nResumen de pasos de entrenamiento" + (f" ({log_path})" if log_path else ""))
+    print("-" * 50)
+    if not summary.get("steps"):
+        print("Sin pasos registrados.")
+        return
+    for key, label in SUMMARY_FIELDS:
+        print(f"  {label:<24}{_format_value(key, summary.get(key)):>16}")
+    if summary.get("input_wait_fraction") is None:
+        print("  Sin medición de espera de datos: el conjunto de entrenamiento no pasó por "
+              "instrument_dataset, no se puede separar entrada de cómputo.")
+
+
+def compare_run_logs(path_a, path_b):
+    """
+    Compara dos registros de ejecución y muestra la diferencia relativa de cada métrica.
+
+    Returns:
+        Tupla (resumen A, resumen B)
+    """
+    a, b = summarize_run_log(path_a), summarize_run_log(path_b)
+    print(f"\nA: {path_a}\nB: {path_b}\n")
+    print(f"{'Métrica':<24}{'A':>14}{'B':>14}{'Cambio':>10}")
+    print("-" * 62)
+    for key, label in SUMMARY_FIELDS:
+        value_a, value_b = a.get(key), b.get(key)
+        change = ""
+        if isinstance(value_a, (int, float)) and isinstance(value_b, (int, float)) and value_a:
+            change = f"{(value_b - value_a) / abs(value_a) * 100:+.1f}%"
+        print(f"{label:<24}{_format_value(key, value_a):>14}{_format_value(key, value_b):>14}{change:>10}")
+    return a, b
+
+
+def latest_run_log(run_log_dir=RUN_LOG_DIR):
+    """Registro más reciente de la carpeta (None si no hay)"""
+    if not os.path.isdir(run_log_dir):
+        return None
+    logs = [os.path.join(run_log_dir, name) for name in os.listdir(run_log_dir) if name.endswith(".jsonl")]
+    return max(logs, key=os.path.getmtime) if logs else None
+
+
+def main(argv=None):
+    """Punto de entrada por línea de comandos"""
+    parser = argparse.ArgumentParser(description="Resumen y comparación de registros de entrenamiento.")
+    parser.add_argument("logs", nargs="*", help="Registros JSONL (por defecto, el más reciente)")
+    parser.add_argument("--compare", action="store_true", help="Comparar dos registros")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        if len(args.logs) != 2:
+            parser.error("--compare necesita exactamente dos registros")
+        compare_run_logs(*args.logs)
+        return
+
+    logs = args.logs or [latest_run_log()]
+    if logs[0] is None:
+        print(f"No hay registros de entrenamiento en {RUN_LOG_DIR}")
+        return
+    for log_path in logs:
+        print_run_summary(summarize_run_log(log_path), log_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Entrenamiento con resolución progresiva.
+
+Las primeras épocas se entrenan con imágenes más chicas y lotes más grandes (se mantienen
+los píxeles por lote) y las últimas con IMG_SIZE. Las bases de keras.applications sin la
+capa superior son totalmente convolucionales: el modelo se crea con entrada de tamaño
+libre para entrenar y al final sus pesos se copian a un modelo con entrada IMG_SIZE.
+
+Para comparar contra el entrenamiento a resolución fija:
+    python -m src.training.benchmark --progressive -a mobilenet
+"""
+
+# Importar configuración desde archivo centralizado
+from src.config import IMG_SIZE, BATCH_SIZE
+
+# Lado mínimo que aceptan todas las bases de keras.applications
+MIN_SIZE = 32
+
+
+def parse_sizes(text):
+    """Interpreta la lista de resoluciones de config.ini ("128, 160")"""
+    try:
+        return tuple(int(size) for size in str(text).replace(",", " ").split())
+    except ValueError:
+        raise ValueError(f"Resoluciones no válidas: '{text}'. Usa enteros separados por coma, p. ej. 128, 160.") from None
+
+
+def build_schedule(epochs, sizes, img_size=IMG_SIZE, batch_size=BATCH_SIZE):
+    """
+    Divide las épocas en etapas de resolución creciente terminando en img_size.
+
+    Args:
+        epochs: Épocas totales
+        sizes: Lados de las etapas reducidas (el lado mayor de img_size se escala a cada uno)
+        img_size: Resolución final
+        batch_size: Tamaño de lote a resolución final
+
+    Returns:
+        Lista de etapas {"img_size", "batch_size", "end_epoch"} (la última tiene el resto de épocas)
+    """
+    target = max(img_size)
+    sizes = sorted({size for size in sizes if size < target})
+    if any(size < MIN_SIZE for size in sizes):
+        raise ValueError(f"Las resoluciones deben ser de al menos {MIN_SIZE} píxeles: {sizes}")
+
+    # Cada etapa debe tener al menos una época: con pocas épocas se omiten las más chicas
+    sizes = sizes[len(sizes) - min(len(sizes), epochs - 1):] if epochs > 1 else []
+    stage_epochs = epochs // (len(sizes) + 1)
+
+    schedule = []
+    end_epoch = 0
+    for size in sizes:
+        stage_size = tuple(max(MIN_SIZE, round(side * size / target)) for side in img_size)
+        pixels_ratio = (img_size[0] * img_size[1]) / (stage_size[0] * stage_size[1])
+        end_epoch += stage_epochs
+        schedule.append({
+            "img_size": stage_size,
+            "batch_size": max(batch_size, round(batch_size * pixels_ratio)),
+            "end_epoch": end_epoch
+        })
+    schedule.append({"img_size": tuple(img_size), "batch_size": batch_size, "end_epoch": epochs})
+    return schedule
+
+
+def fit_progressive(model, schedule, make_train_data, validation_data, callbacks=None, initial_epoch=0):
+    """
+    Entrena un modelo de entrada libre etapa por etapa.
+
+    Args:
+        model: Modelo compilado creado con img_size=(None, None)
+        schedule: Etapas de build_schedule
+        make_train_data: Función (img_size, batch_size) -> datos de entrenamiento
+        validation_data: Datos de validación (a resolución final, comparables entre etapas)
+        callbacks: Callbacks compartidos por todas las etapas
+        initial_epoch: Época desde la que se continúa (al reanudar)
+
+    Returns:
+        Última época entrenada
+    """
+    epoch = initial_epoch
+    for i, stage in enumerate(schedule, 1):
+        if stage["end_epoch"] <= epoch:
+            continue
+        height, width = stage["img_size"]
+        print(f"\nEtapa {i}/{len(schedule)}: {height}x{width}, lote {stage['batch_size']}, "
+              f"épocas {epoch + 1}-{stage['end_epoch']}")
+        history = model.fit(
+            make_train_data(stage["img_size"], stage["batch_size"]),
+            epochs=stage["end_epoch"],
+            initial_epoch=epoch,
+            validation_data=validation_data,
+            callbacks=callbacks
+        )
+        epoch = history.epoch[-1] + 1 if history.epoch else stage["end_epoch"]
+        # Parada temprana: no seguir con las etapas siguientes
+        if model.stop_training:
+            break
+    return epoch
@@ -0,0 +1,147 @@
+"""
+Entrena todas las arquitecturas registradas en una sola ejecución y las compara.
+
+El dataset se decodifica y redimensiona una sola vez en la caché en disco de tf.data;
+cada arquitectura entrena leyendo de esa caché en su propio proceso, en secuencia o
+varias a la vez repartiendo los hilos de la CPU. Al final se muestra una tabla con
+precisión, tiempo de entrenamiento y latencia de inferencia de cada una.
+
+Uso:
+    python -m src.training.train_all
+    python -m src.training.train_all --concurrent 2
+"""
+
+import os
+import sys
+import json
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+# Importar configuración desde archivo centralizado
+from src.config import IMG_SIZE, USE_FEATURE_CACHE
+
+from src.training.architectures import ARCHITECTURES
+from src.training.benchmark import BENCHMARK_DIR
+
+# Entrenamientos simultáneos (1 = uno detrás de otro)
+CONCURRENT_RUNS = 1
+
+# Repeticiones para medir la latencia de inferencia al terminar cada entrenamiento
+LATENCY_RUNS = 50
+
+
+def _train_architecture(architecture, threads, use_feature_cache):
+    """
+    Entrena una arquitectura dentro de un proceso nuevo con un presupuesto de hilos.
+
+    Returns:
+        Diccionario con las métricas del entrenamiento y la latencia
+    """
+    import tensorflow as tf
+    # Debe hacerse antes de ejecutar cualquier operación de TensorFlow
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(max(1, threads // 2))
+
+    from src.training.train_model import train_model
+    from src.training.benchmark import measure_latency_percentiles
+    from src.testing.model_loader import uses_raw_input
+
+    model, results = train_model(
+        architecture, use_feature_cache=use_feature_cache,
+        loader="tfdata", cache="disk", return_results=True, threads=threads
+    )
+    predict = tf.function(lambda images: model(images, training=False))
+    results["latency_ms"] = measure_latency_percentiles(predict, IMG_SIZE, LATENCY_RUNS,
+                                                        raw_input=uses_raw_input(model))
+    results["params"] = int(model.count_params())
+    results["threads"] = threads
+    return results
+
+
+def print_leaderboard(results):
+    """Imprime las arquitecturas ordenadas por precisión en test"""
+    ranking = sorted(results.items(), key=lambda item: item[1]["test_accuracy"], reverse=True)
+    print(f"\n{'#':<3}{'Arquitectura':<16}{'Test acc':>10}{'Entrenamiento (s)':>19}"
+          f"{'Latencia p50 (ms)':>19}{'Params (M)':>12}")
+    print("-" * 79)
+    for position, (architecture, result) in enumerate(ranking, 1):
+        print(f"{position:<3}{ARCHITECTURES[architecture]['name']:<16}"
+              f"{result['test_accuracy'] * 100:>9.2f}%{result['train_time_s']:>19.1f}"
+              f"{result['latency_ms']['p50']:>19.2f}{result['params'] / 1e6:>12.2f}")
+
+
+def train_all(architectures=None, concurrent_runs=CONCURRENT_RUNS,
+              use_feature_cache=USE_FEATURE_CACHE, output_dir=BENCHMARK_DIR):
+    """
+    Entrena y compara varias arquitecturas sobre el mismo dataset decodificado.
+
+    Args:
+        architectures: Claves de ARCHITECTURES a entrenar (por defecto, todas)
+        concurrent_runs: Entrenamientos simultáneos; los hilos de la CPU se reparten entre ellos
+        use_feature_cache: Entrenar solo la cabeza sobre embeddings cacheados
+
+    Returns:
+        Diccionario {arquitectura: resultados}
+    """
+    architectures = architectures or list(ARCHITECTURES.keys())
+    concurrent_runs = max(1, min(concurrent_runs, len(architectures)))
+    threads = max(1, (os.cpu_count() or 1) // concurrent_runs)
+
+    if not use_feature_cache:
+        from src.training.data_pipeline import warm_disk_cache
+        print("Decodificando el dataset en la caché compartida...")
+        warm_disk_cache()
+
+    print(f"Entrenando {len(architectures)} arquitecturas "
+          f"({concurrent_runs} a la vez, {threads} hilos cada una)...")
+
+    results = {}
+    context = multiprocessing.get_context("spawn")
+    # Un proceso nuevo por arquitectura: no comparten grafo ni memoria de Keras
+    with ProcessPoolExecutor(max_workers=concurrent_runs, mp_context=context,
+                             max_tasks_per_child=1) as executor:
+        futures = {
+            executor.submit(_train_architecture, architecture, threads, use_feature_cache): architecture
+            for architecture in architectures
+        }
+        for future in as_completed(futures):
+            architecture = futures[future]
+            try:
+                results[architecture] = future.result()
+            except Exception as e:
+                print(f"Error entrenando {ARCHITECTURES[architecture]['name']}: {e}")
+
+    if not results:
+        print("No se completó ningún entrenamiento.")
+        return results
+
+    print_leaderboard(results)
+
+    os.makedirs(output_dir, exist_ok=True)
+    output_path = os.path.join(output_dir, f"leaderboard_{datetime.now():%Y%m%d_%H%M%S}.json")
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump({
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "concurrent_runs": concurrent_runs,
+            "results": results
+        }, f, indent=2)
+    print(f"\nResultados guardados en {output_path}")
+    return results
+
+
+def main(argv=None):
+    """Punto de entrada por línea de comandos"""
+    parser = argparse.ArgumentParser(description="Entrena y compara todas las arquitecturas.")
+    parser.add_argument("-a", "--architectures", nargs="+", choices=list(ARCHITECTURES.keys()))
+    parser.add_argument("-c", "--concurrent", type=int, default=CONCURRENT_RUNS,
+                        help="Entrenamientos simultáneos (los hilos se reparten entre ellos)")
+    args = parser.parse_args(argv)
+
+    train_all(args.architectures, args.concurrent)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
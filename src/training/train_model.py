@@ -1,39 +1,138 @@
 """ Script de entrenamiento genérico para clasificación de imágenes. (ImageNet) """
 
 import os
+import time
+import importlib
+import numpy as np
 import tensorflow as tf
 from tensorflow.keras.preprocessing.image import ImageDataGenerator
-from tensorflow.keras.applications import EfficientNetB0, MobileNetV2, ResNet50, DenseNet121
 from tensorflow.keras.models import Model
-from tensorflow.keras.layers import Dense, GlobalAveragePooling2D, Dropout
+from tensorflow.keras.layers import (
+    Input, Dense, GlobalAveragePooling2D, Dropout, Conv2D, Resizing, Rescaling, BatchNormalization
+)
 from tensorflow.keras.optimizers import Adam
+from tensorflow.keras import mixed_precision
 
 # Importar configuración desde archivo centralizado
 from src.config import (
     IMG_SIZE, BATCH_SIZE, EPOCHS, NUM_CLASSES, LEARNING_RATE,
     DENSE_UNITS, DROPOUT_RATE, MODEL_ARCHITECTURE,
-    TRAIN_DIR, VAL_DIR, TEST_DIR, MODEL_SAVE_DIR
+    TRAIN_DIR, VAL_DIR, TEST_DIR, MODEL_SAVE_DIR, DATA_LOADER,
+    USE_FEATURE_CACHE, JIT_COMPILE, PRECISION, PIPELINE_CACHE,
+    RUN_LOG, PROFILE_STEPS, CHECKPOINTS_ENABLED, RESUME_TRAINING, RESTORE_BEST,
+    PROGRESSIVE_RESOLUTION, PROGRESSIVE_SIZES, EMBED_PREPROCESSING
 )
 
 # Importar registro de arquitecturas
 from src.training.architectures import ARCHITECTURES
+from src.training.data_pipeline import (
+    create_datasets, create_packed_datasets, get_class_indices, resize_batches, dataset_signature,
+    RESIZE_METHOD
+)
+from src.training.model_registry import write_metadata, EMBEDDED_PREPROCESSING
+from src.testing.model_loader import uses_raw_input
+from src.training.feature_cache import train_on_cached_features
+from src.testing.evaluation import evaluate_model
+from src.training.checkpoints import TrainingCheckpoint, CheckpointCallback, get_checkpoint_dir
+from src.training.progressive import parse_sizes, build_schedule, fit_progressive
+from src.training.profiling import (
+    TrainingMonitor, instrument_dataset, get_run_log_path, parse_step_range, print_run_summary
+)
 
-# Mapeo de arquitecturas a clases de Keras (lazy loading)
+# Mapeo de arquitecturas a clases de Keras (lazy loading: se importan al crear el modelo)
 MODEL_CLASSES = {
-    "efficientnet": EfficientNetB0,
-    "mobilenet": MobileNetV2,
-    "resnet": ResNet50,
-    "densenet": DenseNet121
+    "efficientnet": "EfficientNetB0",
+    "mobilenet": "MobileNetV2",
+    "resnet": "ResNet50",
+    "densenet": "DenseNet121"
 }
 
+PRECISION_POLICIES = ("float32", "mixed_bfloat16", "auto")
+
+# Convolución 1x1 fija que invierte el orden de los canales (BGR de OpenCV -> RGB de entrenamiento).
+# Es una capa estándar: el .h5 se carga sin objetos personalizados
+BGR_TO_RGB_KERNEL = np.eye(3, dtype="float32")[::-1].reshape(1, 1, 3, 3)
+
+
+def get_model_save_path(architecture: str, variant: str = None, extension: str = ".h5") -> str:
+    """
+    Genera la ruta de guardado según la arquitectura.
+    
+    Args:
+        architecture: Nombre de la arquitectura
+        variant: Sufijo opcional para derivados del modelo (p. ej. "int8")
+        extension: Extensión del archivo
+    """
+    suffix = f"_{variant}" if variant else ""
+    return os.path.join(MODEL_SAVE_DIR, f"{architecture}_carne_vacuna{suffix}{extension}")
+
+
+def cpu_supports_bfloat16() -> bool:
+    """Indica si la CPU tiene instrucciones bfloat16 nativas (AVX512_BF16 o AMX)"""
+    try:
+        with open("/proc/cpuinfo", "r", encoding="utf-8") as f:
+            flags = f.read()
+    except OSError:
+        return False
+    return "avx512_bf16" in flags or "amx_bf16" in flags
+
+
+def resolve_precision(precision: str = PRECISION) -> str:
+    """
+    Traduce la opción de precisión a una política de Keras.
+    
+    Returns:
+        "float32" o "mixed_bfloat16"
+    """
+    if precision not in PRECISION_POLICIES:
+        raise ValueError(
+            f"Precisión '{precision}' no soportada. Opciones: {list(PRECISION_POLICIES)}"
+        )
+    if precision == "auto":
+        return "mixed_bfloat16" if cpu_supports_bfloat16() else "float32"
+    return precision
+
 
-def get_model_save_path(architecture: str) -> str:
-    """Genera la ruta de guardado según la arquitectura"""
-    return os.path.join(MODEL_SAVE_DIR, f"{architecture}_carne_vacuna.h5")
+def get_model_class(architecture: str):
+    """Importa y devuelve la clase de keras.applications de una arquitectura"""
+    applications = importlib.import_module("tensorflow.keras.applications")
+    return getattr(applications, MODEL_CLASSES[architecture])
 
 
-def create_data_generators(train_dir=TRAIN_DIR, val_dir=VAL_DIR, test_dir=TEST_DIR):
-    """Crea los generadores de datos para entrenamiento, validación y prueba"""
+def create_data_generators(train_dir=TRAIN_DIR, val_dir=VAL_DIR, test_dir=TEST_DIR,
+                           loader=DATA_LOADER, cache=PIPELINE_CACHE,
+                           img_size=IMG_SIZE, batch_size=BATCH_SIZE, raw_input=False, threads=None):
+    """
+    Crea los generadores de datos para entrenamiento, validación y prueba.
+    
+    Args:
+        train_dir, val_dir, test_dir: Carpetas de cada split
+        loader: "generator" (ImageDataGenerator), "tfdata" (pipeline paralelo)
+                o "packed" (shards ya redimensionados de PACKED_DIR)
+        cache: Caché de imágenes decodificadas para "tfdata" ("none", "memory" o "disk")
+        img_size: Tamaño de las imágenes
+        batch_size: Tamaño de lote
+        raw_input: Entregar uint8 BGR para un modelo con preprocesamiento integrado
+        threads: Hilos del pool propio de los datasets de tf.data (None = pool global)
+    
+    Returns:
+        Tupla (train, val, test) con generadores o tf.data.Dataset
+    """
+    if loader == "tfdata":
+        return create_datasets(train_dir, val_dir, test_dir, img_size, batch_size, cache=cache,
+                               raw_input=raw_input, threads=threads)
+    if loader == "packed":
+        return create_packed_datasets(img_size=img_size, batch_size=batch_size, raw_input=raw_input,
+                                      threads=threads)
+    if loader != "generator":
+        raise ValueError(
+            f"Cargador '{loader}' no soportado. Opciones: ['generator', 'tfdata', 'packed']"
+        )
+    if raw_input:
+        raise ValueError(
+            "El preprocesamiento integrado en el modelo requiere el cargador 'tfdata' o 'packed' "
+            "(ImageDataGenerator entrega float32 RGB)."
+        )
     
     train_datagen = ImageDataGenerator(rescale=1.0 / 255)
     val_datagen = ImageDataGenerator(rescale=1.0 / 255)
@@ -41,33 +140,44 @@ def create_data_generators(train_dir=TRAIN_DIR, val_dir=VAL_DIR, test_dir=TEST_D
 
     train_generator = train_datagen.flow_from_directory(
         train_dir,
-        target_size=IMG_SIZE,
-        batch_size=BATCH_SIZE,
+        target_size=img_size,
+        batch_size=batch_size,
         class_mode="categorical"
     )
     val_generator = val_datagen.flow_from_directory(
         val_dir,
-        target_size=IMG_SIZE,
-        batch_size=BATCH_SIZE,
+        target_size=img_size,
+        batch_size=batch_size,
         class_mode="categorical"
     )
     test_generator = test_datagen.flow_from_directory(
         test_dir,
-        target_size=IMG_SIZE,
-        batch_size=BATCH_SIZE,
+        target_size=img_size,
+        batch_size=batch_size,
         class_mode="categorical"
     )
     
     return train_generator, val_generator, test_generator
 
 
-def create_model(architecture: str = MODEL_ARCHITECTURE, num_classes: int = NUM_CLASSES):
+def create_model(architecture: str = MODEL_ARCHITECTURE, num_classes: int = NUM_CLASSES,
+                 weights: str = "imagenet", precision: str = PRECISION, img_size: tuple = IMG_SIZE,
+                 embed_preprocessing: bool = EMBED_PREPROCESSING,
+                 dense_units: int = DENSE_UNITS, dropout_rate: float = DROPOUT_RATE):
     """
     Crea el modelo con transfer learning según la arquitectura especificada.
     
     Args:
         architecture: Nombre de la arquitectura ("efficientnet", "mobilenet")
         num_classes: Número de clases para clasificación
+        weights: Pesos iniciales del modelo base ("imagenet" o None para aleatorios)
+        precision: "float32", "mixed_bfloat16" o "auto"
+        img_size: Tamaño de entrada; (None, None) acepta cualquier resolución
+        embed_preprocessing: Integrar en el grafo el redimensionado a img_size, el paso
+                             de BGR a RGB y el reescalado a [0, 1]: el modelo recibe
+                             imágenes uint8 BGR de cualquier tamaño, tal como salen de OpenCV
+        dense_units: Neuronas de la capa densa de la cabeza
+        dropout_rate: Dropout antes de la capa de salida
     
     Returns:
         Modelo compilado listo para entrenar
@@ -79,67 +189,281 @@ def create_model(architecture: str = MODEL_ARCHITECTURE, num_classes: int = NUM_
         )
     
     arch_name = ARCHITECTURES[architecture]["name"]
-    model_class = MODEL_CLASSES[architecture]
+    model_class = get_model_class(architecture)
+    policy = resolve_precision(precision)
     
-    print(f"Usando arquitectura: {arch_name}")
+    print(f"Usando arquitectura: {arch_name} ({policy})")
     
-    # Crear modelo base con pesos de ImageNet
-    base_model = model_class(
-        weights="imagenet", 
-        include_top=False, 
-        input_shape=(*IMG_SIZE, 3)
-    )
-    base_model.trainable = False
+    # La política solo afecta a las capas creadas mientras está activa
+    previous_policy = mixed_precision.global_policy()
+    mixed_precision.set_global_policy(policy)
+    try:
+        # Crear modelo base con pesos de ImageNet
+        base_model = model_class(
+            weights=weights, 
+            include_top=False, 
+            input_shape=(*img_size, 3)
+        )
+        base_model.trainable = False
+
+        if embed_preprocessing:
+            # La base se aplica como submodelo: sus pesos de ImageNet ya están cargados
+            inputs = Input(shape=(None, None, 3), dtype="uint8", name="image")
+            x = inputs
+            if None not in img_size:
+                x = Resizing(*img_size, interpolation=RESIZE_METHOD, name="resize")(x)
+            x = Rescaling(1.0 / 255, name="rescale")(x)
+            x = Conv2D(3, 1, use_bias=False, trainable=False, name="bgr_to_rgb")(x)
+            x = base_model(x, training=False)
+        else:
+            inputs = base_model.input
+            x = base_model.output
 
-    # Añadir capas de clasificación
-    x = base_model.output
-    x = GlobalAveragePooling2D()(x)
-    x = Dense(DENSE_UNITS, activation="relu")(x)
-    x = Dropout(DROPOUT_RATE)(x)
-    outputs = Dense(num_classes, activation="softmax")(x)
+        # Añadir capas de clasificación
+        x = GlobalAveragePooling2D()(x)
+        x = Dense(dense_units, activation="relu")(x)
+        x = Dropout(dropout_rate)(x)
+        # Softmax en float32 por estabilidad numérica (también con precisión mixta)
+        outputs = Dense(num_classes, activation="softmax", dtype="float32")(x)
+    finally:
+        mixed_precision.set_global_policy(previous_policy)
 
-    model = Model(inputs=base_model.input, outputs=outputs)
+    model = Model(inputs=inputs, outputs=outputs)
+    if embed_preprocessing:
+        model.get_layer("bgr_to_rgb").set_weights([BGR_TO_RGB_KERNEL])
     return model
 
 
-def train_model(architecture: str = MODEL_ARCHITECTURE):
+def unfreeze_top_layers(model, num_layers: int):
+    """
+    Descongela las últimas num_layers capas del modelo base (0 = solo la cabeza,
+    None = todo el modelo base).
+
+    Las BatchNormalization quedan congeladas: con lotes chicos sus estadísticas
+    se arruinarían.
+    """
+    layers = []
+    for layer in model.layers:
+        if isinstance(layer, GlobalAveragePooling2D):
+            break
+        if isinstance(layer, tf.keras.Model):
+            # Base anidada (preprocesamiento integrado)
+            layer.trainable = True
+            layers.extend(layer.layers)
+        else:
+            layers.append(layer)
+    first = 0 if num_layers is None else len(layers) - num_layers
+    for i, layer in enumerate(layers):
+        if layer.name != "bgr_to_rgb":
+            layer.trainable = i >= first and not isinstance(layer, BatchNormalization)
+
+
+def to_fixed_resolution(model, architecture: str, precision: str = PRECISION, jit_compile: bool = JIT_COMPILE):
+    """
+    Copia los pesos de un modelo de entrada libre a uno con entrada IMG_SIZE.
+
+    Returns:
+        Modelo compilado con la misma configuración de entrenamiento
+    """
+    fixed_model = create_model(architecture, model.output_shape[-1], weights=None, precision=precision,
+                               embed_preprocessing=uses_raw_input(model))
+    fixed_model.set_weights(model.get_weights())
+    fixed_model.compile(
+        optimizer=Adam(learning_rate=LEARNING_RATE),
+        loss="categorical_crossentropy",
+        metrics=["accuracy"],
+        jit_compile=jit_compile
+    )
+    return fixed_model
+
+
+def train_model(architecture: str = MODEL_ARCHITECTURE, use_feature_cache: bool = USE_FEATURE_CACHE,
+                jit_compile: bool = JIT_COMPILE, precision: str = PRECISION,
+                loader: str = DATA_LOADER, cache: str = PIPELINE_CACHE,
+                run_log: bool = RUN_LOG, profile_steps: str = PROFILE_STEPS,
+                checkpoints: bool = CHECKPOINTS_ENABLED, resume: bool = RESUME_TRAINING,
+                progressive: bool = PROGRESSIVE_RESOLUTION, epochs: int = EPOCHS,
+                embed_preprocessing: bool = EMBED_PREPROCESSING,
+                save_model: bool = True, return_results: bool = False, threads: int = None):
     """
     Entrena el modelo con la arquitectura especificada.
     
     Args:
         architecture: Nombre de la arquitectura a usar
+        use_feature_cache: Entrenar solo la cabeza sobre embeddings cacheados
+        jit_compile: Compilar los pasos con XLA
+        precision: "float32", "mixed_bfloat16" o "auto"
+        loader: Cargador de datos ("generator" o "tfdata")
+        cache: Caché de imágenes decodificadas para "tfdata"
+        run_log: Registrar los tiempos de cada paso en un JSONL (ver profiling.py)
+        profile_steps: Rango de pasos para capturar una traza del profiler ("10-20")
+        checkpoints: Guardar checkpoints por época con parada temprana (ver checkpoints.py)
+        resume: Continuar desde el último checkpoint si existe
+        progressive: Empezar con resolución reducida y subir hasta IMG_SIZE (ver progressive.py)
+        epochs: Épocas de entrenamiento
+        embed_preprocessing: Guardar un modelo que recibe uint8 BGR de cualquier tamaño (ver create_model)
+        save_model: Guardar el modelo y sus metadatos en MODEL_SAVE_DIR
+        return_results: Devolver también las métricas del entrenamiento
+        threads: Hilos del pool propio de los datasets de tf.data (None = pool global)
+    
+    Returns:
+        El modelo entrenado, o la tupla (modelo, resultados) si return_results es True
     """
     print(f"\n{'='*50}")
     print(f"Iniciando entrenamiento con {ARCHITECTURES[architecture]['name']}")
     print(f"{'='*50}\n")
     
-    print("Creando generadores de datos...")
-    train_gen, val_gen, test_gen = create_data_generators()
-    
+    if progressive and use_feature_cache:
+        print("La resolución progresiva no aplica a la caché de embeddings: se entrena a resolución fija.")
+        progressive = False
+
+    start_time = time.perf_counter()
+    run_log_path = None
     print("Creando modelo...")
-    model = create_model(architecture=architecture)
+    # Con resolución progresiva se entrena un modelo de entrada libre
+    model = create_model(architecture=architecture, precision=precision,
+                         img_size=(None, None) if progressive else IMG_SIZE,
+                         embed_preprocessing=embed_preprocessing)
     
     model.compile(
         optimizer=Adam(learning_rate=LEARNING_RATE),
         loss="categorical_crossentropy",
-        metrics=["accuracy"]
+        metrics=["accuracy"],
+        jit_compile=jit_compile
     )
 
-    print("Iniciando entrenamiento...")
-    model.fit(
-        train_gen,
-        epochs=EPOCHS,
-        validation_data=val_gen
-    )
+    callbacks = []
+    initial_epoch = 0
+    checkpoint = None
+    if checkpoints:
+        fingerprint = {
+            "architecture": architecture,
+            "batch_size": BATCH_SIZE,
+            "learning_rate": LEARNING_RATE,
+            "dense_units": DENSE_UNITS,
+            "dropout_rate": DROPOUT_RATE,
+            "img_size": IMG_SIZE,
+            "precision": resolve_precision(precision),
+            "embed_preprocessing": embed_preprocessing,
+            "use_feature_cache": use_feature_cache,
+            "progressive": progressive,
+            "train_data": dataset_signature(TRAIN_DIR),
+            "val_data": dataset_signature(VAL_DIR)
+        }
+        checkpoint = TrainingCheckpoint(model, model.optimizer, get_checkpoint_dir(architecture),
+                                        fingerprint=fingerprint)
+        if resume:
+            initial_epoch = checkpoint.restore_latest()
+        else:
+            checkpoint.clear()
+        # Con varias etapas el mejor modelo se restaura al terminar la última
+        checkpoint_callback = CheckpointCallback(checkpoint, restore_best=RESTORE_BEST and not progressive)
+        callbacks.append(checkpoint_callback)
 
+    if use_feature_cache:
+        train_on_cached_features(model, architecture, model.optimizer, epochs=epochs,
+                                 jit_compile=jit_compile, callbacks=callbacks,
+                                 initial_epoch=initial_epoch)
+    else:
+        print("Creando generadores de datos...")
+        train_gen, val_gen, test_gen = create_data_generators(loader=loader, cache=cache,
+                                                              raw_input=embed_preprocessing,
+                                                              threads=threads)
+
+        profile_range = parse_step_range(profile_steps)
+        if run_log or profile_range:
+            run_log_path = get_run_log_path(architecture) if run_log else None
+            monitor = TrainingMonitor(run_log_path, profile_range, run_info={
+                "architecture": architecture,
+                "batch_size": BATCH_SIZE,
+                "epochs": epochs,
+                "precision": resolve_precision(precision),
+                "jit_compile": jit_compile,
+                "data_loader": loader,
+                "cache": cache,
+                "progressive": progressive
+            }, verbose=not progressive)
+            callbacks.append(monitor)
+        else:
+            monitor = None
+
+        print("Iniciando entrenamiento...")
+        if progressive:
+            def make_train_data(img_size, batch_size):
+                # Los datasets de tf.data se reducen desde sus imágenes ya decodificadas
+                if isinstance(train_gen, tf.data.Dataset):
+                    train_data = resize_batches(train_gen, batch_size, img_size)
+                else:
+                    train_data = create_data_generators(loader=loader, cache=cache, img_size=img_size,
+                                                        batch_size=batch_size,
+                                                        raw_input=embed_preprocessing,
+                                                        threads=threads)[0]
+                return instrument_dataset(train_data, monitor) if monitor else train_data
+
+            schedule = build_schedule(epochs, parse_sizes(PROGRESSIVE_SIZES))
+            fit_progressive(model, schedule, make_train_data, val_gen, callbacks, initial_epoch)
+            if monitor:
+                print_run_summary(monitor.summary, run_log_path)
+            if checkpoints and RESTORE_BEST:
+                checkpoint_callback.restore_best_weights()
+            model = to_fixed_resolution(model, architecture, precision, jit_compile)
+        else:
+            model.fit(
+                instrument_dataset(train_gen, monitor) if monitor else train_gen,
+                epochs=epochs,
+                initial_epoch=initial_epoch,
+                validation_data=val_gen,
+                callbacks=callbacks
+            )
+    train_time = time.perf_counter() - start_time
+
+    model_save_path = None
+    if save_model:
+        model_save_path = get_model_save_path(architecture)
+        print(f"Guardando modelo en {model_save_path}...")
+        os.makedirs(os.path.dirname(model_save_path), exist_ok=True)
+        model.save(model_save_path)
+
+    # Métricas por clase sobre el split de prueba; las predicciones quedan guardadas
+    # con el hash del modelo para volver a generar el informe sin inferencia
     print("Evaluando modelo...")
-    eval_results = model.evaluate(test_gen)
-    print(f"Test Accuracy: {eval_results[1] * 100:.2f}%")
+    evaluation = evaluate_model(model_save_path, model=model, split_dir=TEST_DIR,
+                                class_names=list(get_class_indices(TRAIN_DIR)))
+    print(f"Test Accuracy: {evaluation['accuracy'] * 100:.2f}%")
+    results = {
+        "test_loss": evaluation["loss"],
+        "test_accuracy": evaluation["accuracy"],
+        f"test_top_{evaluation['top_k']}_accuracy": evaluation["top_k_accuracy"],
+        "test_macro_f1": evaluation["macro_f1"],
+        "train_time_s": train_time
+    }
+    if not save_model:
+        if checkpoint is not None:
+            checkpoint.clear()
+        return (model, results) if return_results else model
 
-    model_save_path = get_model_save_path(architecture)
-    print(f"Guardando modelo en {model_save_path}...")
-    os.makedirs(os.path.dirname(model_save_path), exist_ok=True)
-    model.save(model_save_path)
+    write_metadata(
+        model_save_path, architecture, get_class_indices(TRAIN_DIR), IMG_SIZE, results,
+        preprocessing=EMBEDDED_PREPROCESSING if embed_preprocessing else None,
+        training={
+            "epochs": epochs,
+            "batch_size": BATCH_SIZE,
+            "learning_rate": LEARNING_RATE,
+            "precision": resolve_precision(precision),
+            "jit_compile": jit_compile,
+            "data_loader": "feature_cache" if use_feature_cache else loader,
+            "run_log": run_log_path,
+            "resumed_from_epoch": initial_epoch,
+            "epochs_run": int(checkpoint.epoch.numpy()) if checkpoint else epochs,
+            "best_epoch": int(checkpoint.best_epoch.numpy()) if checkpoint else None,
+            "progressive_sizes": list(parse_sizes(PROGRESSIVE_SIZES)) if progressive else None
+        }
+    )
+    # El modelo final ya está guardado: los checkpoints de la ejecución no hacen falta
+    if checkpoint is not None:
+        checkpoint.clear()
     print("Entrenamiento completado.")
     
-    return model
\ No newline at end of file
+    if return_results:
+        return model, {**results, "model_path": model_save_path}
+    return model
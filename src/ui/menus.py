@@ -36,6 +36,7 @@ def print_preprocessing_menu():
     print()
     print("  [1] Dividir dataset (train/val/test)")
     print("  [2] Aumentar dataset (data augmentation)")
+    print("  [3] Empaquetar dataset en shards (data_loader = packed)")
     print()
     print("  [0] Volver al menú principal")
     print()
@@ -53,6 +54,12 @@ def print_training_menu(architectures: dict):
     print()
     for i, (key, arch) in enumerate(architectures.items(), 1):
         print(f"  [{i}] Entrenar con {arch['name']}")
+    print(f"  [{len(architectures) + 1}] Exportar modelo a TFLite (float32 / dinámico / int8)")
+    print(f"  [{len(architectures) + 2}] Benchmark de arquitecturas (CPU)")
+    print(f"  [{len(architectures) + 3}] Entrenar y comparar todas las arquitecturas")
+    print(f"  [{len(architectures) + 4}] Destilar un modelo entrenado en MobileNetV2")
+    print(f"  [{len(architectures) + 5}] Comprimir un modelo entrenado (poda / agrupamiento de pesos)")
+    print(f"  [{len(architectures) + 6}] Búsqueda de hiperparámetros (ASHA)")
     print()
     print("  [0] Volver al menú principal")
     print()
@@ -70,6 +77,10 @@ def print_testing_menu(architectures: dict):
     print()
     for i, (key, arch) in enumerate(architectures.items(), 1):
         print(f"  [{i}] Clasificación en tiempo real ({arch['name']})")
+    print(f"  [{len(architectures) + 1}] Inferencia por lotes (carpetas / videos)")
+    print(f"  [{len(architectures) + 2}] Servidor HTTP de inferencia (localhost)")
+    print(f"  [{len(architectures) + 3}] Modelos disponibles")
+    print(f"  [{len(architectures) + 4}] Evaluar modelo (métricas por clase)")
     print()
     print("  [0] Volver al menú principal")
     print()
@@ -0,0 +1,120 @@
+""" Proceso de trabajo persistente para ejecutar las acciones del menú con TensorFlow ya cargado. """
+
+import time
+import atexit
+import importlib
+import traceback
+import multiprocessing
+
+# Módulos que el proceso importa apenas arranca, mientras el usuario navega el menú
+WORKER_PRELOAD = ("tensorflow", "src.training.train_model", "src.testing.model_loader")
+
+
+def _worker_loop(conn, preload):
+    """Bucle del proceso de trabajo: precarga módulos y ejecuta acciones hasta recibir None"""
+    start = time.perf_counter()
+    for module_name in preload:
+        try:
+            importlib.import_module(module_name)
+        except (Exception, KeyboardInterrupt):
+            # El error real se verá al ejecutar la acción que use el módulo
+            pass
+    conn.send(("ready", time.perf_counter() - start))
+
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            break
+        except KeyboardInterrupt:
+            # Ctrl+C en el menú también llega a este proceso: se ignora
+            continue
+        if task is None:
+            break
+
+        module_name, function_name, args, kwargs = task
+        try:
+            getattr(importlib.import_module(module_name), function_name)(*args, **kwargs)
+            conn.send(("ok", None))
+        except KeyboardInterrupt:
+            conn.send(("cancelled", None))
+        except BaseException:
+            conn.send(("error", traceback.format_exc()))
+
+
+class ActionWorker:
+    """
+    Proceso hijo de larga duración que ejecuta funciones por nombre de módulo.
+
+    Las acciones comparten la salida de la terminal con el menú. No se devuelven
+    resultados (los modelos de Keras no se pueden enviar entre procesos); las
+    excepciones se relanzan en el proceso principal como RuntimeError.
+    """
+
+    def __init__(self, preload=WORKER_PRELOAD):
+        self.preload = preload
+        self.ready_time = None
+        self._start()
+        atexit.register(self.stop)
+
+    def _start(self):
+        context = multiprocessing.get_context("spawn")
+        self._conn, child_conn = context.Pipe()
+        # No es daemon: las acciones pueden crear sus propios procesos (p. ej. train_all)
+        self._process = context.Process(
+            target=_worker_loop, args=(child_conn, self.preload), name="va-worker"
+        )
+        self._process.start()
+        self.ready_time = None
+
+    def _receive(self):
+        """Espera la respuesta del proceso; Ctrl+C solo cancela la acción en curso"""
+        while True:
+            try:
+                return self._conn.recv()
+            except KeyboardInterrupt:
+                print("\nCancelando acción...")
+
+    def wait_ready(self):
+        """Espera a que termine la precarga y devuelve cuánto tardó (segundos)"""
+        if self.ready_time is None:
+            try:
+                _, self.ready_time = self._receive()
+            except EOFError:
+                raise RuntimeError("El proceso de trabajo no pudo iniciarse") from None
+        return self.ready_time
+
+    def run(self, module_name, function_name, *args, **kwargs):
+        """Ejecuta module_name.function_name(*args, **kwargs) en el proceso de trabajo"""
+        if not self._process.is_alive():
+            print("El proceso de trabajo terminó inesperadamente; reiniciándolo...")
+            self._start()
+        self.wait_ready()
+
+        self._conn.send((module_name, function_name, args, kwargs))
+        try:
+            status, payload = self._receive()
+        except EOFError:
+            self._process.join()
+            self._start()
+            raise RuntimeError(f"El proceso de trabajo terminó durante {module_name}.{function_name}")
+
+        if status == "cancelled":
+            print("\nAcción cancelada.")
+        elif status == "error":
+            raise RuntimeError(f"Error en {module_name}.{function_name}:\n{payload}")
+
+    @property
+    def alive(self):
+        return self._process.is_alive()
+
+    def stop(self):
+        """Pide al proceso que termine y lo espera"""
+        if self._process.is_alive():
+            try:
+                self._conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+            self._process.join(timeout=5)
+            if self._process.is_alive():
+                self._process.terminate()